@@ -0,0 +1,739 @@
+"""Benchmarks for the VAST plugin's hot paths.
+
+Runs without a VAST or a display:
+
+* the pipe is a VastServerEmulator (model/devices/APIs/vast/vast_emulator.py),
+* the annotator reads a generated autostore (TIFF wells and a .vexp file) and
+  draws into a headless Agg canvas (see fixtures.py).
+
+Reported metrics, per group:
+
+* pipe:      VASTController.send throughput, the cost of wait() on an idle stage
+             and of recording an event (vast_events.py)
+* device:    PluginDevice.move_absolute cost for real and skipped moves (also
+             while profiling), and the latency of stop() during a move until the
+             waiting caller returns
+* multi_unit: aggregate move throughput of several VAST units driven at once
+* contention: one VAST connection shared by several threads, bulk moves and a
+             status poller: throughput and busy latency with and without
+             request priorities (a reply not matching its request fails the run)
+* results:   cost of recording a move and a fish to the plate results file,
+             batched write throughput, and indexed queries
+* annotator: popup open time and peak memory, opening a well not decoded before
+             (and the speedup of decoding its images in parallel), load_image,
+             draw_fish frame time, max/mean projections of the slices,
+             move_crosshair (handler, paint, and input-to-paint latency of
+             fast motion with and without throttling), update_positions, the
+             cost of scheduling the positions a rotation at a time, and how soon
+             a new well the VAST writes is found (settle time included) and
+             opened
+
+Usage::
+
+    python benchmarks/bench_hot_paths.py [group ...] [--runs N] [--check] [--update-baseline]
+
+Every group runs `--runs` times and each metric is the median of the runs.
+Results are compared against benchmarks/baselines.json. ``--update-baseline``
+rewrites the stored values so that performance changes show up in review, and
+``--check`` exits non-zero if a metric is worse than its baseline by more than
+its tolerance: TOLERANCES for the noisier metrics, ``--tolerance`` for the
+others.
+"""
+
+# Standard Imports
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+# Navigate configures handlers on these loggers. Without one, the warnings of
+# the VAST event log (e.g. interrupted moves) would be printed to stderr.
+for _name in ("model", "controller"):
+    logging.getLogger(_name).addHandler(logging.NullHandler())
+
+# Third Party Imports
+import numpy as np
+
+# Local Imports
+import fixtures
+
+#: dict: benchmark groups, {name: function(args) -> {metric: value}}
+BENCHMARKS = {}
+
+#: Metrics where larger values are better. All others are costs.
+HIGHER_IS_BETTER = ("_per_s", "speedup")
+
+#: dict: allowed ratio to the baseline of metrics noisier than --tolerance
+#: allows: sub-microsecond to few-microsecond calls, tail latencies, thread
+#: scheduling and the autostore watcher's polling, {metric: ratio}
+TOLERANCES = {
+    "pipe.send_commands_per_s": 2.0,
+    "pipe.event_record_us": 2.5,
+    "device.skipped_move_us": 2.0,
+    "device.skipped_move_profiled_us": 2.0,
+    "device.stop_latency_ms": 2.5,
+    "multi_unit.speedup": 2.0,
+    "contention.busy_p99_fifo_ms": 3.0,
+    "contention.busy_p99_priority_ms": 3.0,
+    "annotator.popup_open_ms": 2.0,
+    "annotator.popup_open_new_well_ms": 2.0,
+    "annotator.load_image_ms": 2.5,
+    "annotator.map_shared_well_ms": 2.5,
+    "annotator.focus_estimate_ms": 2.0,
+    "annotator.move_crosshair_ms": 3.0,
+    "annotator.crosshair_paint_ms": 2.0,
+    "annotator.crosshair_input_to_paint_p99_ms": 2.0,
+    "annotator.crosshair_unthrottled_p50_ms": 2.0,
+    "annotator.crosshair_unthrottled_p99_ms": 2.0,
+    "annotator.schedule_ms": 2.0,
+    "annotator.new_well_open_ms": 2.5,
+    "annotator.new_well_ready_ms": 2.0,
+}
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+@benchmark
+def pipe(args):
+    vast_api = fixtures.load_plugin_module("model/devices/APIs/vast/vast_controller.py")
+    vast_emulator = fixtures.load_plugin_module("model/devices/APIs/vast/vast_emulator.py")
+
+    vast = vast_api.VASTController(pipe=vast_emulator.VastServerEmulator())
+
+    metrics = {}
+    t = fixtures.time_per_call(lambda: vast.send("busy"), n=5000, repeat=9, warmup=5000)
+    metrics["pipe.send_commands_per_s"] = 1 / t
+
+    def move_and_wait():
+        vast.move_rel_um(10, 10)
+        vast.wait()
+
+    with fixtures.quiet():
+        t = fixtures.time_per_call(move_and_wait, n=20)
+    metrics["pipe.move_and_wait_ms"] = t * 1e3
+
+    t = fixtures.time_per_call(
+        lambda: vast.events.record("bench", "busy", 1e-5, "0"), n=20000, repeat=9
+    )
+    metrics["pipe.event_record_us"] = t * 1e6
+    return metrics
+
+
+@benchmark
+def device(args):
+    vast_api = fixtures.load_plugin_module("model/devices/APIs/vast/vast_controller.py")
+    vast_emulator = fixtures.load_plugin_module("model/devices/APIs/vast/vast_emulator.py")
+    plugin_device = fixtures.load_plugin_module(
+        "model/devices/plugin_device/plugin_device.py"
+    )
+
+    vast = vast_api.VASTController(pipe=vast_emulator.VastServerEmulator())
+    stage = plugin_device.PluginDevice("VAST", vast, fixtures.stage_configuration())
+
+    targets = iter([0.0, 100.0] * 100000)
+
+    def move():
+        x = next(targets)
+        stage.move_absolute({"x_abs": x, "y_abs": x, "theta_abs": x}, wait_until_done=True)
+
+    def skipped_move():
+        stage.move_absolute({"x_abs": stage.stage_x_pos + 0.01}, wait_until_done=False)
+
+    # x, y and theta one axis at a time, as Navigate drives stages
+    def axis_moves():
+        x = next(targets)
+        for axis in ("x", "y", "theta"):
+            stage.move_axis_absolute(axis, x, wait_until_done=True)
+
+    def axis_transaction():
+        x = next(targets)
+        with stage.transaction():
+            for axis in ("x", "y", "theta"):
+                stage.move_axis_absolute(axis, x)
+
+    metrics = {}
+    with fixtures.quiet():
+        metrics["device.move_absolute_ms"] = fixtures.time_per_call(move, n=20) * 1e3
+        metrics["device.axis_moves_ms"] = fixtures.time_per_call(axis_moves, n=20) * 1e3
+        metrics["device.axis_transaction_ms"] = fixtures.time_per_call(
+            axis_transaction, n=20
+        ) * 1e3
+    metrics["device.skipped_move_us"] = fixtures.time_per_call(skipped_move, n=2000) * 1e6
+
+    # the same with the entry points timed (vast_profiling.py), no report
+    profiler = plugin_device.vast_profiling.get_profiler()
+    profiler.start("calls")
+    metrics["device.skipped_move_profiled_us"] = (
+        fixtures.time_per_call(skipped_move, n=2000) * 1e6
+    )
+    profiler.stop()
+    stage.close()
+
+    # moves that take real time, interrupted 0.1 s in
+    slow_vast = vast_api.VASTController(
+        pipe=vast_emulator.VastServerEmulator(time_scale=1.0)
+    )
+    slow_stage = plugin_device.PluginDevice(
+        "VAST", slow_vast, fixtures.stage_configuration()
+    )
+    latencies = []
+    with fixtures.quiet():
+        for i in range(5):
+            x = 5000.0 * ((i + 1) % 2)
+            mover = threading.Thread(
+                target=slow_stage.move_absolute, args=({"x_abs": x},)
+            )
+            mover.start()
+            time.sleep(0.1)
+            t0 = time.perf_counter()
+            slow_stage.stop()
+            mover.join()
+            latencies.append(time.perf_counter() - t0)
+    slow_stage.close()
+    metrics["device.stop_latency_ms"] = float(np.median(latencies)) * 1e3
+    return metrics
+
+
+@benchmark
+def multi_unit(args):
+    vast_api = fixtures.load_plugin_module("model/devices/APIs/vast/vast_controller.py")
+    vast_emulator = fixtures.load_plugin_module("model/devices/APIs/vast/vast_emulator.py")
+    plugin_device = fixtures.load_plugin_module(
+        "model/devices/plugin_device/plugin_device.py"
+    )
+
+    # emulators moving in real time, one per unit
+    stages = [
+        plugin_device.PluginDevice(
+            "VAST",
+            vast_api.VASTController(pipe=vast_emulator.VastServerEmulator(time_scale=1.0)),
+            fixtures.stage_configuration(),
+            device_id,
+        )
+        for device_id in range(args.units)
+    ]
+    targets = [{"x_abs": 10.0 * (i % 2 + 1), "y_abs": 10.0 * (i % 2 + 1)}
+               for i in range(args.moves)]
+
+    t0 = time.perf_counter()
+    with fixtures.quiet():
+        # synchronous on the caller's thread, one unit after the other
+        for stage in stages:
+            for target in targets:
+                stage.move_absolute(target, wait_until_done=True)
+    t_sequential = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with fixtures.quiet():
+        # dispatched to every unit's worker, then wait for all of them
+        for target in targets:
+            for stage in stages:
+                stage.move_absolute(
+                    {axis: -pos for axis, pos in target.items()}, wait_until_done=False
+                )
+        for stage in stages:
+            stage.worker.call(lambda: None)
+    t_parallel = time.perf_counter() - t0
+
+    for stage in stages:
+        stage.close()
+
+    n_moves = args.units * args.moves
+    return {
+        "multi_unit.aggregate_moves_per_s": n_moves / t_parallel,
+        "multi_unit.speedup": t_sequential / t_parallel,
+    }
+
+
+@benchmark
+def contention(args):
+    vast_api = fixtures.load_plugin_module("model/devices/APIs/vast/vast_controller.py")
+    vast_emulator = fixtures.load_plugin_module("model/devices/APIs/vast/vast_emulator.py")
+
+    # 0.2 ms round trip, as through the named pipe
+    vast = vast_api.VASTController(pipe=vast_emulator.VastServerEmulator(latency=2e-4))
+
+    stop = threading.Event()
+    counts = {"sent": 0, "mismatched": 0}
+
+    def bulk():
+        while not stop.is_set():
+            reply = vast.send("mrel,0,1,1")
+            counts["sent"] += 1
+            counts["mismatched"] += reply is not None
+
+    def poll(latencies):
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            reply = vast.send("busy")
+            latencies.append(time.perf_counter() - t0)
+            counts["sent"] += 1
+            counts["mismatched"] += reply not in ("0", "1")
+
+    metrics = {}
+    for mode, priorities in (("fifo", {}), ("priority", vast_api.COMMAND_PRIORITIES)):
+        vast.priorities = priorities
+        latencies = []
+        counts["sent"] = 0
+        stop.clear()
+        threads = [threading.Thread(target=bulk) for _ in range(args.threads)]
+        threads += [threading.Thread(target=poll, args=(latencies,))]
+
+        t0 = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        metrics[f"contention.busy_p99_{mode}_ms"] = float(np.percentile(latencies, 99)) * 1e3
+    metrics["contention.commands_per_s"] = counts["sent"] / (time.perf_counter() - t0)
+    vast.close()
+    if counts["mismatched"]:
+        raise RuntimeError(f"{counts['mismatched']} replies did not match their request")
+    return metrics
+
+
+def build_annotator(controller_module, vexp_path):
+    view = fixtures.HeadlessFrame()
+    parent = fixtures.ParentController(vexp_path)
+    with fixtures.quiet():
+        return controller_module.VastInterfaceController(view, parent)
+
+
+@benchmark
+def results(args):
+    vast_results = fixtures.load_plugin_module("model/devices/APIs/vast/vast_results.py")
+    metrics = {}
+    with tempfile.TemporaryDirectory() as root:
+        store = vast_results.ResultsStore(os.path.join(root, "results.sqlite"))
+        wells = [os.path.join(root, "Plate", f"Well_A{i + 1}") for i in range(20)]
+
+        # recording, on the caller's (stage or GUI) thread
+        moves = iter(range(10**7))
+
+        def record_move():
+            i = next(moves)
+            store.record_move("VAST-0", wells[i % len(wells)], (i, i, 0.0), (0.0, 0.0, 0.0), 0.5)
+
+        metrics["results.record_move_us"] = 1e6 * fixtures.time_per_call(record_move, n=2000)
+
+        # a fish with 20 positions, each imaged at 4 angles
+        rng = np.random.default_rng(0)
+        clicked = rng.uniform(0, 1000, (20, 5)).tolist()
+        positions = rng.uniform(0, 1000, (80, 5))
+        fish = iter(range(10**7))
+        metrics["results.record_fish_us"] = 1e6 * fixtures.time_per_call(
+            lambda: store.record_fish(
+                f"fish {next(fish)}", wells[0], nose=clicked[0], z_focus_pos=1.0,
+                clicked=clicked, positions=positions,
+            ),
+            n=200,
+        )
+        store.flush()
+
+        # the writer thread, batching
+        n = 20000
+        t0 = time.perf_counter()
+        for _ in range(n):
+            record_move()
+        store.flush()
+        metrics["results.write_moves_per_s"] = n / (time.perf_counter() - t0)
+
+        # indexed queries over all the moves recorded
+        metrics["results.query_well_ms"] = 1e3 * fixtures.time_per_call(
+            lambda: store.moves(well=wells[3]), n=5
+        )
+        metrics["results.move_stats_ms"] = 1e3 * fixtures.time_per_call(
+            lambda: store.move_stats(well=wells[3]), n=5
+        )
+        store.close()
+    return metrics
+
+
+def crosshair_latency(controller_module, ctrl, args, duration=1.0):
+    """Input-to-paint latency of mouse motion events, on an event loop like Tk's.
+
+    Events arrive every 1/`args.motion_hz` seconds. The loop handles one queued
+    event at a time, and runs the after() callbacks due in between. Each blit
+    takes `args.blit_ms` longer, standing in for painting on a display. An
+    event's latency runs from its arrival to the end of the first paint showing
+    it or a later position.
+
+    Returns
+    -------
+    latencies : tuple
+        Median and 99th percentile [ms].
+    """
+    ctrl.locked = False
+    ctrl.perspective = 0
+    n = int(duration * args.motion_hz)
+    rng = np.random.default_rng(1)
+    ys = rng.permutation(np.linspace(0, ctrl.l, n))
+    events = [SimpleNamespace(xdata=ctrl.w / 2, ydata=y) for y in ys]
+    index = {y: i for i, y in enumerate(ys)}
+
+    canvas = ctrl.fish_widget.canvas
+    blit = canvas.blit
+    paints = []
+
+    def slow_blit(bbox):
+        blit(bbox)
+        t_end = time.perf_counter() + args.blit_ms / 1e3
+        while time.perf_counter() < t_end:
+            pass
+        paints.append((time.perf_counter(), index.get(ctrl.y_pos, -1)))
+
+    view = ctrl.view
+    view.run_due(float("inf"))
+    canvas.blit = slow_blit
+    t0 = time.perf_counter()
+    arrivals = t0 + np.arange(n) / args.motion_hz
+    i = 0
+    try:
+        while i < n or ctrl.crosshair_due is not None:
+            now = time.perf_counter()
+            if i < n and arrivals[i] <= now:
+                ctrl.move_crosshair(events[i])
+                i += 1
+            next_due = view.run_due()
+            if i < n and arrivals[i] > time.perf_counter():
+                wake = arrivals[i] if next_due is None else min(arrivals[i], next_due)
+                time.sleep(max(0.0, wake - time.perf_counter()))
+            elif i == n and ctrl.crosshair_due is not None and next_due is not None:
+                time.sleep(max(0.0, next_due - time.perf_counter()))
+    finally:
+        del canvas.blit
+
+    paint_times = np.array([t for t, _ in paints])
+    painted = np.maximum.accumulate(np.array([j for _, j in paints]))
+    first = np.searchsorted(painted, np.arange(n))
+    shown = first < len(paints)
+    latencies = 1e3 * (paint_times[first[shown]] - arrivals[shown])
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+@benchmark
+def annotator(args):
+    controller_module = fixtures.load_plugin_module(
+        "controller/vast_interface_controller.py"
+    )
+
+    # the ready well of an earlier run is in a folder removed since
+    with controller_module._ready_lock:
+        controller_module._ready_well.clear()
+
+    metrics = {}
+    with tempfile.TemporaryDirectory() as root:
+        vexp_path = fixtures.make_autostore(
+            root,
+            channels=args.channels,
+            n_views=2,
+            n_slices=args.slices,
+            shape=tuple(args.shape),
+        )
+        controller_module.SESSION_DIR = os.path.join(root, "sessions")
+        controller_module.RESULTS_PATH = fixtures.results_path()
+
+        # first open pays for the deferred imports, measure it separately
+        _, peak = fixtures.peak_memory(lambda: build_annotator(controller_module, vexp_path))
+        metrics["annotator.popup_peak_mib"] = peak / 2**20
+
+        metrics["annotator.popup_open_ms"] = 1e3 * fixtures.time_per_call(
+            lambda: build_annotator(controller_module, vexp_path), n=1, repeat=5
+        )
+
+        ctrl = build_annotator(controller_module, vexp_path)
+        view_dir = ctrl.view_names[0]
+        chan = ctrl.channel_names[0]
+        metrics["annotator.load_image_ms"] = 1e3 * fixtures.time_per_call(
+            lambda: ctrl.load_image(dir=view_dir, chan=chan, slice=0), n=20
+        )
+
+        # the model process mapping the well's images from shared memory
+        store = controller_module.get_image_store()
+        if store is not None:
+            vast_image_store = fixtures.load_plugin_module("model/vast_image_store.py")
+            client = vast_image_store.SharedImageStore(store.name)
+
+            def map_well():
+                images = [client.get(key) for key in client.keys(client.current_group())]
+                client.release_all()
+                return images
+
+            metrics["annotator.map_shared_well_ms"] = 1e3 * fixtures.time_per_call(
+                map_well, n=20
+            )
+            client.close()
+
+        # a well opened for the first time (its files rewritten): every view and
+        # channel is decoded, on the GUI thread and by the decoding threads
+        well_files = [
+            os.path.join(dirpath, name)
+            for dirpath, _, names in os.walk(os.path.join(root, "Plate"))
+            for name in names
+        ]
+        stamp = time.time_ns()
+
+        def rewrite_well():
+            nonlocal stamp
+            stamp += 10**9
+            for path in well_files:
+                os.utime(path, ns=(stamp, stamp))
+
+        def open_new_well(workers):
+            controller_module.DECODE_WORKERS = workers
+            times = []
+            for _ in range(5):
+                rewrite_well()
+                t0 = time.perf_counter()
+                build_annotator(controller_module, vexp_path)
+                times += [time.perf_counter() - t0]
+            return float(np.median(times))
+
+        workers = controller_module.DECODE_WORKERS
+        t_serial = open_new_well(1)
+        if workers > 1:
+            t_parallel = open_new_well(workers)
+            metrics["annotator.parallel_decode_speedup"] = t_serial / t_parallel
+        else:
+            # a single core decodes sequentially, there is no speedup to measure
+            t_parallel = t_serial
+        metrics["annotator.popup_open_new_well_ms"] = 1e3 * t_parallel
+
+        metrics["annotator.draw_fish_ms"] = 1e3 * fixtures.time_per_call(
+            ctrl.draw_fish, n=5
+        )
+
+        # automatic Z focus origin of a newly opened well
+        def estimate_focus():
+            controller_module._focus_origins.clear()
+            ctrl.auto_focus_origin()
+
+        metrics["annotator.focus_estimate_ms"] = 1e3 * fixtures.time_per_call(
+            estimate_focus, n=10
+        )
+
+        # composite frame after a mouse wheel step on one channel
+        gammas = list(ctrl.gammas)
+
+        def composite_step():
+            gammas[-1] = 1.0 if gammas[-1] != 1.0 else 0.98
+            return ctrl.renderer.composite(0, gammas)
+
+        composite_step()
+        metrics["annotator.composite_step_ms"] = 1e3 * fixtures.time_per_call(
+            composite_step, n=20
+        )
+
+        # mouse wheel gamma step on the displayed channel
+        wheel = iter([SimpleNamespace(step=(-1) ** i) for i in range(1000)])
+        metrics["annotator.gamma_step_ms"] = 1e3 * fixtures.time_per_call(
+            lambda: ctrl.mouse_wheel(next(wheel)), n=20
+        )
+
+        rng = np.random.default_rng(0)
+        events = [
+            SimpleNamespace(xdata=x, ydata=y)
+            for x, y in zip(rng.uniform(0, ctrl.w, 1000), rng.uniform(0, ctrl.l, 1000))
+        ]
+        events = iter(events * 100)
+        metrics["annotator.move_crosshair_ms"] = 1e3 * fixtures.time_per_call(
+            lambda: ctrl.move_crosshair(next(events)), n=100
+        )
+        ctrl.view.run_due(float("inf"))
+        metrics["annotator.crosshair_paint_ms"] = 1e3 * fixtures.time_per_call(
+            lambda: (ctrl.move_crosshair(next(events)), ctrl.paint_crosshair()), n=100
+        )
+
+        # input-to-paint latency of fast mouse motion, throttled and painting
+        # every event
+        throttled = (controller_module.CROSSHAIR_INTERVAL_MS,
+                     controller_module.TEXT_INTERVAL_MS)
+        latencies = crosshair_latency(controller_module, ctrl, args)
+        metrics["annotator.crosshair_input_to_paint_p50_ms"] = latencies[0]
+        metrics["annotator.crosshair_input_to_paint_p99_ms"] = latencies[1]
+        controller_module.CROSSHAIR_INTERVAL_MS = controller_module.TEXT_INTERVAL_MS = 0
+        latencies = crosshair_latency(controller_module, ctrl, args)
+        metrics["annotator.crosshair_unthrottled_p50_ms"] = latencies[0]
+        metrics["annotator.crosshair_unthrottled_p99_ms"] = latencies[1]
+        (controller_module.CROSSHAIR_INTERVAL_MS,
+         controller_module.TEXT_INTERVAL_MS) = throttled
+
+        # a fish annotated with a nose and `n_positions` clicks
+        n_positions = 20
+
+        def annotate_fish():
+            ctrl.nose_position = None
+            ctrl.positions = []
+            for i in range(n_positions + 1):
+                ctrl.coord = [10.0 * i, 5.0, 20.0, 0, 0]
+                ctrl.update_positions()
+
+        metrics["annotator.update_positions_us"] = 1e6 * fixtures.time_per_call(
+            annotate_fish, n=5
+        ) / (n_positions + 1)
+
+        # the session file written on every click, and read back on reopening
+        with fixtures.quiet():
+            metrics["annotator.session_save_us"] = 1e6 * fixtures.time_per_call(
+                ctrl.save_session, n=20
+            )
+            metrics["annotator.session_restore_ms"] = 1e3 * fixtures.time_per_call(
+                ctrl.restore_session, n=20
+            )
+
+            # annotation proposed by registering against the reference fish
+            ctrl.set_reference()
+            metrics["annotator.propose_annotation_ms"] = 1e3 * fixtures.time_per_call(
+                ctrl.propose_annotation, n=3
+            )
+
+        # positions clicked in random order along the fish, imaged at 4 rotations:
+        # the table scheduled a rotation at a time along short XY tours
+        rng = np.random.default_rng(0)
+        ctrl.nose_position = [0.0, 5.0, 20.0, 0, 0]
+        ctrl.positions = [
+            [10.0 * x, 5.0 + rng.uniform(-20, 20), 20.0, 0, 0]
+            for x in rng.permutation(n_positions)
+        ]
+        ctrl.tile_angles = controller_module.TILE_ANGLES[-1]
+        ctrl.schedule_positions = True
+        metrics["annotator.schedule_ms"] = 1e3 * fixtures.time_per_call(
+            lambda: ctrl.update_relative_positions(schedule=True), n=20
+        )
+        ctrl.tile_angles = controller_module.TILE_ANGLES[0]
+        ctrl.schedule_positions = controller_module.SCHEDULE_POSITIONS
+
+        # max projection of all slices shown instead of the middle slice:
+        # computed the first time, then taken from the image store
+        def show_projection(rewrite):
+            ctrl.set_projection("slice")
+            if rewrite:
+                rewrite_well()
+            t0 = time.perf_counter()
+            ctrl.set_projection("max")
+            return time.perf_counter() - t0
+
+        with fixtures.quiet():
+            metrics["annotator.projection_ms"] = 1e3 * float(
+                np.median([show_projection(True) for _ in range(3)])
+            )
+            metrics["annotator.projection_cached_ms"] = 1e3 * float(
+                np.median([show_projection(False) for _ in range(3)])
+            )
+            ctrl.set_projection("slice")
+
+        # a new well written by the VAST: found by the autostore watcher, then
+        # opened from its preloaded images
+        ctrl.positions, ctrl.nose_position = [], None
+        well_dir = os.path.join(root, "Plate", "Well_B1")
+        fixtures.write_well(well_dir, channels=args.channels, n_views=2,
+                            n_slices=args.slices, shape=tuple(args.shape), seed=7)
+        t0 = time.perf_counter()
+        while ctrl.ready_well_dir() != well_dir and time.perf_counter() - t0 < 10:
+            time.sleep(0.005)
+        metrics["annotator.new_well_ready_ms"] = 1e3 * (time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        with fixtures.quiet():
+            ctrl.check_ready_well()
+        metrics["annotator.new_well_open_ms"] = 1e3 * (time.perf_counter() - t0)
+        controller_module._autostore_watcher.stop()
+
+    return metrics
+
+
+def is_regression(name, value, baseline, tolerance):
+    tolerance = TOLERANCES.get(name, tolerance)
+    if name.endswith(HIGHER_IS_BETTER):
+        return value < baseline / tolerance
+    return value > baseline * tolerance
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("groups", nargs="*",
+                        help=f"benchmark groups to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--check", action="store_true",
+                        help="exit non-zero if a metric regressed")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store the measured values as the new baselines")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="allowed ratio to the baseline before failing, for "
+                             "the metrics not in TOLERANCES")
+    parser.add_argument("--runs", type=int, default=3,
+                        help="runs of each group, the median is reported")
+    parser.add_argument("--channels", nargs="+", default=["BF", "GFP"])
+    parser.add_argument("--slices", type=int, default=8)
+    parser.add_argument("--shape", type=int, nargs=2, default=[256, 1024])
+    parser.add_argument("--units", type=int, default=2,
+                        help="VAST units in the multi_unit benchmark")
+    parser.add_argument("--moves", type=int, default=10,
+                        help="moves per unit in the multi_unit benchmark")
+    parser.add_argument("--threads", type=int, default=4,
+                        help="threads sending moves in the contention benchmark")
+    parser.add_argument("--motion-hz", type=float, default=500,
+                        help="mouse motion events per second in the crosshair benchmark")
+    parser.add_argument("--blit-ms", type=float, default=5,
+                        help="extra time of a crosshair blit, standing in for a display")
+    args = parser.parse_args(argv)
+
+    groups = args.groups or list(BENCHMARKS)
+    unknown = set(groups) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark groups: {', '.join(sorted(unknown))}")
+
+    runs = {}
+    for group in groups:
+        for _ in range(args.runs):
+            for name, value in BENCHMARKS[group](args).items():
+                runs.setdefault(name, []).append(value)
+    metrics = {name: float(np.median(values)) for name, values in runs.items()}
+
+    baselines = fixtures.load_baselines()
+    stored = baselines.get("hot_paths", {})
+
+    regressions = []
+    print(f"{'metric':<36}{'value':>12}{'baseline':>12}{'ratio':>8}")
+    for name, value in metrics.items():
+        baseline = stored.get(name)
+        if baseline:
+            ratio = value / baseline
+            flag = ""
+            if is_regression(name, value, baseline, args.tolerance):
+                regressions += [name]
+                flag = "  <-- regression"
+            print(f"{name:<36}{value:>12.3f}{baseline:>12.3f}{ratio:>8.2f}{flag}")
+        else:
+            print(f"{name:<36}{value:>12.3f}{'-':>12}{'-':>8}")
+
+    if args.update_baseline:
+        # metrics no longer measured by the groups that ran are dropped
+        stored = {
+            name: value for name, value in stored.items()
+            if name.split(".", 1)[0] not in groups
+        }
+        stored.update({name: round(value, 3) for name, value in metrics.items()})
+        baselines["hot_paths"] = stored
+        fixtures.save_baselines(baselines)
+        print(f"Stored baselines in {fixtures.BASELINE_FILE}")
+
+    if args.check and regressions:
+        print(f"FAIL: {len(regressions)} metric(s) regressed: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""Import-time check for the VAST plugin.
+
+Navigate loads the plugin's controller, view, features and device startup
+functions every time it starts, whether or not the VAST popup is ever opened.
+This benchmark imports Navigate's own controller and model first, as Navigate
+has by the time it loads plugins, then loads those files the same way Navigate
+does (by file path) under ``-X importtime`` and checks that:
+
+* none of the annotator-only dependencies Navigate does not import itself are
+  imported at module level,
+* the time spent executing the plugin files, best of ``--repeat`` runs, is
+  within ``--tolerance`` of the stored baseline.
+
+Usage::
+
+    python benchmarks/bench_import_time.py [--update-baseline] [--tolerance 1.25]
+
+The exit code is non-zero if a check fails.
+"""
+
+# Standard Imports
+import argparse
+import ast
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Local Imports
+from fixtures import PLUGIN_DIR, load_baselines, save_baselines
+
+# Files Navigate executes when it loads the plugin
+PLUGIN_FILES = [
+    "controller/vast_interface_controller.py",
+    "view/vast_interface_frame.py",
+    "model/features/vast_annotator.py",
+    "model/devices/plugin_device/device_startup_functions.py",
+]
+
+# Modules already imported by Navigate itself before it loads plugins. Its
+# controller and model bring in matplotlib, tifffile and skimage, so those cost
+# the plugin nothing.
+HOST_MODULES = [
+    "numpy",
+    "tkinter",
+    "tkinter.ttk",
+    "navigate.controller.controller",
+    "navigate.model.model",
+    "navigate.model.device_startup_functions",
+    "navigate.model.devices.stages.base",
+    "navigate.model.devices.stages.synthetic",
+]
+
+# Modules Navigate does not import, to be imported only once the annotator is shown
+DEFERRED_MODULES = [
+    "navigate.tools.xml_tools",
+]
+
+MARKER = "--- vast plugin import start ---"
+
+CHILD_SCRIPT = """
+import importlib, importlib.util, sys, time
+for name in {host!r}:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        pass
+sys.stderr.write({marker!r} + "\\n")
+sys.stderr.flush()
+t0 = time.perf_counter()
+for i, path in enumerate({files!r}):
+    spec = importlib.util.spec_from_file_location(f"vast_plugin_bench_{{i}}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+print(int((time.perf_counter() - t0) * 1e6))
+"""
+
+
+def top_level_imports(path):
+    """Return the module names imported at module level of a python file.
+
+    Imports inside functions and methods are deferred and are not reported.
+    """
+    tree = ast.parse(Path(path).read_text(), filename=str(path))
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names += [node.module]
+    return names
+
+
+def check_deferred_imports():
+    """List (file, module) pairs where a deferred module is imported eagerly."""
+    offenders = []
+    for f in PLUGIN_FILES:
+        for name in top_level_imports(PLUGIN_DIR / f):
+            for deferred in DEFERRED_MODULES:
+                if name == deferred or name.startswith(deferred + "."):
+                    offenders += [(f, name)]
+    return offenders
+
+
+def measure_import_time():
+    """Load the plugin in a fresh interpreter and parse ``-X importtime``.
+
+    Returns
+    -------
+    result : dict
+        ``exec_us`` wall time spent executing the plugin files, ``import_us``
+        total self time of modules first imported by the plugin and
+        ``modules`` the names of those modules.
+    """
+    files = [str(PLUGIN_DIR / f) for f in PLUGIN_FILES]
+    script = CHILD_SCRIPT.format(host=HOST_MODULES, marker=MARKER, files=files)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True,
+        text=True,
+        cwd=str(PLUGIN_DIR),
+        env=dict(os.environ, MPLBACKEND="Agg"),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    lines = proc.stderr.splitlines()
+    lines = lines[lines.index(MARKER) + 1:]
+
+    import_us = 0
+    modules = []
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        import_us += int(self_us)
+        modules += [name.strip()]
+
+    return {
+        "exec_us": int(proc.stdout.strip().splitlines()[-1]),
+        "import_us": import_us,
+        "modules": modules,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="store the measured cost as the new baseline",
+    )
+    parser.add_argument("--repeat", type=int, default=9, help="number of runs")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="allowed ratio to the baseline before failing")
+    args = parser.parse_args(argv)
+
+    failed = False
+
+    offenders = check_deferred_imports()
+    for f, name in offenders:
+        print(f"FAIL: {f} imports {name} at module level")
+        failed = True
+
+    # best of N runs to reduce scheduler noise
+    runs = [measure_import_time() for _ in range(args.repeat)]
+    best = min(runs, key=lambda r: r["exec_us"])
+    eager = [
+        m for m in best["modules"]
+        if any(m == d or m.startswith(d + ".") for d in DEFERRED_MODULES)
+    ]
+    print(f"plugin exec time:    {best['exec_us'] / 1000:8.2f} ms")
+    print(f"plugin import time:  {best['import_us'] / 1000:8.2f} ms")
+    print(f"modules imported:    {len(best['modules'])}")
+    for m in eager:
+        print(f"FAIL: {m} is imported while loading the plugin")
+        failed = True
+
+    baselines = load_baselines()
+    if args.update_baseline:
+        baselines["import_time"] = {"exec_us": best["exec_us"]}
+        save_baselines(baselines)
+        print(f"Stored new baseline: {best['exec_us']} us")
+    else:
+        baseline = baselines.get("import_time", {}).get("exec_us")
+        if baseline is not None:
+            ratio = best["exec_us"] / baseline
+            print(f"baseline:            {baseline / 1000:8.2f} ms ({ratio:.2f}x)")
+            if ratio > args.tolerance:
+                print(f"FAIL: plugin exec time is more than {args.tolerance}x its baseline")
+                failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
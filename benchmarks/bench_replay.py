@@ -0,0 +1,86 @@
+"""Replay recorded VAST pipe traffic through VASTController.
+
+A recording is made by adding ``record_path`` to a VAST stage's hardware
+configuration (see plugin_config.yml), or synthetically with ``--record``.
+
+Usage::
+
+    # record a synthetic session: PluginDevice moves on an emulated VAST
+    python benchmarks/bench_replay.py session.vastrec --record --moves 50
+
+    # replay it against the recorded replies, as fast as possible or in real time
+    python benchmarks/bench_replay.py session.vastrec [--realtime]
+
+    # replay the requests against the emulator instead of the recorded replies
+    python benchmarks/bench_replay.py session.vastrec --server emulator
+"""
+
+# Standard Imports
+import argparse
+import sys
+
+# Local Imports
+import fixtures
+
+
+def record_synthetic(path, n_moves):
+    vast_api = fixtures.load_plugin_module("model/devices/APIs/vast/vast_controller.py")
+    vast_emulator = fixtures.load_plugin_module("model/devices/APIs/vast/vast_emulator.py")
+    vast_recorder = fixtures.load_plugin_module("model/devices/APIs/vast/vast_recorder.py")
+    plugin_device = fixtures.load_plugin_module(
+        "model/devices/plugin_device/plugin_device.py"
+    )
+
+    vast = vast_api.VASTController(pipe=vast_emulator.VastServerEmulator(time_scale=1.0))
+    vast.recorder = vast_recorder.PipeRecorder(path)
+    stage = plugin_device.PluginDevice("VAST", vast, fixtures.stage_configuration())
+
+    with fixtures.quiet():
+        stage.set_autostore("C:\\autostore")
+        for i in range(n_moves):
+            stage.move_absolute(
+                {"x_abs": 100.0 * (i % 5), "y_abs": 20.0 * (i % 3), "theta_abs": 90.0 * (i % 2)},
+                wait_until_done=True,
+            )
+    stage.close()
+    print(f"Recorded {vast.recorder.n_records} requests to {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="pipe recording (.vastrec)")
+    parser.add_argument("--record", action="store_true",
+                        help="record a synthetic session to `path` first")
+    parser.add_argument("--moves", type=int, default=20,
+                        help="moves in the synthetic session")
+    parser.add_argument("--realtime", action="store_true",
+                        help="replay at the original timing")
+    parser.add_argument("--server", choices=["replay", "emulator"], default="replay",
+                        help="answer with the recorded replies or the emulator")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        record_synthetic(args.path, args.moves)
+
+    vast_api = fixtures.load_plugin_module("model/devices/APIs/vast/vast_controller.py")
+    vast_recorder = fixtures.load_plugin_module("model/devices/APIs/vast/vast_recorder.py")
+
+    start_time, records = vast_recorder.read_recording(args.path)
+    if args.server == "replay":
+        server = vast_recorder.ReplayServer(records, realtime=args.realtime)
+    else:
+        vast_emulator = fixtures.load_plugin_module(
+            "model/devices/APIs/vast/vast_emulator.py"
+        )
+        server = vast_emulator.VastServerEmulator(time_scale=1.0 if args.realtime else 0.0)
+
+    vast = vast_api.VASTController(pipe=server)
+    stats = vast_recorder.replay(records, vast, realtime=args.realtime)
+
+    for key, value in stats.items():
+        print(f"{key:<24}{value:>14.6g}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
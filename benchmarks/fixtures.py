@@ -0,0 +1,306 @@
+"""Shared fixtures for the VAST plugin benchmarks.
+
+* load_plugin_module: load a plugin file once per process, the way the plugin
+  loads its own files.
+* make_autostore: write a synthetic VAST autostore (TIFF wells) and .vexp file.
+* HeadlessFrame / ParentController: stand-ins for the Tk popup and Navigate's
+  main controller so VastInterfaceController runs without a display. The figure
+  is drawn with matplotlib's Agg canvas, which implements the same
+  copy_from_bbox/restore_region/blit calls the Tk canvas does.
+"""
+
+# Standard Imports
+import atexit
+import contextlib
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+# Third Party Imports
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+PLUGIN_DIR = BENCH_DIR.parent / "navigate-vast-interface"
+BASELINE_FILE = BENCH_DIR / "baselines.json"
+
+# device_startup_functions, once a plugin file has loaded it
+LOADER_MODULE = "navigate_vast_interface.model.devices.plugin_device.device_startup_functions"
+
+
+def load_plugin_module(rel_path, module_name=None):
+    """Load a plugin python file (path relative to the plugin folder) through
+    device_startup_functions.load_plugin_module, so that benchmarks and the
+    plugin share one module per file."""
+    loader = sys.modules.get(LOADER_MODULE)
+    if loader is None:
+        loader_path = PLUGIN_DIR / "model/devices/plugin_device/device_startup_functions.py"
+        spec = importlib.util.spec_from_file_location("device_startup_functions", str(loader_path))
+        loader = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(loader)
+
+    path = PLUGIN_DIR / rel_path
+    return loader.load_plugin_module(module_name or path.stem, str(path))
+
+
+# Autostore fixtures
+def fish_image(shape, seed=0, channel=0):
+    """A fish-like elongated blob on a noisy background (uint16)."""
+    rng = np.random.default_rng(seed + 101 * channel)
+    l, w = shape
+    yy, xx = np.mgrid[0:l, 0:w].astype(np.float32)
+    cy = l / 2 + rng.uniform(-0.05, 0.05) * l
+    body = np.exp(-(((xx - w / 2) / (0.35 * w)) ** 2) - ((yy - cy) / (0.12 * l)) ** 2)
+    eye = np.exp(-(((xx - 0.2 * w) / (0.02 * w)) ** 2) - ((yy - cy) / (0.04 * l)) ** 2)
+    im = 800 * body + 1500 * eye * (channel == 0) + rng.normal(200, 20, size=shape)
+    return np.clip(im, 0, 65535).astype(np.uint16)
+
+
+def write_vexp(path, store_location):
+    """Write a minimal VAST experiment file pointing at `store_location`."""
+    Path(path).write_text(
+        "<?xml version=\"1.0\" encoding=\"utf-8\"?>\n"
+        "<VastExperiment>\n"
+        "  <AutoStSetup>\n"
+        f"    <_storeLocation>{store_location}</_storeLocation>\n"
+        "  </AutoStSetup>\n"
+        "</VastExperiment>\n"
+    )
+    return str(path)
+
+
+def write_well(well_dir, channels=("BF", "GFP"), n_views=2, n_slices=8,
+               shape=(256, 1024), seed=0):
+    """Write one Well folder: a subfolder per view with `{chan}_{slice}.tiff`."""
+    from tifffile import tifffile
+
+    for v in range(n_views):
+        view_dir = Path(well_dir) / f"view_{v}"
+        view_dir.mkdir(parents=True, exist_ok=True)
+        for c, chan in enumerate(channels):
+            im = fish_image(shape, seed=seed + v, channel=c)
+            for s in range(n_slices):
+                tifffile.imwrite(str(view_dir / f"{chan}_{s}.tiff"), im)
+
+
+def make_autostore(root, channels=("BF", "GFP"), n_views=2, n_slices=8,
+                   shape=(256, 1024), n_wells=1):
+    """Create a synthetic autostore under `root`.
+
+    Returns
+    -------
+    vexp_path : str
+        Path of the .vexp file whose store location points into the autostore.
+    """
+    plate_dir = Path(root) / "Plate"
+    for i in range(n_wells):
+        write_well(
+            plate_dir / f"Well_A{i + 1}",
+            channels=channels,
+            n_views=n_views,
+            n_slices=n_slices,
+            shape=shape,
+            seed=i,
+        )
+    return write_vexp(Path(root) / "experiment.vexp", plate_dir / "autostore.xml")
+
+
+# Headless view
+class Variable:
+    """tk.Variable stand-in."""
+
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class Button:
+    """ttk.Button / ttk.Checkbutton / ttk.Combobox stand-in."""
+
+    def __init__(self):
+        self.options = {}
+        self.states = []
+
+    def configure(self, **kwargs):
+        self.options.update(kwargs)
+
+    def state(self, states):
+        self.states = states
+
+    def bind(self, sequence, func):
+        self.options[sequence] = func
+
+
+class HeadlessFishWidget:
+    def __init__(self):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.fig = Figure(figsize=(10, 4))
+        self.ax = self.fig.add_subplot()
+        self.lines = self.ax.plot([], [], "r", [], [], "r", linewidth=1.0)
+        self.canvas = FigureCanvasAgg(self.fig)
+
+
+class HeadlessFrame:
+    """VastInterfaceFrame stand-in exposing the same variables/widgets/buttons."""
+
+    def __init__(self):
+        self.variables = {"text": Variable(""), "path": Variable("")}
+        self.buttons = {"path": Button(), "set_focus": Button()}
+        self.inputs = {
+            "fish_widget": HeadlessFishWidget(),
+            "flip": {
+                "button": {axis: Button() for axis in "xyz"},
+                "variable": {axis: Variable(False) for axis in "xyz"},
+            },
+            "append_nose": {"button": Button(), "variable": Variable(False)},
+            "composite": {"button": Button(), "variable": Variable(False)},
+            "projection": {"button": Button(), "variable": Variable("slice")},
+        }
+        self.scheduled = []
+
+    def after(self, ms, func, *args):
+        """Tk's after(): the callbacks are only recorded with the time they are
+        due, run them by hand or with run_due()."""
+        self.scheduled += [(time.perf_counter() + ms / 1e3, func, args)]
+        return f"after#{len(self.scheduled)}"
+
+    def run_due(self, now=None):
+        """Run the callbacks due by `now`, in order, as Tk's event loop would.
+
+        Returns
+        -------
+        next_due : float
+            When the next callback is due, None if none is scheduled.
+        """
+        now = time.perf_counter() if now is None else now
+        due = sorted((c for c in self.scheduled if c[0] <= now), key=lambda c: c[0])
+        self.scheduled = [c for c in self.scheduled if c[0] > now]
+        for _, func, args in due:
+            func(*args)
+        return min((c[0] for c in self.scheduled), default=None)
+
+    def get_variables(self):
+        return self.variables
+
+    def get_widgets(self):
+        return self.inputs
+
+
+class ParentController:
+    """Just enough of Navigate's main controller for VastInterfaceController."""
+
+    def __init__(self, vexp_path):
+        self.configuration = {
+            "experiment": {
+                "VAST": {
+                    "ExperimentFile": vexp_path,
+                    "VASTAnnotatorStatus": False,
+                },
+                "MicroscopeState": {"multiposition_count": 0},
+                "MultiPositions": [],
+            }
+        }
+        self.model = SimpleNamespace(configuration=self.configuration)
+        self.positions = None
+        self.multiposition_tab_controller = SimpleNamespace(
+            set_positions=self.set_positions
+        )
+
+    def set_positions(self, positions):
+        self.positions = positions
+
+
+_results_dir = None
+
+
+def results_path():
+    """Plate results file of this run, in a temporary folder removed at exit."""
+    global _results_dir
+    if _results_dir is None:
+        _results_dir = tempfile.mkdtemp(prefix="vast_bench_")
+        atexit.register(shutil.rmtree, _results_dir, True)
+    return os.path.join(_results_dir, "vast_results.sqlite")
+
+
+def stage_configuration(microscope_name="VAST", **hardware):
+    """Navigate configuration with a single VAST stage."""
+    hardware_config = {
+        "type": "VAST",
+        "axes": ["x", "y", "theta"],
+        "axes_mapping": ["x", "y", "theta"],
+        "results_path": results_path(),
+    }
+    hardware_config.update(hardware)
+    return {
+        "configuration": {
+            "microscopes": {
+                microscope_name: {
+                    "stage": {
+                        "hardware": hardware_config,
+                        "x_min": -1e6, "x_max": 1e6,
+                        "y_min": -1e6, "y_max": 1e6,
+                        "theta_min": -1e6, "theta_max": 1e6,
+                    }
+                }
+            }
+        }
+    }
+
+
+# Measurement helpers
+def time_per_call(func, n=100, repeat=5, warmup=1):
+    """Best-of-`repeat` mean wall time of `func()` in seconds.
+
+    `warmup` untimed calls are made first, so caches and lazy imports are filled.
+    """
+    for _ in range(warmup):
+        func()
+
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            func()
+        best = min(best, (time.perf_counter() - t0) / n)
+    return best
+
+
+def peak_memory(func):
+    """Return (result, peak traced allocation in bytes) of `func()`."""
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def load_baselines():
+    if BASELINE_FILE.exists():
+        return json.loads(BASELINE_FILE.read_text())
+    return {}
+
+
+def save_baselines(baselines):
+    BASELINE_FILE.write_text(json.dumps(baselines, indent=4, sort_keys=True) + "\n")
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the plugin's prints on the hot paths."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
@@ -0,0 +1,64 @@
+# Standard library imports
+import os
+import hashlib
+
+# Third party imports
+import numpy as np
+
+# Annotation sessions of the VAST annotator, one .npz file per Well folder.
+#
+# A session holds everything clicked for a fish (positions, nose and focus
+# origin, flips, gammas) and the identities of the images it was made on. It is
+# rewritten on every click, so closing the popup or reloading the experiment
+# does not lose the annotation, and it is only restored for the same images.
+
+
+def session_path(session_dir, well_dir):
+    """Session file of a Well folder."""
+    digest = hashlib.sha1(os.path.normcase(os.path.abspath(well_dir)).encode()).hexdigest()
+    return os.path.join(session_dir, f"{os.path.basename(well_dir)}_{digest[:16]}.npz")
+
+
+def save_session(path, **state):
+    """Write a session, replacing the previous one atomically.
+
+    Parameters
+    ----------
+    path : str
+        Session file, see session_path().
+    **state
+        Arrays (or values numpy converts to arrays) to store.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **state)
+    os.replace(tmp_path, path)
+
+
+def load_session(path, image_ids=None):
+    """Read a session.
+
+    Parameters
+    ----------
+    path : str
+        Session file, see session_path().
+    image_ids : list
+        Identities of the images now loaded. The session is only returned if it
+        was made on the same images.
+
+    Returns
+    -------
+    state : dict or None
+        Stored arrays, None if there is no (matching) session.
+    """
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            state = {key: data[key] for key in data.files}
+    except (OSError, ValueError):
+        return None
+
+    if image_ids is not None and list(state.get("image_ids", [])) != list(image_ids):
+        return None
+    return state
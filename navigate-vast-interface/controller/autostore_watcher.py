@@ -0,0 +1,234 @@
+# Standard library imports
+import os
+import re
+import time
+import threading
+
+# Watch the VAST autostore and report each new Well folder once it is fully
+# written.
+#
+# A Well folder holds a folder per view with `{channel}_{slice}.tiff` images. A
+# new well is complete when every view holds the same channels with the same
+# slices 0..n-1, as many views, channels and slices as the previous well (once
+# there is one), and none of its files changed for `settle` seconds. A well
+# laid out differently from the previous one is accepted after a longer settle.
+#
+# On Windows the watcher sleeps on a directory change notification of the
+# autostore, so an idle autostore is not scanned. Elsewhere it scans every
+# `interval` seconds.
+
+#: int: a well with another layout than the previous one settles this many times longer
+RELAYOUT_SETTLE = 10
+
+#: re.Pattern: image file name, {channel}_{slice}.tif(f)
+IMAGE_PATTERN = re.compile(r"^(?P<chan>.+)_(?P<slice>\d+)\.tiff?$", re.IGNORECASE)
+
+
+def find_wells(root):
+    """Well folders under the autostore root, in the order os.walk finds them."""
+    wells = []
+    for dirpath, dirnames, _ in os.walk(root):
+        if "Well" in os.path.basename(dirpath):
+            wells += [dirpath]
+            # the views of a well are scanned by scan_well()
+            dirnames[:] = []
+    return wells
+
+
+def scan_well(well_dir):
+    """Images of a well.
+
+    Returns
+    -------
+    views : dict
+        {view folder: {file name: (size, modification time)}}
+    """
+    views = {}
+    try:
+        view_entries = [e for e in os.scandir(well_dir) if e.is_dir()]
+    except OSError:
+        return views
+
+    for view in view_entries:
+        files = {}
+        try:
+            for entry in os.scandir(view.path):
+                if entry.is_file() and IMAGE_PATTERN.match(entry.name):
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            continue
+        views[view.path] = files
+    return views
+
+
+def well_layout(views):
+    """Channels and slices of a well, if every view holds all of them.
+
+    Returns
+    -------
+    layout : tuple or None
+        (n_views, channels, n_slices) with the channels sorted. None if a view is
+        missing images (or empty files), or the views disagree.
+    """
+    layout = None
+    for files in views.values():
+        slices = {}
+        for name, (size, _) in files.items():
+            if not size:
+                return None
+            match = IMAGE_PATTERN.match(name)
+            slices.setdefault(match["chan"], set()).add(int(match["slice"]))
+
+        if not slices:
+            return None
+        n_slices = len(next(iter(slices.values())))
+        if any(s != set(range(n_slices)) for s in slices.values()):
+            return None
+
+        view_layout = (tuple(sorted(slices)), n_slices)
+        if layout is not None and view_layout != layout:
+            return None
+        layout = view_layout
+
+    return None if layout is None else (len(views),) + layout
+
+
+def _change_notifier(root):
+    """Return wait(timeout) -> bool, True when something under root changed.
+
+    Uses FindFirstChangeNotification on Windows, None elsewhere.
+    """
+    if os.name != "nt":
+        return None
+    try:
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        kernel32.FindFirstChangeNotificationW.restype = ctypes.c_void_p
+        # file and folder names, sizes and write times, in the whole tree
+        handle = kernel32.FindFirstChangeNotificationW(
+            str(root), True, 0x1 | 0x2 | 0x8 | 0x10
+        )
+    except (ImportError, AttributeError, OSError):
+        return None
+    if handle in (None, ctypes.c_void_p(-1).value):
+        return None
+    handle = ctypes.c_void_p(handle)
+
+    def wait(timeout):
+        if kernel32.WaitForSingleObject(handle, int(timeout * 1000)) != 0:
+            return False
+        kernel32.FindNextChangeNotification(handle)
+        return True
+
+    wait.close = lambda: kernel32.FindCloseChangeNotification(handle)
+    return wait
+
+
+class AutostoreWatcher:
+    """Report the Well folders the VAST writes into an autostore.
+
+    Wells already there when the watcher starts are not reported, the most recent
+    of them only sets the expected layout.
+    """
+
+    def __init__(self, root, on_well, interval=0.25, settle=0.5):
+        """
+        Parameters
+        ----------
+        root : str
+            Autostore folder, the parent of the Well folders.
+        on_well : callable
+            on_well(well_dir, views, channels, n_slices), called from the watcher
+            thread with the sorted view folders and channels of a complete well.
+        interval : float
+            Longest time between two scans [s].
+        settle : float
+            Time the files of a well must stay unchanged [s].
+        """
+        self.root = root
+        self.on_well = on_well
+        self.interval = interval
+        self.settle = settle
+
+        wells = find_wells(root)
+        self.seen = set(wells)
+        self.layout = well_layout(scan_well(wells[-1])) if wells else None
+
+        # {well folder: (files, time they last changed)} of wells being written
+        self.pending = {}
+
+        # statistics
+        self.n_scans = 0
+        self.n_wells = 0
+
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="VAST-autostore", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(self.interval + 1)
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _run(self):
+        wait = _change_notifier(self.root)
+        try:
+            while not self.stop_event.is_set():
+                if wait is None:
+                    self.stop_event.wait(self.interval)
+                elif not wait(self.interval) and not self.pending:
+                    continue
+                self.poll()
+        finally:
+            if wait is not None:
+                wait.close()
+
+    def poll(self, now=None):
+        """Scan once and report the wells found complete.
+
+        Returns
+        -------
+        wells : list
+            Folders of the wells reported by this scan.
+        """
+        now = time.monotonic() if now is None else now
+        self.n_scans += 1
+
+        for well_dir in find_wells(self.root):
+            if well_dir not in self.seen:
+                self.seen.add(well_dir)
+                self.pending[well_dir] = (None, now)
+
+        completed = []
+        for well_dir, (last_files, changed) in list(self.pending.items()):
+            views = scan_well(well_dir)
+            if views != last_files:
+                self.pending[well_dir] = (views, now)
+                continue
+            if now - changed < self.settle:
+                continue
+
+            layout = well_layout(views)
+            if layout is None:
+                continue
+            # a new layout (e.g. another experiment) needs to settle for longer
+            if self.layout is not None and layout != self.layout and (
+                now - changed < RELAYOUT_SETTLE * self.settle
+            ):
+                continue
+
+            del self.pending[well_dir]
+            self.layout = layout
+            self.n_wells += 1
+            completed += [well_dir]
+            self.on_well(well_dir, sorted(views), list(layout[1]), layout[2])
+        return completed
@@ -0,0 +1,82 @@
+# Third party imports
+import numpy as np
+
+# Geometry of the VAST capillary: where an annotated point of the fish ends up
+# when the capillary is rotated, and the stage coordinates that bring it into
+# focus.
+#
+# Points are (x, y, z) pixels: x along the capillary and y as seen in the top
+# view (theta = 0), z as seen in the side view, which looks along the focus
+# axis. Rotating the capillary by theta turns (y, z) about the capillary axis.
+
+
+def rotate_points(points, theta, axis_yz, theta_sign=1.0):
+    """Positions of points after rotating the capillary.
+
+    Parameters
+    ----------
+    points : array_like
+        (n, 3) (x, y, z) pixels at theta = 0.
+    theta : float or array_like
+        Rotation(s) of the capillary [deg].
+    axis_yz : tuple
+        (y, z) pixels of the capillary axis in the top and side views.
+    theta_sign : float
+        1 if a positive VAST rotation turns y towards z, -1 otherwise.
+
+    Returns
+    -------
+    rotated : numpy.ndarray
+        (n_theta, n, 3) points, (n, 3) for a scalar theta.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    thetas = np.radians(theta_sign * np.atleast_1d(np.asarray(theta, dtype=float)))
+    c, s = np.cos(thetas)[:, None], np.sin(thetas)[:, None]
+
+    y = points[:, 1] - axis_yz[0]
+    z = points[:, 2] - axis_yz[1]
+
+    rotated = np.empty((len(thetas),) + points.shape)
+    rotated[..., 0] = points[:, 0]
+    rotated[..., 1] = c * y - s * z + axis_yz[0]
+    rotated[..., 2] = s * y + c * z + axis_yz[1]
+    return rotated[0] if np.ndim(theta) == 0 else rotated
+
+
+def stage_positions(points, origin, thetas, axis_yz, um_per_pix, flip=(1, 1, 1),
+                    theta_sign=1.0):
+    """MultiPositions that bring each point into focus at each rotation.
+
+    Parameters
+    ----------
+    points : array_like
+        (n, 3) annotated (x, y, z) pixels, at theta = 0.
+    origin : tuple
+        (x, y, z) pixels the stage coordinates are relative to: the nose in x
+        and y, the focus origin in z.
+    thetas : list
+        Rotations to image at [deg]. Rows are grouped by rotation, in this order.
+    axis_yz : tuple
+        (y, z) pixels of the capillary axis in the top and side views.
+    um_per_pix : float
+        Calibration of the views.
+    flip : tuple
+        1 or -1 per axis, the sign of the x, y and focus stage axes.
+    theta_sign : float
+        See rotate_points().
+
+    Returns
+    -------
+    positions : numpy.ndarray
+        (len(thetas) * n, 5) (x, y, z, theta, f) rows in microns and degrees.
+    """
+    thetas = np.asarray(thetas, dtype=float).ravel()
+    rotated = rotate_points(points, thetas, axis_yz, theta_sign)
+    n_theta, n, _ = rotated.shape
+
+    positions = np.zeros((n_theta, n, 5))
+    positions[..., 0] = flip[0] * (rotated[..., 0] - origin[0]) * um_per_pix
+    positions[..., 1] = flip[1] * (rotated[..., 1] - origin[1]) * um_per_pix
+    positions[..., 3] = thetas[:, None]
+    positions[..., 4] = flip[2] * (rotated[..., 2] - origin[2]) * um_per_pix
+    return positions.reshape(-1, 5)
@@ -0,0 +1,199 @@
+# Third party imports
+import numpy as np
+
+# Register the images of a fish against a reference fish and map annotated points
+# between them.
+#
+# Points are (x, y) pixel coordinates: x is the column and y the row of the image
+# as shown by the annotator. A registration returns (A, t) such that the point p
+# of the reference lies at A @ p + t in the new fish.
+
+#: int: registration runs on images downsampled to at most this size
+MAX_SIZE = 512
+
+#: float: largest deviation from the identity accepted from the affine refinement
+MAX_AFFINE = 0.2
+
+
+def downsample(im, factor):
+    """Block mean of an image over factor x factor pixels (float32).
+
+    The center of downsampled pixel i lies at full resolution coordinate
+    i * factor + (factor - 1) / 2.
+    """
+    im = np.asarray(im, dtype=np.float32)
+    if factor <= 1:
+        return im
+    l, w = (im.shape[0] // factor) * factor, (im.shape[1] // factor) * factor
+    return im[:l, :w].reshape(l // factor, factor, w // factor, factor).mean(axis=(1, 3))
+
+
+def downsample_factor(shape, max_size=MAX_SIZE):
+    return max(int(np.ceil(max(shape) / max_size)), 1)
+
+
+def normalize(im):
+    """Zero mean, unit variance."""
+    im = im - im.mean()
+    std = im.std()
+    return im / std if std > 0 else im
+
+
+def _hann(shape):
+    return np.outer(np.hanning(shape[0]), np.hanning(shape[1])).astype(np.float32)
+
+
+def _parabolic(c_minus, c_0, c_plus):
+    denom = c_minus - 2 * c_0 + c_plus
+    return 0.5 * (c_minus - c_plus) / denom if denom != 0 else 0.0
+
+
+def phase_correlation(ref, mov):
+    """Translation between two images of the same shape by phase correlation.
+
+    Returns
+    -------
+    shift : numpy.ndarray
+        (dx, dy) such that mov(p) ~ ref(p - shift), with subpixel precision.
+    peak : float
+        Height of the correlation peak, 1 for identical images.
+    """
+    window = _hann(ref.shape)
+    F = np.fft.rfft2(normalize(ref) * window)
+    G = np.fft.rfft2(normalize(mov) * window)
+    R = G * np.conj(F)
+    R /= np.abs(R) + 1e-12
+    r = np.fft.irfft2(R, s=ref.shape)
+
+    iy, ix = np.unravel_index(np.argmax(r), r.shape)
+    l, w = r.shape
+    dy = iy + _parabolic(r[iy - 1, ix], r[iy, ix], r[(iy + 1) % l, ix])
+    dx = ix + _parabolic(r[iy, ix - 1], r[iy, ix], r[iy, (ix + 1) % w])
+
+    # shifts past half the image wrap around
+    dy = dy - l if dy > l / 2 else dy
+    dx = dx - w if dx > w / 2 else dx
+    return np.array([dx, dy]), float(r[iy, ix])
+
+
+def bilinear(im, x, y):
+    """Sample an image at (x, y), NaN outside of it."""
+    l, w = im.shape
+    x0 = np.floor(x).astype(np.intp)
+    y0 = np.floor(y).astype(np.intp)
+    inside = (x0 >= 0) & (y0 >= 0) & (x0 < w - 1) & (y0 < l - 1)
+    x0 = np.clip(x0, 0, w - 2)
+    y0 = np.clip(y0, 0, l - 2)
+    fx = (x - x0).astype(np.float32)
+    fy = (y - y0).astype(np.float32)
+
+    top = im[y0, x0] * (1 - fx) + im[y0, x0 + 1] * fx
+    bottom = im[y0 + 1, x0] * (1 - fx) + im[y0 + 1, x0 + 1] * fx
+    out = top * (1 - fy) + bottom * fy
+    out[~inside] = np.nan
+    return out
+
+
+def refine_affine(ref, mov, A, t, n_iterations=20):
+    """Gauss-Newton refinement of an affine transform, mov(A p + t) ~ ref(p).
+
+    Returns
+    -------
+    A, t : numpy.ndarray
+        Refined transform, or the one given if the refinement did not improve
+        the match or left the small-deformation range.
+    """
+    ref = normalize(ref)
+    mov = normalize(mov)
+    gy, gx = np.gradient(mov)
+
+    l, w = ref.shape
+    y, x = np.mgrid[0:l, 0:w].astype(np.float32)
+    x, y, ref = x.ravel(), y.ravel(), ref.ravel()
+    # parameters act on centered, scaled coordinates for a well conditioned system
+    scale = np.float32(max(l, w))
+    xc, yc = (x - w / 2) / scale, (y - l / 2) / scale
+
+    def residual(A, t):
+        xw = A[0, 0] * x + A[0, 1] * y + t[0]
+        yw = A[1, 0] * x + A[1, 1] * y + t[1]
+        warped = bilinear(mov, xw, yw)
+        valid = ~np.isnan(warped)
+        return xw, yw, warped - ref, valid
+
+    A0, t0 = A.copy(), t.copy()
+    _, _, e, valid = residual(A, t)
+    cost0 = cost = np.mean(e[valid] ** 2) if valid.any() else np.inf
+
+    for _ in range(n_iterations):
+        xw, yw, e, valid = residual(A, t)
+        if valid.sum() < 0.25 * len(ref):
+            break
+        ix, iy = bilinear(gx, xw, yw)[valid], bilinear(gy, xw, yw)[valid]
+        xv, yv = xc[valid], yc[valid]
+        J = np.stack([ix * xv, ix * yv, iy * xv, iy * yv, ix, iy], axis=1)
+        H = J.T @ J
+        H[np.diag_indices(6)] *= 1.001
+        delta = -np.linalg.solve(H, J.T @ e[valid])
+
+        # back from centered, scaled coordinates
+        dA = delta[:4].reshape(2, 2) / scale
+        dt = delta[4:] - dA @ np.array([w / 2, l / 2])
+        A, t = A + dA, t + dt
+
+        _, _, e, valid = residual(A, t)
+        new_cost = np.mean(e[valid] ** 2) if valid.any() else np.inf
+        if not new_cost < cost or np.abs(delta).max() < 1e-4:
+            cost = min(cost, new_cost)
+            break
+        cost = new_cost
+
+    if not cost < cost0 or np.abs(A - np.eye(2)).max() > MAX_AFFINE:
+        return A0, t0
+    return A, t
+
+
+def register(ref, mov, affine=False, max_size=MAX_SIZE):
+    """Register the image of a new fish against a reference image.
+
+    Parameters
+    ----------
+    ref, mov : numpy.ndarray
+        Reference and new image, full resolution.
+    affine : bool
+        Refine the translation with a small affine transform.
+    max_size : int
+        Largest side of the downsampled images used.
+
+    Returns
+    -------
+    A : numpy.ndarray
+        (2, 2) linear part of the transform.
+    t : numpy.ndarray
+        (2,) translation, such that reference point p maps to A @ p + t.
+    peak : float
+        Phase correlation peak height, a measure of confidence.
+    """
+    factor = downsample_factor(ref.shape, max_size)
+    ref_ds = downsample(ref, factor)
+    mov_ds = downsample(mov, factor)
+
+    # same shape for the correlation
+    l = min(ref_ds.shape[0], mov_ds.shape[0])
+    w = min(ref_ds.shape[1], mov_ds.shape[1])
+    ref_ds, mov_ds = ref_ds[:l, :w], mov_ds[:l, :w]
+
+    shift, peak = phase_correlation(ref_ds, mov_ds)
+    A, t = np.eye(2), shift
+    if affine:
+        A, t = refine_affine(ref_ds, mov_ds, A, t)
+
+    # to full resolution: p_ds = (p - c) / factor
+    c = np.full(2, (factor - 1) / 2)
+    return A, c - A @ c + factor * t, peak
+
+
+def transform_points(A, t, points):
+    """Map (n, 2) points with p -> A @ p + t."""
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    return points @ A.T + t
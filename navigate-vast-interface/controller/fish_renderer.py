@@ -0,0 +1,261 @@
+# Third party imports
+import numpy as np
+
+# Display colour of a channel, matched on its name (case-insensitive)
+CHANNEL_COLORS = {
+    "BF": (1.0, 1.0, 1.0),
+    "DAPI": (0.0, 0.3, 1.0),
+    "BFP": (0.0, 0.3, 1.0),
+    "CFP": (0.0, 1.0, 1.0),
+    "GFP": (0.0, 1.0, 0.0),
+    "YFP": (1.0, 1.0, 0.0),
+    "RFP": (1.0, 0.0, 1.0),
+    "MCHERRY": (1.0, 0.0, 1.0),
+}
+
+# colours of channels not listed above, in order
+DEFAULT_COLORS = [
+    (0.0, 1.0, 0.0),
+    (1.0, 0.0, 1.0),
+    (0.0, 1.0, 1.0),
+    (1.0, 1.0, 0.0),
+    (1.0, 1.0, 1.0),
+]
+
+
+def channel_colors(channel_names):
+    """Pick a display colour for each channel.
+
+    Returns
+    -------
+    colors : numpy.ndarray
+        (n_channels, 3) RGB colours in [0, 1].
+    """
+    colors = []
+    n_default = 0
+    for chan in channel_names:
+        color = CHANNEL_COLORS.get(chan.upper())
+        if color is None:
+            color = DEFAULT_COLORS[n_default % len(DEFAULT_COLORS)]
+            n_default += 1
+        colors += [color]
+    return np.array(colors, dtype=np.float32).reshape(-1, 3)
+
+
+#: float: percentiles of the auto-contrast window
+LOW_PERCENTILE = 0.5
+HIGH_PERCENTILE = 99.8
+
+#: int: levels that non-integer images are quantized to
+N_LEVELS = 4096
+
+
+class FishRenderer:
+    """Render the fish images, one channel or all channels blended in colour.
+
+    The intensity histogram of each image is computed once, when it is first
+    shown. Images are displayed the way the annotator always has (see
+    default_table) until auto_contrast() sets a display window from percentiles
+    of that histogram. The window and gamma of a channel are applied through a
+    lookup table indexed by the pixel values, so a gamma step only rebuilds the
+    table and looks the image up in it.
+
+    The layers of a view are kept in an (l, w, n_channels) stack, so changing one
+    channel only recomputes its layer. The composite is the stack times the
+    channel colours, computed into buffers that are reused from frame to frame.
+    """
+
+    def __init__(self, images, channel_names, colors=None):
+        """
+        Parameters
+        ----------
+        images : list
+            {channel name: 2D image} for each view.
+        channel_names : list
+            Channels in display order.
+        colors : array_like
+            (n_channels, 3) RGB colours, see channel_colors() for the default.
+        """
+        self.images = images
+        self.channel_names = list(channel_names)
+        self.colors = channel_colors(channel_names) if colors is None else (
+            np.asarray(colors, dtype=np.float32).reshape(-1, 3)
+        )
+
+        # {(view, channel): (lookup index image, levels, cumulative histogram)}
+        self.histograms = {}
+        # {(view, channel): (low, high) display window in levels}, set by auto_contrast
+        self.windows = {}
+        # {(view, channel): ((window, gamma), lookup table)}
+        self.luts = {}
+        # {view: (stack, (window, gamma) of each layer in the stack)}
+        self.stacks = {}
+
+        self.rgb = None
+        self.rgb8 = None
+        self.gray8 = None
+
+    def histogram(self, view, chan):
+        """Lookup index and cumulative histogram of an image (cached).
+
+        Unsigned integer images index the lookup tables directly. Other images
+        are quantized to N_LEVELS levels between their min and max once.
+
+        Returns
+        -------
+        index : numpy.ndarray
+            Image of lookup table indices.
+        levels : numpy.ndarray
+            Intensity of each index.
+        cdf : numpy.ndarray
+            Cumulative histogram of the indices, normalized to 1.
+        """
+        key = (view, chan)
+        cached = self.histograms.get(key)
+        if cached is None:
+            im = self.images[view][chan]
+            if im.dtype.kind == "u" and im.dtype.itemsize <= 2:
+                index = im
+                levels = np.arange(int(im.max()) + 1, dtype=np.float32)
+            else:
+                lo, hi = float(im.min()), float(im.max())
+                scale = (N_LEVELS - 1) / (hi - lo) if hi > lo else 0.0
+                index = ((im - lo) * scale).astype(np.uint16)
+                levels = np.linspace(lo, hi, N_LEVELS, dtype=np.float32)
+
+            counts = np.bincount(index.ravel(), minlength=len(levels))
+            cdf = np.cumsum(counts, dtype=np.float64)
+            cdf /= cdf[-1]
+            self.histograms[key] = cached = (index, levels, cdf)
+        return cached
+
+    def percentile(self, view, chan, q):
+        """Intensity percentile(s) of an image, from its cached histogram."""
+        _, levels, cdf = self.histogram(view, chan)
+        i = np.searchsorted(cdf, np.asarray(q) / 100.0)
+        return levels[np.minimum(i, len(levels) - 1)]
+
+    def auto_contrast(self, view, chan, low=LOW_PERCENTILE, high=HIGH_PERCENTILE):
+        """Set the display window of an image to its `low` and `high` percentiles.
+
+        Returns
+        -------
+        window : tuple
+            (low, high) intensities.
+        """
+        lo, hi = (float(v) for v in self.percentile(view, chan, [low, high]))
+        if hi <= lo:
+            _, levels, _ = self.histogram(view, chan)
+            lo, hi = float(levels[0]), float(max(levels[-1], levels[0] + 1))
+        self.windows[(view, chan)] = (lo, hi)
+        return lo, hi
+
+    def window(self, view, chan):
+        """Display window set by auto_contrast(), None for the default display."""
+        return self.windows.get((view, chan))
+
+    def default_table(self, view, chan, gamma):
+        """Display value of each index without a window, in [0, 1].
+
+        As the annotator showed images before it had windows: skimage's
+        adjust_gamma (gamma over the range of the image dtype), then scaled from
+        the image's min to its max the way imshow scales it.
+        """
+        im = self.images[view][chan]
+        _, levels, cdf = self.histogram(view, chan)
+        scale = float(np.iinfo(im.dtype).max) if im.dtype.kind in "ui" else 1.0
+
+        table = levels * np.float32(1 / scale)
+        np.clip(table, 0, None, out=table)
+        np.power(table, np.float32(gamma), out=table)
+
+        # the lowest level present, and the highest
+        lo = table[min(np.searchsorted(cdf, 0, side="right"), len(table) - 1)]
+        hi = table[-1]
+        table -= lo
+        table *= np.float32(1 / (hi - lo)) if hi > lo else np.float32(0)
+        np.clip(table, 0, 1, out=table)
+        return table
+
+    def lut(self, view, chan, gamma):
+        """Lookup table mapping the index of a pixel to its display value in [0, 1]."""
+        key = (view, chan)
+        setting = (self.window(view, chan), float(gamma))
+        cached = self.luts.get(key)
+        if cached is None or cached[0] != setting:
+            window, gamma = setting
+            if window is None:
+                table = self.default_table(view, chan, gamma)
+            else:
+                _, levels, _ = self.histogram(view, chan)
+                lo, hi = window
+                table = levels - np.float32(lo)
+                table *= np.float32(1 / (hi - lo))
+                np.clip(table, 0, 1, out=table)
+                np.power(table, np.float32(gamma), out=table)
+            self.luts[key] = cached = (setting, table)
+        return cached[1]
+
+    def layer(self, view, chan, gamma, out=None):
+        """The image of a channel with its window and gamma applied, in [0, 1]."""
+        index, _, _ = self.histogram(view, chan)
+        return np.take(self.lut(view, chan, gamma), index, out=out, mode="clip")
+
+    def gray(self, view, chan, gamma):
+        """One channel as a uint8 image. The buffer is reused by the next call."""
+        index, _, _ = self.histogram(view, chan)
+        if self.gray8 is None or self.gray8.shape != index.shape:
+            self.gray8 = np.empty(index.shape, dtype=np.uint8)
+
+        lut8 = (self.lut(view, chan, gamma) * np.float32(255)).astype(np.uint8)
+        return np.take(lut8, index, out=self.gray8, mode="clip")
+
+    def stack(self, view, gammas):
+        """Layers of a view with their window and gamma applied, (l, w, n_channels).
+
+        Only the layers whose setting changed since the last call are recomputed.
+        """
+        cached = self.stacks.get(view)
+        if cached is None:
+            l, w = self.images[view][self.channel_names[0]].shape
+            stack = np.empty((l, w, len(self.channel_names)), dtype=np.float32)
+            self.stacks[view] = cached = (stack, [None] * len(self.channel_names))
+
+        stack, applied = cached
+        for c, chan in enumerate(self.channel_names):
+            setting = (self.window(view, chan), float(gammas[c]))
+            if applied[c] != setting:
+                self.layer(view, chan, gammas[c], out=stack[..., c])
+                applied[c] = setting
+        return stack
+
+    def composite(self, view, gammas):
+        """Blend all channels of a view into an RGB image.
+
+        Parameters
+        ----------
+        view : int
+            Index of the view.
+        gammas : list
+            Gamma of each channel.
+
+        Returns
+        -------
+        rgb : numpy.ndarray
+            (l, w, 3) uint8 image. The buffer is reused by the next call.
+        """
+        stack = self.stack(view, gammas)
+        l, w, n_channels = stack.shape
+
+        if self.rgb is None or self.rgb.shape != (l, w, 3):
+            self.rgb = np.empty((l, w, 3), dtype=np.float32)
+            self.rgb8 = np.empty((l, w, 3), dtype=np.uint8)
+
+        np.matmul(
+            stack.reshape(-1, n_channels),
+            self.colors * np.float32(255),
+            out=self.rgb.reshape(-1, 3),
+        )
+        np.clip(self.rgb, 0, 255, out=self.rgb)
+        np.copyto(self.rgb8, self.rgb, casting="unsafe")
+        return self.rgb8
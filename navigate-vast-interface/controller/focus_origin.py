@@ -0,0 +1,81 @@
+# Third party imports
+import numpy as np
+
+# Estimate the Z focus origin (the centreline of the capillary / fish) in the side
+# view of the VAST.
+#
+# The image is cut into vertical strips. In each strip the rows are averaged
+# into an intensity profile, whose two strongest edges (the capillary walls, or
+# the outline of the fish) bracket the centreline. The median over the strips
+# is robust to strips without a clear edge pair.
+
+#: int: strips along x
+N_STRIPS = 16
+
+#: int: rows the profiles are smoothed over
+SMOOTHING = 5
+
+
+def row_profiles(im, n_strips=N_STRIPS, smoothing=SMOOTHING):
+    """Row intensity profiles of vertical strips of an image.
+
+    Returns
+    -------
+    profiles : numpy.ndarray
+        (rows, n_strips) mean intensity of each row in each strip, smoothed
+        along the rows.
+    """
+    im = np.asarray(im, dtype=np.float32)
+    l, w = im.shape
+    n_strips = max(min(n_strips, w), 1)
+    strip = w // n_strips
+    profiles = im[:, :strip * n_strips].reshape(l, n_strips, strip).mean(axis=2)
+
+    # moving average along the rows
+    if smoothing > 1 and l > smoothing:
+        c = np.cumsum(np.pad(profiles, ((1, 0), (0, 0))), axis=0)
+        profiles = (c[smoothing:] - c[:-smoothing]) / smoothing
+        pad = smoothing // 2
+        profiles = np.pad(profiles, ((pad, smoothing - 1 - pad), (0, 0)), mode="edge")
+    return profiles
+
+
+def estimate_focus_origin(im, min_gap=None, n_strips=N_STRIPS):
+    """Estimate the centreline row of the side view.
+
+    Parameters
+    ----------
+    im : numpy.ndarray
+        Side view, rows along Z as shown by the annotator.
+    min_gap : int
+        Smallest distance between the two edges, defaults to 5% of the rows.
+    n_strips : int
+        Vertical strips the image is cut into.
+
+    Returns
+    -------
+    estimate : dict
+        "z": centreline row, "spread": median absolute deviation of the strips'
+        centres, "agreement": fraction of strips within 2 spreads (at least 2
+        rows) of the estimate.
+    """
+    profiles = row_profiles(im, n_strips)
+    l = profiles.shape[0]
+    if min_gap is None:
+        min_gap = max(int(0.05 * l), 2)
+
+    # edge strength between consecutive rows
+    edges = np.abs(np.diff(profiles, axis=0))
+    rows = np.arange(edges.shape[0])[:, None]
+
+    first = np.argmax(edges, axis=0)
+    masked = np.where(np.abs(rows - first) < min_gap, -np.inf, edges)
+    second = np.argmax(masked, axis=0)
+
+    # edge i lies between rows i and i + 1
+    centres = (first + second) / 2 + 0.5
+
+    z = float(np.median(centres))
+    spread = float(np.median(np.abs(centres - z)))
+    agreement = float(np.mean(np.abs(centres - z) <= max(2 * spread, 2)))
+    return {"z": z, "spread": spread, "agreement": agreement}
@@ -0,0 +1,138 @@
+# Third party imports
+import numpy as np
+
+# Order of the MultiPositions of a fish that keeps the capillary rotations few
+# and short.
+#
+# Rotating the capillary is slow next to an XY move and is followed by settling,
+# so the positions are visited a rotation at a time: they are grouped by theta,
+# the groups ordered along the shortest rotation from the starting angle, and
+# the positions of each group along a short XY tour (nearest neighbour, improved
+# by 2-opt) costed by the VAST motion model.
+#
+# The VAST rotates by the difference of the table's angles, which Navigate keeps
+# within the theta limits, so angles are not wrapped around: the shortest path
+# goes to the nearer end of the angles first, then sweeps to the other end.
+
+#: float: angles closer than this are one rotation [deg]
+ANGLE_TOLERANCE = 0.01
+
+#: int: most 2-opt passes over a group
+MAX_PASSES = 20
+
+
+def rotation_order(angles, start):
+    """Angles in the order of the shortest rotation from `start` through all of them."""
+    angles = sorted(angles)
+    down = max(start - angles[0], 0.0)
+    up = max(angles[-1] - start, 0.0)
+    below = [a for a in reversed(angles) if a < start]
+    above = [a for a in angles if a >= start]
+    if down < up:
+        return [a for a in angles if a == start] + below + [a for a in above if a != start]
+    return above + below
+
+
+def count_rotations(positions, start=None):
+    """Rotations made visiting (x, y, z, theta, f) rows in order.
+
+    Parameters
+    ----------
+    positions : array_like
+        MultiPositions rows.
+    start : float
+        Angle before the first row [deg]. Defaults to the first row's.
+    """
+    thetas = np.asarray(positions, dtype=float).reshape(-1, 5)[:, 3]
+    if not thetas.size:
+        return 0
+    start = thetas[0] if start is None else start
+    return int(np.sum(np.abs(np.diff(np.r_[start, thetas])) >= ANGLE_TOLERANCE))
+
+
+def xy_tour(points, start, xy_times):
+    """Short open tour through points, from a start point.
+
+    Parameters
+    ----------
+    points : array_like
+        (n, 2) (x, y) positions [um].
+    start : tuple
+        (x, y) the stage comes from.
+    xy_times : callable
+        xy_times(dx, dy), durations of XY moves [s] of arrays of displacements,
+        e.g. MotionModel.xy_times.
+
+    Returns
+    -------
+    order : list
+        Indices of the points in visiting order.
+    """
+    nodes = np.vstack((np.reshape(start, (1, 2)), np.reshape(points, (-1, 2))))
+    n = len(nodes)
+    delta = nodes[None, :, :] - nodes[:, None, :]
+    # nested lists index much faster than an array in the loops below
+    cost = xy_times(delta[..., 0], delta[..., 1]).tolist()
+
+    # nearest neighbour
+    tour = [0]
+    left = set(range(1, n))
+    while left:
+        nearest = min(left, key=cost[tour[-1]].__getitem__)
+        tour += [nearest]
+        left.remove(nearest)
+
+    # 2-opt: reverse tour[i:j + 1] while it shortens the tour, the start stays first
+    for _ in range(MAX_PASSES):
+        improved = False
+        for i in range(1, n - 1):
+            for j in range(i + 1, n):
+                a, b, c = tour[i - 1], tour[i], tour[j]
+                d = tour[j + 1] if j + 1 < n else None
+                gain = cost[a][b] - cost[a][c]
+                if d is not None:
+                    gain += cost[c][d] - cost[b][d]
+                if gain > 1e-9:
+                    tour[i:j + 1] = tour[i:j + 1][::-1]
+                    improved = True
+        if not improved:
+            break
+    return [k - 1 for k in tour[1:]]
+
+
+def schedule_positions(positions, xy_times, start=None):
+    """Visiting order of MultiPositions, a rotation at a time.
+
+    Parameters
+    ----------
+    positions : array_like
+        (n, 5) (x, y, z, theta, f) rows in microns and degrees.
+    xy_times : callable
+        See xy_tour().
+    start : tuple
+        Stage (x, y, theta) before the first row. Defaults to the first row.
+
+    Returns
+    -------
+    order : numpy.ndarray
+        Indices of the rows in visiting order, `positions[order]` is the table.
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 5)
+    if not len(positions):
+        return np.zeros(0, dtype=int)
+    if start is None:
+        start = positions[0, [0, 1, 3]]
+
+    keys = np.round(positions[:, 3] / ANGLE_TOLERANCE)
+    angles = {}
+    for key, theta in zip(keys, positions[:, 3]):
+        angles.setdefault(key, theta)
+
+    order = []
+    xy = np.asarray(start[:2], dtype=float)
+    for theta in rotation_order(list(angles.values()), start[2]):
+        group = np.flatnonzero(keys == np.round(theta / ANGLE_TOLERANCE))
+        group = group[xy_tour(positions[group, :2], xy, xy_times)]
+        order += group.tolist()
+        xy = positions[group[-1], :2]
+    return np.array(order, dtype=int)
@@ -0,0 +1,94 @@
+# Standard library imports
+import os
+import re
+
+# Third party imports
+import numpy as np
+
+# Projections of the slices of a view, which the annotator can show instead of
+# the middle slice so that structures off that plane are visible.
+#
+# The slices are decoded one at a time into a reused buffer and folded into the
+# projection, so however deep the stack only one slice (and, for the mean, its
+# sum) is held besides the projection itself.
+
+#: tuple: what the annotator shows of each view and channel
+PROJECTIONS = ("slice", "max", "mean")
+
+#: re.Pattern: image file name, {channel}_{slice}.tif(f)
+SLICE_PATTERN = re.compile(r"^(?P<chan>.+)_(?P<slice>\d+)\.tiff?$", re.IGNORECASE)
+
+
+def slice_paths(view_dir, chan):
+    """Images of a channel in a view folder, in slice order."""
+    slices = []
+    for entry in os.scandir(view_dir):
+        match = SLICE_PATTERN.match(entry.name)
+        if match and match["chan"] == chan:
+            slices += [(int(match["slice"]), entry.path)]
+    return [path for _, path in sorted(slices)]
+
+
+def projection_key(paths, projection):
+    """Identity of a projection: its slices, and when the newest was written."""
+    mtime = max(os.stat(path).st_mtime_ns for path in paths)
+    return f"{projection}:{paths[0]}:{len(paths)}:{mtime}"
+
+
+def stack_layout(paths):
+    """Shape and dtype of the slices, read from the first one."""
+    from tifffile import tifffile
+
+    with tifffile.TiffFile(paths[0]) as tif:
+        series = tif.series[0]
+        return series.shape, series.dtype
+
+
+def project(paths, projection="max", out=None):
+    """Project slices, decoding them one after the other.
+
+    Parameters
+    ----------
+    paths : list
+        Slices, all of the same shape and dtype.
+    projection : str
+        "max" or "mean" intensity.
+    out : numpy.ndarray
+        Array to write the projection to, of the slices' shape and dtype (e.g. a
+        block of the image store). Allocated if None.
+
+    Returns
+    -------
+    projection : numpy.ndarray
+        `out`, the mean rounded to the slices' dtype.
+    """
+    from tifffile import tifffile
+
+    if projection not in ("max", "mean"):
+        raise ValueError(f"unknown projection {projection}")
+    shape, dtype = stack_layout(paths)
+    if out is None:
+        out = np.empty(shape, dtype)
+
+    buffer = np.empty(shape, dtype)
+    if projection == "max":
+        with tifffile.TiffFile(paths[0]) as tif:
+            tif.asarray(out=out)
+        for path in paths[1:]:
+            with tifffile.TiffFile(path) as tif:
+                tif.asarray(out=buffer)
+            np.maximum(out, buffer, out=out)
+        return out
+
+    # 16 bit slices sum exactly in float32 up to 256 slices, float64 beyond
+    exact = np.dtype(dtype).itemsize <= 2 and len(paths) <= 256
+    total = np.zeros(shape, np.float32 if exact else np.float64)
+    for path in paths:
+        with tifffile.TiffFile(path) as tif:
+            tif.asarray(out=buffer)
+        total += buffer
+    total /= len(paths)
+    if np.issubdtype(dtype, np.integer):
+        np.rint(total, out=total)
+    np.copyto(out, total, casting="unsafe")
+    return out
@@ -1,26 +1,198 @@
 # Standard library imports
 import os
+import sys
+import time
+import atexit
+import logging
+import threading
+from collections import deque
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait
 import numpy as np
 import tkinter as tk
 from tkinter import filedialog
 from copy import deepcopy
 
 # Third party imports
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
 from tifffile import tifffile
-from skimage.exposure import adjust_gamma
+# NOTE: the xml tools are imported where they are used, Navigate does not load
+# them itself, so sessions that never open the annotator do not pay for them.
 
 # Local application imports
 from navigate.controller.sub_controllers.gui import GUIController
 from navigate.tools.file_functions import load_yaml_file
-
-from navigate.tools.xml_tools import parse_xml
-import xml.etree.ElementTree as ET
+from navigate.tools.common_functions import load_module_from_file
 
 VAST_UM_PIX = 718.5/221 # Measured Cap / expt.CapWd
 
+# Rotations each annotated point is imaged at, cycled with the t key [deg]
+TILE_ANGLES = [[0.0], [0.0, 180.0], [0.0, 90.0, 180.0, 270.0]]
+# Visit the MultiPositions a rotation at a time along short XY tours (see
+# position_schedule.py) rather than in the order they were clicked, once they are
+# committed (see commit_positions). Off by default, o toggles it.
+SCHEDULE_POSITIONS = False
+
+CONTROLLER_DIR = Path(__file__).resolve().parent
+
+VAST_API_DIR = os.path.join(
+    Path(__file__).resolve().parent.parent, 'model', 'devices', 'APIs', 'vast'
+)
+
+# Plugin files are executed once per process, by
+# device_startup_functions.load_plugin_module. The loader itself is executed
+# by the first plugin file that needs it, the others find it in sys.modules.
+load_plugin_module = (
+    sys.modules.get('navigate_vast_interface.model.devices.plugin_device.device_startup_functions')
+    or load_module_from_file(
+        'device_startup_functions',
+        os.path.join(
+            Path(__file__).resolve().parent.parent,
+            'model', 'devices', 'plugin_device', 'device_startup_functions.py'
+        )
+    )
+).load_plugin_module
+
+# Opt-in timing of the annotator's entry points (see vast_profiling.py). Shift+P
+# profiles the GUI process for PROFILE_WINDOW seconds, in PROFILE_MODE ("calls",
+# "cprofile" or "sampling"), and writes the report to Navigate's logs folder.
+_profiler = load_plugin_module(
+    'vast_profiling', os.path.join(VAST_API_DIR, 'vast_profiling.py')
+).get_profiler('controller.vast')
+profiled = _profiler.profiled
+PROFILE_MODE = "cprofile"
+PROFILE_WINDOW = 60
+
+# structured events of the GUI side, see vast_events.py
+_events = load_plugin_module(
+    'vast_events', os.path.join(VAST_API_DIR, 'vast_events.py')
+).get_event_log('controller.vast')
+
+# Annotation sessions, one file per well (see annotation_session.py). Defaults to
+# vast_sessions in the Navigate configuration directory.
+SESSION_DIR = None
+
+# Plate results file the annotation of each fish is added to (see
+# vast_results.py). None for vast_results.sqlite in the Navigate directory,
+# False for none.
+RESULTS_PATH = None
+
+# Centreline estimated in a view of each well, {(view, well, image identities): estimate}
+_focus_origins = {}
+
+# Images of the annotator, shared with the model process. One store per process,
+# kept across popups so reopening a well does not decode it again.
+_image_store = None
+
+# Bytes of shared memory kept for images nobody uses any more (e.g. of the wells
+# annotated last), see vast_image_store.py
+IMAGE_STORE_CAPACITY = 256 * 2**20
+
+def get_image_store():
+    """Return the process' shared image store, None if shared memory is unavailable."""
+    global _image_store
+    if _image_store is None:
+        vast_image_store = load_plugin_module(
+            'vast_image_store',
+            os.path.join(Path(__file__).resolve().parent.parent, 'model', 'vast_image_store.py')
+        )
+        try:
+            _image_store = vast_image_store.SharedImageStore(
+                create=True, capacity=IMAGE_STORE_CAPACITY
+            )
+            atexit.register(_image_store.close)
+        except OSError as e:
+            _events.record("annotator", "image_store", outcome=e, level=logging.WARNING)
+            _image_store = False
+    return _image_store or None
+
+# Watcher of the VAST autostore (see autostore_watcher.py) and the newest well it
+# found, with its images decoded ahead of the annotator: {"well_dir", "views",
+# "channels", "slice", "images": {image key: image}}
+_autostore_watcher = None
+_ready_well = {}
+_ready_lock = threading.Lock()
+
+# How often an open annotator checks for a new well [ms]
+WATCH_INTERVAL_MS = 250
+
+# The crosshair is painted at the latest mouse position at most every
+# CROSSHAIR_INTERVAL_MS, the text bar updated at most every TEXT_INTERVAL_MS.
+# Motion events in between only record the position. 0 paints every event.
+CROSSHAIR_INTERVAL_MS = 16
+TEXT_INTERVAL_MS = 100
+
+def image_key(im_path):
+    """Identity of an image file: the modification time tells a rewritten file from
+    the one annotated (or shared) before."""
+    return f"{im_path}:{os.stat(im_path).st_mtime_ns}"
+
+def watch_autostore(root):
+    """Start watching an autostore for new wells, unless already watching it."""
+    global _autostore_watcher
+    if _autostore_watcher is not None:
+        if _autostore_watcher.root == root and _autostore_watcher.is_alive():
+            return _autostore_watcher
+        _autostore_watcher.stop()
+
+    autostore_watcher = load_plugin_module(
+        'autostore_watcher', os.path.join(CONTROLLER_DIR, 'autostore_watcher.py')
+    )
+    _autostore_watcher = autostore_watcher.AutostoreWatcher(root, preload_well).start()
+    return _autostore_watcher
+
+def preload_well(well_dir, views, channels, n_slices):
+    """Decode the images the annotator shows of a new well. Runs on the watcher thread.
+
+    Only the newest well is kept: it holds the fish in the capillary.
+    """
+    # middle slice, as parse_most_recent_well()
+    slice = n_slices // 2
+    images = {}
+    for view in views:
+        for chan in channels:
+            im_path = os.path.join(view, f"{chan}_{slice}.tiff")
+            try:
+                images[image_key(im_path)] = tifffile.imread(im_path)
+            except (OSError, ValueError) as e:
+                _events.record("annotator", f"preload {im_path}", outcome=e,
+                               level=logging.WARNING)
+                return
+
+    with _ready_lock:
+        _ready_well.clear()
+        _ready_well.update(
+            well_dir=well_dir, views=views, channels=channels, slice=slice, images=images
+        )
+
+# Threads decoding the images of a well together (file reads and TIFF decoding
+# release the GIL), kept across popups. 1 decodes on the GUI thread, as on a
+# single core, where the threads only add switching.
+DECODE_WORKERS = 1 if (os.cpu_count() or 1) == 1 else min(8, os.cpu_count() + 4)
+_decode_executor = None
+
+# The image store is not thread safe, its calls from the decoding threads take this
+_store_lock = threading.Lock()
+
+def decode_executor():
+    global _decode_executor
+    if _decode_executor is None:
+        _decode_executor = ThreadPoolExecutor(DECODE_WORKERS, thread_name_prefix="VAST-decode")
+    return _decode_executor
+
+# Projections of the slices shown instead of the middle slice (see
+# slice_projection.py). With the image store they are kept in it, in a group of
+# their own per well, otherwise here for the last well: {well folder: {key: image}}
+_projections = {}
+
+def image_group(well_dir, projection="slice"):
+    """Image store group of the images of a well, as the annotator shows them."""
+    return well_dir if projection == "slice" else f"{well_dir}:{projection}"
+
+def take_preloaded_image(key):
+    """Return (and forget) a preloaded image, None if it was not preloaded."""
+    with _ready_lock:
+        return _ready_well.get("images", {}).pop(key, None)
+
 class VastInterfaceController(GUIController):
 
     def __init__(self, view, parent_controller=None):
@@ -31,10 +203,83 @@ class VastInterfaceController(GUIController):
         plugin_config = load_yaml_file(config_path)
         self.plugin_name = plugin_config['name']
 
+        # VAST motion model, loaded on the first ETA estimate
+        self.motion_model = None
+        self.vast_api = None
+
+        # structured events of the GUI side, see vast_events.py
+        self.events = _events
+
+        # fish images live in shared memory, so model features can map them without copying
+        self.image_store = get_image_store()
+        self.image_keys = []
+        self.image_ids = []
+
+        self.session_dir = SESSION_DIR
+        if self.session_dir is None:
+            from navigate.config.config import get_navigate_path
+
+            self.session_dir = os.path.join(get_navigate_path(), 'vast_sessions')
+        self.annotation_session = load_plugin_module(
+            'annotation_session', os.path.join(CONTROLLER_DIR, 'annotation_session.py')
+        )
+
+        self.capillary_geometry = load_plugin_module(
+            'capillary_geometry', os.path.join(CONTROLLER_DIR, 'capillary_geometry.py')
+        )
+
+        self.position_schedule = load_plugin_module(
+            'position_schedule', os.path.join(CONTROLLER_DIR, 'position_schedule.py')
+        )
+
+        # the middle slice of each view and channel, or the projection of all slices
+        self.slice_projection = load_plugin_module(
+            'slice_projection', os.path.join(CONTROLLER_DIR, 'slice_projection.py')
+        )
+
+        # history of the fish annotated, see update_experiment_values
+        vast_results = load_plugin_module(
+            'vast_results', os.path.join(VAST_API_DIR, 'vast_results.py')
+        )
+        self.fish_key = vast_results.fish_key
+        self.results = None
+        if RESULTS_PATH is not False:
+            try:
+                self.results = vast_results.get_results_store(RESULTS_PATH, self.events.logger)
+            except (OSError, vast_results.sqlite3.Error) as e:
+                self.events.record(self.plugin_name, "results_file", outcome=e,
+                                   level=logging.ERROR)
+
+        # reference fish that annotations are proposed from (see propose_annotation)
+        self.reference_path = os.path.join(self.session_dir, 'reference.npz')
+        self.affine_registration = True
+        self.fish_registration = None
+
+        # crosshair painting (see move_crosshair): after() ids of the pending
+        # paint and text update, when they last ran, when the oldest event not
+        # painted yet arrived, and the input-to-paint latencies [s]
+        self.crosshair_due = None
+        self.text_due = None
+        self.crosshair_painted = 0.0
+        self.text_updated = 0.0
+        self.crosshair_event_time = None
+        self.crosshair_latencies = deque(maxlen=1000)
+        self.n_motion_events = 0
+        self.n_crosshair_paints = 0
+
+        # rotations and stage time the schedule saved on the last fish committed,
+        # shown in the text bar of the next wells (see commit_positions)
+        self.last_fish_str = ""
+
+        self.closed = False
         self.initialize()
 
+        # open new wells as soon as the VAST has written them
+        self.view.after(WATCH_INTERVAL_MS, self.check_ready_well)
+
         self.parent_controller.model.configuration['experiment']['VAST']['VASTAnnotatorStatus'] = True
 
+    @profiled
     def initialize(self):
         self.variables = self.view.get_variables()
         self.widgets = self.view.get_widgets()
@@ -57,6 +302,15 @@ class VastInterfaceController(GUIController):
         self.background = None
         self.locked = False
         self.setting_focus = False
+        self.eta_str = ""
+        # stage (x, y, theta) before the first position, see update_relative_positions
+        self.eta_start = None
+        self.proposed_positions = None
+        self.focus_confirmed = True
+        self.tile_angles = TILE_ANGLES[0]
+        self.schedule_positions = SCHEDULE_POSITIONS
+        # rotations of the scheduled table, and of the table in clicking order (see schedule())
+        self.schedule_stats = None
 
         # flip
         self.flip = self.widgets["flip"]["variable"]
@@ -74,6 +328,10 @@ class VastInterfaceController(GUIController):
         except KeyError:
             self.parent_controller.configuration['experiment']['VAST']['ZFocusPos'] = self.z_focus_pos
 
+        # composite of all channels
+        self.composite = self.widgets['composite']['variable']
+        self.widgets['composite']['button'].configure(command=self.draw_fish)
+
         # append nose
         self.append_nose = self.widgets['append_nose']['variable']
         # self.append_nose_button = self.widgets['append_nose']['button']
@@ -83,8 +341,8 @@ class VastInterfaceController(GUIController):
         self.vexp_path_var.set(self.vexp_path)
         self.vexp = self.parse_vexp()
 
-        # get channel names
-        recent_chans, recent_views, slice = self.parse_most_recent_well()
+        # get channel names, of the well the watcher found last if there is one
+        recent_chans, recent_views, slice = self.parse_ready_well() or self.parse_most_recent_well()
 
         self.channel_names = recent_chans
         self.view_names = recent_views
@@ -93,48 +351,134 @@ class VastInterfaceController(GUIController):
         self.gammas = [1.0] * len(self.channel_names)
 
         # load fish images
-        self.images = []
+        self.slice = slice
+        self.well_dir = str(Path(self.view_names[0]).parent)
+        self.projection = self.widgets['projection']['variable']
+        if self.projection.get() not in self.slice_projection.PROJECTIONS:
+            self.projection.set("slice")
+        self.widgets['projection']['button'].bind(
+            '<<ComboboxSelected>>', lambda event: self.set_projection()
+        )
+        self.load_well_images()
 
-        for v in range(self.n_views):
-            new_view = {}
-            for chan in self.channel_names:
-                new_view[chan] = self.load_image(
-                    dir=self.view_names[self.n_views - v - 1],
-                    # dir=self.view_names[v],
-                    chan=chan,
-                    slice=slice
-                )
-            self.images += [new_view]
+        # moves of the stage are recorded with the well open
+        self.well_opened = time.time()
+        self.parent_controller.configuration['experiment']['VAST']['Well'] = self.well_dir
 
-        self.l, self.w = self.images[0][self.channel_names[0]].shape
+        # pick up where the annotation of this well was left
+        self.session_path = self.annotation_session.session_path(self.session_dir, self.well_dir)
+        if not self.restore_session():
+            self.auto_focus_origin()
+
+        watch_autostore(str(Path(self.vexp['AutoStSetup']['_storeLocation']['text']).parent))
 
         # draw the fish widget
         self.draw_fish()
 
-        # widget events
-        self.fish_widget.fig.canvas.mpl_connect(
-            'motion_notify_event',
-            self.move_crosshair
-        )
+        # widget events, connected once when initialize() runs again for a new well
+        canvas = self.fish_widget.fig.canvas
+        for cid in getattr(self, 'canvas_cids', []):
+            canvas.mpl_disconnect(cid)
+        self.canvas_cids = [
+            canvas.mpl_connect('motion_notify_event', self.move_crosshair),
+            canvas.mpl_connect('button_press_event', self.on_click),
+            canvas.mpl_connect('key_press_event', self.key_press),
+            canvas.mpl_connect('scroll_event', self.mouse_wheel),
+        ]
 
-        self.fish_widget.fig.canvas.mpl_connect(
-            'button_press_event',
-            self.on_click
-        )
+        self.path_button.configure(command=self.load_vexp)
+        self.set_focus_button.configure(command=self.set_focus)
         
-        self.fish_widget.fig.canvas.mpl_connect(
-            'key_press_event',
-            self.key_press
-        )
+    def load_well_images(self):
+        """Load every view and channel of the well, as the projection selected."""
+        self.release_images()
+
+        sources = [
+            (self.view_names[self.n_views - v - 1], chan)
+            # (self.view_names[v], chan)
+            for v in range(self.n_views)
+            for chan in self.channel_names
+        ]
+        images = iter(self.load_images(sources, self.slice, self.projection.get()))
+        for v in range(self.n_views):
+            self.images += [{chan: next(images) for chan in self.channel_names}]
+
+        if self.image_store:
+            self.image_store.set_current_group(image_group(self.well_dir, self.projection.get()))
+            self.parent_controller.configuration['experiment']['VAST']['ImageStore'] = self.image_store.name
+
+        self.l, self.w = self.images[0][self.channel_names[0]].shape
 
-        self.fish_widget.fig.canvas.mpl_connect(
-            'scroll_event',
-            self.mouse_wheel
+        fish_renderer = load_plugin_module(
+            'fish_renderer', os.path.join(CONTROLLER_DIR, 'fish_renderer.py')
         )
+        self.renderer = fish_renderer.FishRenderer(self.images, self.channel_names)
+
+    def set_projection(self, projection=None):
+        """Show the middle slice ("slice") or the max/mean projection of all slices.
+
+        The image ids stay those of the middle slice, so the annotation and its
+        session are kept.
+        """
+        if projection is not None:
+            self.projection.set(projection)
+        self.load_well_images()
+        self.draw_fish()
+
+    def auto_focus_origin(self):
+        """Set the Z focus origin to the centreline estimated in the side view.
+
+        The estimate is only proposed: it is drawn and used for the positions,
+        but written to the experiment's ZFocusPos once the operator confirms it
+        (f key) or sets the origin by hand.
+        """
+        if self.n_views < 2:
+            return
+
+        self.z_focus_pos = self.estimate_centreline(1)['z']
+        self.focus_confirmed = False
+
+    def estimate_centreline(self, view):
+        """Centreline of the capillary / fish in a view (cached per well)."""
+        key = (view, self.well_dir, tuple(self.image_ids))
+        estimate = _focus_origins.get(key)
+        if estimate is None:
+            focus_origin = load_plugin_module(
+                'focus_origin', os.path.join(CONTROLLER_DIR, 'focus_origin.py')
+            )
+            estimate = focus_origin.estimate_focus_origin(self.images[view][self.channel_names[0]])
+            _focus_origins[key] = estimate
+        return estimate
+
+    def capillary_axis(self):
+        """(y, z) pixels of the capillary axis in the top and side views.
+
+        The side view's axis is the focus origin, the top view's is estimated.
+        """
+        return self.estimate_centreline(0)['z'], self.z_focus_pos
+
+    def cycle_tile_angles(self):
+        """Image every annotated point at the next set of rotations."""
+        i = TILE_ANGLES.index(self.tile_angles) if self.tile_angles in TILE_ANGLES else -1
+        self.tile_angles = TILE_ANGLES[(i + 1) % len(TILE_ANGLES)]
+        if self.positions and self.nose_position is not None:
+            self.update_relative_positions()
+        self.save_session()
+        self.update_text()
+
+    def toggle_schedule(self):
+        """Visit the positions a rotation at a time, or in the order they were clicked."""
+        self.schedule_positions = not self.schedule_positions
+        self.save_session()
+        self.update_text()
+
+    def confirm_focus(self):
+        self.focus_confirmed = True
+        self.update_experiment_values()
+        self.save_session()
+        self.draw_fish()
+        self.update_text()
 
-        self.path_button.configure(command=self.load_vexp)
-        self.set_focus_button.configure(command=self.set_focus)
-        
     def set_focus(self):
         self.setting_focus = True
         self.perspective = 1
@@ -149,8 +493,10 @@ class VastInterfaceController(GUIController):
         except KeyError:
             self.parent_controller.configuration['experiment']['VAST']['Flip'] = {}
             self.set_flip_experiment()
-        
+            return
+
         self.update_experiment_values()
+        self.save_session()
 
     def pull_flip_from_experiment(self):
         for axis in self.flip:
@@ -190,6 +536,44 @@ class VastInterfaceController(GUIController):
 
         return recent_chans, recent_views, slice
 
+    def parse_ready_well(self):
+        """Channels, views and slice of the newest well found by the autostore
+        watcher, as parse_most_recent_well(). None if there is none."""
+        with _ready_lock:
+            if not _ready_well:
+                return None
+            return list(_ready_well['channels']), list(_ready_well['views']), _ready_well['slice']
+
+    def ready_well_dir(self):
+        with _ready_lock:
+            return _ready_well.get('well_dir')
+
+    def check_ready_well(self):
+        """Open the newest well if nothing was annotated on this one yet, otherwise
+        offer it (n key). Runs every WATCH_INTERVAL_MS while the popup is open."""
+        if self.closed:
+            return
+
+        well_dir = self.ready_well_dir()
+        if well_dir is not None and well_dir != self.well_dir:
+            if not self.positions and self.nose_position is None:
+                self.next_well()
+            else:
+                self.update_text()
+
+        self.view.after(WATCH_INTERVAL_MS, self.check_ready_well)
+
+    @profiled
+    def next_well(self):
+        """Leave this well (its positions committed, its session saved) for the
+        newest one."""
+        well_dir = self.ready_well_dir()
+        if well_dir is None or well_dir == self.well_dir:
+            return
+        self.commit_positions()
+        self.save_session()
+        self.initialize()
+
     def load_vexp(self):
         vexp_file = filedialog.askopenfile(master=self.view, defaultextension="vexp", title="Load VAST experiment file...")
         self.vexp_path = vexp_file.name
@@ -197,12 +581,32 @@ class VastInterfaceController(GUIController):
         self.initialize()
 
     def parse_vexp(self):
+        import xml.etree.ElementTree as ET
+        from navigate.tools.xml_tools import parse_xml
+
         tree = ET.parse(self.vexp_path)
         return parse_xml(tree.getroot())
 
     def close(self):
+        # the autostore watcher keeps preloading the newest well, see resume()
+        self.closed = True
+        self.commit_positions()
+        self.save_session()
+        self.release_images()
         self.parent_controller.model.configuration['experiment']['VAST']['VASTAnnotatorStatus'] = False
 
+    def resume(self):
+        """Show the annotator again after close(), on the newest well the watcher
+        found meanwhile, if any."""
+        self.closed = False
+        self.parent_controller.model.configuration['experiment']['VAST']['VASTAnnotatorStatus'] = True
+        if self.ready_well_dir() not in (None, self.well_dir):
+            self.next_well()
+        else:
+            self.load_well_images()
+            self.draw_fish()
+        self.view.after(WATCH_INTERVAL_MS, self.check_ready_well)
+
     def update_experiment_values(self):
         if np.size(self.relative_positions):
             self.parent_controller.model.configuration['experiment']['MultiPositions'] = self.relative_positions
@@ -213,18 +617,226 @@ class VastInterfaceController(GUIController):
         if self.vexp_path:
             self.parent_controller.configuration['experiment']['VAST']['ExperimentFile'] = self.vexp_path
 
-        if self.z_focus_pos:
+        # an automatic estimate is not written until it is confirmed
+        if self.z_focus_pos and self.focus_confirmed:
             self.parent_controller.configuration['experiment']['VAST']['ZFocusPos'] = self.z_focus_pos
 
-    def load_image(self, dir, chan="", slice=3):
-        im_path = os.path.join(
-            dir,
-            f"{chan}_{slice}.tiff"
-        )
-
-        im = tifffile.imread(im_path)
-        return np.flip(im, axis=0)
+    def record_fish(self):
+        """Add the annotation of this fish to the plate results, queued for the
+        results writer thread."""
+        if self.results is not None and self.nose_position is not None:
+            self.results.record_fish(
+                self.fish_key(self.well_dir, self.image_ids),
+                self.well_dir,
+                experiment=self.vexp_path,
+                opened_at=self.well_opened,
+                annotation_s=time.time() - self.well_opened,
+                nose=self.nose_position,
+                z_focus_pos=self.z_focus_pos,
+                focus_confirmed=self.focus_confirmed,
+                flip="".join(axis for axis in self.flip if self.flip[axis].get()),
+                clicked=self.positions,
+                positions=self.relative_positions if np.size(self.relative_positions) else (),
+            )
 
+    def load_image(self, dir, chan="", slice=3):
+        return self.load_images([(dir, chan)], slice)[0]
+
+    @profiled
+    def load_images(self, sources, slice=3, projection="slice"):
+        """Load images of the well, decoding them in parallel.
+
+        Parameters
+        ----------
+        sources : list
+            (view folder, channel) of each image.
+        slice : int
+            Slice of the images.
+        projection : str
+            "slice" for that slice, "max" or "mean" for the projection of all of
+            them. The image ids (see save_session) are those of the slice either way.
+
+        Returns
+        -------
+        images : list
+            The images, in the order of `sources`, flipped for display.
+        """
+        jobs = []
+        for dir, chan in sources:
+            im_path = os.path.join(dir, f"{chan}_{slice}.tiff")
+            # the modification time tells a rewritten file from the one annotated
+            # (or shared) before
+            jobs += [(im_path, image_key(im_path), dir, chan, projection)]
+        self.image_ids += [job[1] for job in jobs]
+
+        if DECODE_WORKERS > 1 and len(jobs) > 1:
+            futures = [decode_executor().submit(self.decode_image, *job) for job in jobs]
+            wait(futures)
+            results = [
+                future.result() if future.exception() is None else future.exception()
+                for future in futures
+            ]
+        else:
+            results = [self.decode_image(*job) for job in jobs]
+
+        images = []
+        for result in results:
+            if isinstance(result, Exception):
+                continue
+            im, key, decoded = result
+            if self.image_store:
+                if decoded:
+                    self.image_store.publish(key)
+                self.image_keys += [key]
+            images += [np.flip(im, axis=0)]
+
+        # the images decoded keep their store references, release_images() frees them
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return images
+
+    def decode_image(self, im_path, key, dir, chan, projection="slice"):
+        """Decode an image, unless it is in the image store. Runs on a decoding thread.
+
+        Returns
+        -------
+        image : numpy.ndarray
+        key : str
+            Image store key of the image, `key` unless it is a projection.
+        decoded : bool
+            The image was decoded into a new block of the image store, which the
+            caller publishes.
+        """
+        if projection != "slice":
+            return self.project_slices(dir, chan, projection)
+
+        # decoded by the autostore watcher when the VAST wrote the well
+        preloaded = take_preloaded_image(key)
+
+        if not self.image_store:
+            if preloaded is None:
+                preloaded = tifffile.imread(im_path)
+            return preloaded, key, False
+
+        with _store_lock:
+            im = self.image_store.get(key)
+        if im is not None:
+            return im, key, False
+
+        group = str(Path(dir).parent)
+        if preloaded is not None:
+            with _store_lock:
+                im = self.image_store.allocate(key, preloaded.shape, preloaded.dtype, group=group)
+            np.copyto(im, preloaded)
+        else:
+            # decode straight into shared memory
+            with tifffile.TiffFile(im_path) as tif:
+                series = tif.series[0]
+                with _store_lock:
+                    im = self.image_store.allocate(key, series.shape, series.dtype, group=group)
+                tif.asarray(out=im)
+        return im, key, True
+
+    def project_slices(self, dir, chan, projection):
+        """Project all slices of a view's channel, unless the projection is cached.
+        Runs on a decoding thread, see decode_image()."""
+        slice_projection = self.slice_projection
+        paths = slice_projection.slice_paths(dir, chan)
+        key = slice_projection.projection_key(paths, projection)
+        well_dir = str(Path(dir).parent)
+
+        if not self.image_store:
+            with _store_lock:
+                im = _projections.get(well_dir, {}).get(key)
+            if im is None:
+                im = slice_projection.project(paths, projection)
+                with _store_lock:
+                    if well_dir not in _projections:
+                        _projections.clear()
+                    _projections.setdefault(well_dir, {})[key] = im
+            return im, key, False
+
+        with _store_lock:
+            im = self.image_store.get(key)
+        if im is not None:
+            return im, key, False
+
+        # accumulate straight into shared memory
+        shape, dtype = slice_projection.stack_layout(paths)
+        with _store_lock:
+            im = self.image_store.allocate(
+                key, shape, dtype, group=image_group(well_dir, projection)
+            )
+        slice_projection.project(paths, projection, out=im)
+        return im, key, True
+
+    def release_images(self):
+        """Drop the images of the previous well and give back their shared blocks."""
+        self.images = []
+        if self.image_store:
+            for key in self.image_keys:
+                self.image_store.release(key)
+            self.image_store.evict()
+        self.image_keys = []
+        self.image_ids = []
+
+    @profiled
+    def save_session(self):
+        """Write the annotation of this well to its session file."""
+        if not self.image_ids:
+            return
+        try:
+            self.annotation_session.save_session(
+                self.session_path,
+                image_ids=np.array(self.image_ids),
+                positions=np.array(self.positions, dtype=float).reshape(-1, 5),
+                nose_position=np.array(self.nose_position or [], dtype=float),
+                z_focus_pos=float(self.z_focus_pos or 0),
+                focus_confirmed=bool(self.focus_confirmed),
+                flip=np.array([self.flip[axis].get() for axis in self.flip], dtype=bool),
+                append_nose=bool(self.append_nose.get()),
+                gammas=np.array(self.gammas, dtype=float),
+                tile_angles=np.array(self.tile_angles, dtype=float),
+                schedule_positions=bool(self.schedule_positions),
+            )
+        except OSError as e:
+            self.events.record(self.plugin_name, "save_session", outcome=e,
+                               level=logging.ERROR)
+
+    @profiled
+    def restore_session(self):
+        """Restore the annotation of this well if it was made on the same images.
+
+        Returns
+        -------
+        bool
+            Was a session restored?
+        """
+        state = self.annotation_session.load_session(self.session_path, self.image_ids)
+        if state is None:
+            return False
+
+        self.positions = state['positions'].tolist()
+        self.nose_position = state['nose_position'].tolist() or None
+        self.z_focus_pos = float(state['z_focus_pos'])
+        self.focus_confirmed = bool(state.get('focus_confirmed', True))
+        for axis, value in zip(self.flip, state['flip']):
+            self.flip[axis].set(bool(value))
+        self.set_flip_experiment()
+        self.append_nose.set(bool(state['append_nose']))
+        if len(state['gammas']) == len(self.channel_names):
+            self.gammas = state['gammas'].tolist()
+        if 'tile_angles' in state:
+            self.tile_angles = state['tile_angles'].tolist()
+        if 'schedule_positions' in state:
+            self.schedule_positions = bool(state['schedule_positions'])
+
+        if self.positions and self.nose_position is not None:
+            self.update_relative_positions()
+        return True
+
+    @profiled
     def draw_fish(self):
         ax = self.fish_widget.ax
 
@@ -232,11 +844,7 @@ class VastInterfaceController(GUIController):
         ax.clear()
 
         # initialize plot
-        chan = self.channel_names[self.curr_channel]
-        ax.imshow(
-            adjust_gamma(self.images[self.perspective][chan], self.gammas[self.curr_channel]),
-            cmap='gray'
-        )
+        self.fish_image = ax.imshow(self.render_fish(), cmap='gray', vmin=0, vmax=255)
 
         # scale axes to VAST
         res = 0.5
@@ -276,10 +884,15 @@ class VastInterfaceController(GUIController):
         if len(self.positions) > 0:
             c = np.array(self.positions)
             ax.scatter(c[:,0], c[:,self.perspective+1], marker='+', color=[0,1,0])
+        if self.proposed_positions is not None:
+            c = self.proposed_positions
+            ax.scatter(c[:,0], c[:,self.perspective+1], marker='o', facecolors='none', edgecolors=[1,0.6,0])
 
         # display focus origin, if it exists
         if self.z_focus_pos and self.perspective == 1:
-            ax.hlines(self.z_focus_pos, 0, self.w, colors=[0,1,0], linestyles='--')
+            # orange until an automatic estimate is confirmed
+            color = [0,1,0] if self.focus_confirmed else [1,0.6,0]
+            ax.hlines(self.z_focus_pos, 0, self.w, colors=color, linestyles='--')
 
         # set up canvas
         self.fish_widget.canvas.draw()
@@ -287,13 +900,58 @@ class VastInterfaceController(GUIController):
             ax.bbox
         )
 
+    def render_fish(self):
+        """Current view as displayed: the composite, or the selected channel."""
+        if self.composite.get():
+            return self.renderer.composite(self.perspective, self.gammas)
+        return self.renderer.gray(
+            self.perspective,
+            self.channel_names[self.curr_channel],
+            self.gammas[self.curr_channel]
+        )
+
+    @profiled
+    def update_fish_image(self):
+        """Redraw the image only, keeping axes, ticks and annotations."""
+        ax = self.fish_widget.ax
+        canvas = self.fish_widget.canvas
+
+        # the image fills the axes: draw it and what lies on top of it over the
+        # last frame instead of redrawing the whole figure
+        self.fish_image.set_data(self.render_fish())
+        ax.draw_artist(self.fish_image)
+        for artist in ax.collections + list(ax.spines.values()):
+            ax.draw_artist(artist)
+        self.background = canvas.copy_from_bbox(ax.bbox)
+
+        for l in self.fish_widget.lines:
+            ax.draw_artist(l)
+        canvas.blit(ax.bbox)
+
+    def auto_contrast(self):
+        """Window the current channel (all channels in the composite) to its percentiles."""
+        if self.composite.get():
+            channels = range(len(self.channel_names))
+        else:
+            channels = [self.curr_channel]
+
+        for c in channels:
+            self.renderer.auto_contrast(self.perspective, self.channel_names[c])
+            self.gammas[c] = 1.0
+        self.update_fish_image()
+
     @staticmethod
     def coord2str(c):
         c = np.asarray(c) * VAST_UM_PIX
         return f"({c[0]:.2f}, {c[1]:.2f}, {c[2]:.2f})\t"
 
+    @profiled
     def update_text(self):
         tstr = f"channel: {self.channel_names[self.curr_channel]}"
+        if self.composite.get():
+            tstr += " (composite)"
+        if self.projection.get() != "slice":
+            tstr += f" ({self.projection.get()} projection)"
 
         tstr += "\tnose_position: "
         p0 = 0
@@ -311,75 +969,380 @@ class VastInterfaceController(GUIController):
         except TypeError:
             pass
 
+        if len(self.tile_angles) > 1:
+            tstr += "\tangles: " + "/".join(f"{a:g}" for a in self.tile_angles)
+
+        tstr += self.eta_str + self.last_fish_str
+
+        if self.proposed_positions is not None:
+            tstr += "\tproposed annotation: Enter to accept"
+
+        if not self.focus_confirmed:
+            tstr += "\tZ origin: automatic, f to confirm"
+
+        if self.ready_well_dir() not in (None, self.well_dir):
+            tstr += "\tnew well: n to open"
+
         self.text_var.set(tstr)
 
+    @profiled
     def move_crosshair(self, event):
         if not self.locked:
-            # create the new data    
+            # the latest position wins, it is painted when the next frame is due
             if self.perspective == 0:
                 self.x_pos = event.xdata
             self.y_pos = event.ydata
-            if not self.setting_focus:
-                self.fish_widget.lines[0].set_data([self.x_pos]*2, [0, self.l])
-            self.fish_widget.lines[1].set_data([0, self.w], [self.y_pos]*2)
 
-            # blit new data into old frame
-            self.fish_widget.canvas.restore_region(self.background)
-            for l in self.fish_widget.lines:
-                self.fish_widget.ax.draw_artist(l)
-            self.fish_widget.canvas.blit(self.fish_widget.ax.bbox)
-            self.fish_widget.canvas.flush_events()
+            now = time.perf_counter()
+            self.n_motion_events += 1
+            if self.crosshair_event_time is None:
+                self.crosshair_event_time = now
+            if self.crosshair_due is not None:
+                return
 
-            self.update_text()
+            wait_ms = CROSSHAIR_INTERVAL_MS - 1e3 * (now - self.crosshair_painted)
+            if wait_ms <= 0:
+                self.paint_crosshair()
+            else:
+                self.crosshair_due = self.view.after(
+                    int(np.ceil(wait_ms)), self.paint_crosshair
+                )
 
+    @profiled
+    def paint_crosshair(self):
+        """Draw the crosshair at the latest mouse position, then the text bar
+        if it is due."""
+        self.crosshair_due = None
+        if self.closed or self.crosshair_event_time is None:
+            return
+        # frames are CROSSHAIR_INTERVAL_MS apart from start to start
+        self.crosshair_painted = time.perf_counter()
+
+        if not self.setting_focus:
+            self.fish_widget.lines[0].set_data([self.x_pos]*2, [0, self.l])
+        self.fish_widget.lines[1].set_data([0, self.w], [self.y_pos]*2)
+
+        # blit new data into old frame
+        self.fish_widget.canvas.restore_region(self.background)
+        for l in self.fish_widget.lines:
+            self.fish_widget.ax.draw_artist(l)
+        self.fish_widget.canvas.blit(self.fish_widget.ax.bbox)
+        self.fish_widget.canvas.flush_events()
+
+        now = time.perf_counter()
+        self.crosshair_latencies.append(now - self.crosshair_event_time)
+        self.crosshair_event_time = None
+        self.n_crosshair_paints += 1
+
+        if self.text_due is None:
+            wait_ms = TEXT_INTERVAL_MS - 1e3 * (now - self.text_updated)
+            if wait_ms <= 0:
+                self.refresh_text()
+            else:
+                self.text_due = self.view.after(int(np.ceil(wait_ms)), self.refresh_text)
+
+    def refresh_text(self):
+        self.text_due = None
+        if self.closed:
+            return
+        self.text_updated = time.perf_counter()
+        self.update_text()
+
+    def crosshair_stats(self):
+        """Motion events, crosshair paints and input-to-paint latency.
+
+        The latency runs from the oldest motion event a paint shows to the end of
+        the paint, as seen by the handler: time spent in Tk's queue before the
+        event is handled is not included.
+
+        Returns
+        -------
+        stats : dict
+            "events", "paints", and "latency_p50_ms"/"latency_p99_ms" of the last
+            1000 paints.
+        """
+        latencies = np.array(self.crosshair_latencies) * 1e3
+        return {
+            "events": self.n_motion_events,
+            "paints": self.n_crosshair_paints,
+            "latency_p50_ms": float(np.percentile(latencies, 50)) if latencies.size else 0.0,
+            "latency_p99_ms": float(np.percentile(latencies, 99)) if latencies.size else 0.0,
+        }
+
+    @profiled
     def update_positions(self):
         new_position = deepcopy(self.coord)
         
         if self.nose_position is not None:
             self.positions += [new_position]
-            
-            do_flip = np.ones(3)
-            for i, axis in enumerate(self.flip):
-                if self.flip[axis].get():
-                    do_flip[i] = -1
-
-            self.relative_positions = np.zeros(np.shape(self.positions))
-            for i, p in enumerate(self.positions):
-                self.relative_positions[i,0] = do_flip[0] * (p[0] - self.nose_position[0]) * VAST_UM_PIX
-                self.relative_positions[i,1] = do_flip[1] * (p[1] - self.nose_position[1]) * VAST_UM_PIX
-                self.relative_positions[i,4] = do_flip[2] * (p[2] - self.z_focus_pos) * VAST_UM_PIX
-
-            # append nose positions to start
-            if self.append_nose.get():
-                self.relative_positions = np.vstack((
-                    [0, 0, 0, 0, 0],
-                    self.relative_positions
-                ))
-
-            self.update_multiposition_controller()
+            self.update_relative_positions()
         else:
             self.nose_position = new_position
 
+    def update_relative_positions(self, schedule=False):
+        """Convert the clicked positions to the MultiPositions table, and update
+        its ETA.
+
+        Each position is imaged at every rotation in tile_angles, grouped by
+        rotation. The ETA is estimated on the table as it is, e.g. in clicking
+        order while annotating.
+
+        Parameters
+        ----------
+        schedule : bool
+            If schedule_positions and there is more than one rotation, visit the
+            rotations along the shortest rotational path and the positions of
+            each along a short XY tour. Done once, by commit_positions().
+        """
+        do_flip = np.ones(3)
+        for i, axis in enumerate(self.flip):
+            if self.flip[axis].get():
+                do_flip[i] = -1
+
+        # the axis only matters once the capillary rotates
+        axis_yz = (0, 0)
+        if any(self.tile_angles):
+            axis_yz = self.capillary_axis()
+
+        self.relative_positions = self.capillary_geometry.stage_positions(
+            np.array(self.positions)[:, :3],
+            origin=(self.nose_position[0], self.nose_position[1], self.z_focus_pos),
+            thetas=self.tile_angles,
+            axis_yz=axis_yz,
+            um_per_pix=VAST_UM_PIX,
+            flip=do_flip,
+        )
+
+        # the stage comes from the nose if it is imaged first, else from the
+        # first clicked position; the schedule and the ETA estimate both tours
+        # from there, so that the time saved compares the same moves
+        if self.append_nose.get():
+            self.eta_start = (0.0, 0.0, 0.0)
+        else:
+            p = self.relative_positions[0]
+            self.eta_start = (p[0], p[1], p[3])
+        self.schedule_stats = None
+        if schedule and self.schedule_positions and len(set(self.tile_angles)) > 1:
+            self.schedule_stats = self.schedule(self.eta_start)
+
+        # append nose positions to start
+        if self.append_nose.get():
+            self.relative_positions = np.vstack((
+                [0, 0, 0, 0, 0],
+                self.relative_positions
+            ))
+
+        self.update_multiposition_controller()
+        self.update_eta()
+
+    def commit_positions(self):
+        """Hand the annotation of this fish over once it is done (the annotator
+        closes or moves to the next well): the MultiPositions table, scheduled if
+        schedule_positions, its ETA and the plate results."""
+        if not self.positions or self.nose_position is None:
+            return
+        self.update_relative_positions(schedule=True)
+        self.record_fish()
+        self.events.record(self.plugin_name, "commit_positions",
+                           outcome=self.eta_str.strip(), level=logging.INFO)
+
+        stats = self.schedule_stats
+        if stats is not None:
+            self.last_fish_str = (
+                f"\tlast fish: {stats['rotations']} rotations "
+                f"(clicked order {stats['input_rotations']}), {stats['time_saved']:.1f} s saved"
+            )
+            self.update_text()
+
+    def schedule(self, start=None):
+        """Reorder relative_positions a rotation at a time, see position_schedule.py.
+
+        Parameters
+        ----------
+        start : tuple
+            Stage (x, y, theta) before the first position. Defaults to the first
+            position.
+
+        Returns
+        -------
+        stats : dict
+            "rotations" of the scheduled table, "input_rotations" and
+            "input_stage_time" [s] of the table in clicking order. update_eta()
+            estimates the scheduled table from the same start, and adds its
+            "time_saved" [s].
+        """
+        model = self.stage_motion_model()
+        positions = self.relative_positions
+        if start is None:
+            start = (positions[0][0], positions[0][1], positions[0][3])
+        order = self.position_schedule.schedule_positions(positions, model.xy_times, start)
+
+        stats = {
+            "input_rotations": self.position_schedule.count_rotations(positions, start[2]),
+            "input_stage_time": self.estimate_stage_time(positions, start)['stage_time'],
+        }
+        self.relative_positions = positions[order]
+        stats["rotations"] = self.position_schedule.count_rotations(
+            self.relative_positions, start[2]
+        )
+        return stats
+
+    def stage_motion_model(self):
+        """The VAST motion model, with the calibration of previous moves."""
+        if self.motion_model is None:
+            self.motion_model = load_plugin_module(
+                'motion_model', os.path.join(VAST_API_DIR, 'motion_model.py')
+            )
+            self.vast_api = load_plugin_module(
+                'vast_controller', os.path.join(VAST_API_DIR, 'vast_controller.py')
+            )
+
+        model = self.motion_model.MotionModel()
+        try:
+            model.set_calibration(
+                self.parent_controller.configuration['experiment']['VAST']['MotionCalibration']
+            )
+        except KeyError:
+            pass
+        return model
+
+    def estimate_stage_time(self, positions=None, start=None):
+        """Predict the VAST stage time for a MultiPositions table.
+
+        Uses the motion model calibrated by the VAST stage during previous moves.
+
+        Parameters
+        ----------
+        positions : array_like
+            Table to visit, relative_positions if None.
+        start : tuple
+            Stage (x, y, theta) before the first position, see
+            motion_model.estimate_positions_time.
+
+        Returns
+        -------
+        estimate : dict
+            see motion_model.estimate_positions_time
+        """
+        model = self.stage_motion_model()
+        return self.motion_model.estimate_positions_time(
+            self.relative_positions if positions is None else positions,
+            model=model,
+            um_to_us=self.vast_api.VASTController.UM_TO_US,
+            deg_to_us=self.vast_api.VASTController.DEG_TO_US,
+            start=start,
+        )
+
+    def update_eta(self):
+        estimate = self.estimate_stage_time(start=self.eta_start)
+        self.eta_str = (
+            f"\tETA: stage {estimate['stage_time']:.1f} s, "
+            f"{estimate['fish_time']:.1f} s/fish"
+        )
+        stats = self.schedule_stats
+        if stats is not None:
+            stats["time_saved"] = stats["input_stage_time"] - estimate["stage_time"]
+            self.eta_str += (
+                f", {stats['rotations']} rotations (clicked order {stats['input_rotations']}), "
+                f"{stats['time_saved']:.1f} s saved"
+            )
+        self.update_text()
+
     def key_press(self, event):
+        # c toggles the composite, number keys select the channel shown (or the
+        # channel whose gamma the mouse wheel changes in the composite), a resets
+        # the contrast
+        if event.key == 'c':
+            self.composite.set(not self.composite.get())
+            self.draw_fish()
+            return
+
+        if event.key == 'a':
+            self.auto_contrast()
+            return
+
+        # r makes this fish the reference, p proposes its annotation for this
+        # fish, Enter accepts the proposal
+        if event.key == 'r':
+            self.set_reference()
+            return
+
+        if event.key == 'p':
+            self.propose_annotation()
+            return
+
+        if event.key == 'enter':
+            self.accept_proposal()
+            return
+
+        if event.key == 'f':
+            self.confirm_focus()
+            return
+
+        if event.key == 't':
+            self.cycle_tile_angles()
+            return
+
+        # o toggles visiting the positions a rotation at a time
+        if event.key == 'o':
+            self.toggle_schedule()
+            return
+
+        # n leaves this fish for the well the VAST wrote since
+        if event.key == 'n':
+            self.next_well()
+            return
+
+        # m cycles through the middle slice and the projections of all slices
+        if event.key == 'm':
+            projections = self.slice_projection.PROJECTIONS
+            i = projections.index(self.projection.get())
+            self.set_projection(projections[(i + 1) % len(projections)])
+            return
+
+        if event.key == 'P':
+            self.toggle_profiling()
+            return
+
         for c, _ in enumerate(self.channel_names):
-            if int(event.key) == (c+1):
+            if event.key == str(c+1):
                 self.curr_channel = c
                 self.draw_fish()
 
+    def toggle_profiling(self):
+        """Start profiling the annotator, or stop early and write the report."""
+        if _profiler.enabled:
+            path = _profiler.stop()
+            self.events.record(self.plugin_name, "stop_profiling", outcome=path,
+                               level=logging.INFO)
+            return
+        from navigate.config.config import get_navigate_path
+
+        _profiler.start(
+            PROFILE_MODE,
+            PROFILE_WINDOW,
+            os.path.join(get_navigate_path(), 'logs', 'vast_gui_profile_%Y%m%d_%H%M%S.txt'),
+        )
+        self.events.record(self.plugin_name, "start_profiling", outcome=PROFILE_MODE,
+                           level=logging.INFO)
+
     def mouse_wheel(self, event):
         self.gammas[self.curr_channel] += event.step * 0.02
         self.gammas[self.curr_channel] = np.clip(self.gammas[self.curr_channel], 0.02, 1.0)
-        self.draw_fish()
+        self.update_fish_image()
 
+    @profiled
     def on_click(self, event):
         if event.button == 1:
             if not self.locked:          
                 if self.setting_focus:
                     self.z_focus_pos = self.y_pos
+                    self.focus_confirmed = True
                     self.setting_focus = False
                     self.locked = True
                     self.set_focus_button.state(['!disabled'])
                     self.update_experiment_values()
+                    self.save_session()
                 elif self.perspective == 0:
                     self.coord[0] = self.x_pos # x
                     self.coord[1] = self.y_pos # y
@@ -387,6 +1350,7 @@ class VastInterfaceController(GUIController):
                 elif self.perspective == 1:
                     self.coord[2] = self.y_pos # z
                     self.update_positions()
+                    self.save_session()
                     self.perspective = 0
         elif event.button == 3:
             if self.perspective < self.n_views-1:
@@ -398,16 +1362,98 @@ class VastInterfaceController(GUIController):
 
         self.draw_fish()
 
+    def set_reference(self):
+        """Make the annotated fish the reference for propose_annotation."""
+        if self.nose_position is None:
+            self.events.record(self.plugin_name, "set_reference",
+                               outcome="annotate the nose first", level=logging.WARNING)
+            return
+
+        chan = self.channel_names[0]
+        views = {name: self.images[v][chan] for v, name in enumerate(['top', 'side'][:self.n_views])}
+        self.annotation_session.save_session(
+            self.reference_path,
+            channel=chan,
+            nose_position=np.array(self.nose_position, dtype=float),
+            positions=np.array(self.positions, dtype=float).reshape(-1, 5),
+            **views
+        )
+
+    @profiled
+    def propose_annotation(self):
+        """Map the annotation of the reference fish onto this fish.
+
+        The top and side images are registered against the reference (phase
+        correlation, optionally refined by a small affine transform). The
+        reference nose and positions mapped into this fish are shown as a
+        proposal, to accept with accept_proposal.
+        """
+        reference = self.annotation_session.load_session(self.reference_path)
+        if reference is None:
+            self.events.record(self.plugin_name, "propose_annotation",
+                               outcome="no reference fish, press r on an annotated fish",
+                               level=logging.WARNING)
+            return
+
+        if self.fish_registration is None:
+            self.fish_registration = load_plugin_module(
+                'fish_registration', os.path.join(CONTROLLER_DIR, 'fish_registration.py')
+            )
+        register = self.fish_registration.register
+        transform_points = self.fish_registration.transform_points
+
+        chan = str(reference['channel'])
+        if chan not in self.channel_names:
+            chan = self.channel_names[0]
+
+        # nose first, then the positions, as (x, y, z, theta, f)
+        points = np.vstack((reference['nose_position'][None, :], reference['positions']))
+        proposed = points.copy()
+
+        # x and y from the top view
+        A, t, _ = register(reference['top'], self.images[0][chan], affine=self.affine_registration)
+        proposed[:, :2] = transform_points(A, t, points[:, :2])
+
+        # z from the side view
+        if 'side' in reference and self.n_views > 1:
+            A, t, _ = register(reference['side'], self.images[1][chan], affine=self.affine_registration)
+            proposed[:, 2] = transform_points(A, t, points[:, [0, 2]])[:, 1]
+
+        self.proposed_positions = proposed
+        self.draw_fish()
+        self.update_text()
+
+    def accept_proposal(self):
+        """Replace the annotation of this fish with the proposed one."""
+        if self.proposed_positions is None:
+            return
+
+        self.nose_position = self.proposed_positions[0].tolist()
+        self.positions = self.proposed_positions[1:].tolist()
+        self.proposed_positions = None
+
+        if self.positions:
+            self.update_relative_positions()
+        self.save_session()
+        self.draw_fish()
+
     def update_multiposition_controller(self):
         self.parent_controller.multiposition_tab_controller.set_positions(self.relative_positions)
         self.update_experiment_values()
 
     def build_vast_popup(self, event):
-        print(f"Event = {event}")
+        t_start = time.perf_counter()
         try:
+            # shows this popup again if it was only closed, otherwise builds a new one
             self.parent_controller.plugin_controller.popup_funcs[self.plugin_name]()
+            if self.closed and self.view.winfo_exists():
+                self.resume()
         except Exception as e:
-            print(e)
+            self.events.record(self.plugin_name, "build_vast_popup",
+                               time.perf_counter() - t_start, e, logging.ERROR)
+        else:
+            self.events.record(self.plugin_name, "build_vast_popup",
+                               time.perf_counter() - t_start, event, logging.INFO)
 
     @property
     def custom_events(self):
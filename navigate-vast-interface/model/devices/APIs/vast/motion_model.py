@@ -0,0 +1,256 @@
+import math
+
+import numpy as np
+
+class MotionModel:
+    """Timing model of the VAST stage and capillary.
+
+    Each linear axis follows a trapezoidal velocity profile (accelerate, cruise,
+    decelerate). X and Y are driven together by a single "mrel" command, so an XY
+    move takes as long as its slowest axis. Capillary rotations are issued
+    separately after the XY move and are followed by a short settling time.
+
+    The XY and rotation times are multiplied by `xy_scale` and `theta_scale`.
+    observe() fits these two factors to measured move durations (exponentially
+    forgetting least squares, regularized towards the previous calibration), so
+    the model tracks the real instrument as moves are made.
+
+    Units: positions in [um], angles in [deg], times in [s].
+    """
+
+    # weight of the previous calibration in the fit [s^2]
+    PRIOR_WEIGHT = 0.01
+    # per-observation decay of older measurements
+    FORGETTING = 0.98
+
+    DEFAULTS = {
+        "x_velocity": 5000.0,           # [um/s]
+        "x_acceleration": 20000.0,      # [um/s^2]
+        "y_velocity": 5000.0,           # [um/s]
+        "y_acceleration": 20000.0,      # [um/s^2]
+        "theta_velocity": 180.0,        # [deg/s]
+        "theta_acceleration": 720.0,    # [deg/s^2]
+        "theta_settle": 0.05,           # [s]
+        "command_overhead": 0.005,      # [s] per command sent over the pipe
+        "load_time": 8.0,               # [s] load a fish into the capillary
+        "eject_time": 3.0,              # [s] eject a fish from the capillary
+        "tolerance": 0.02,              # moves smaller than this are skipped
+        "xy_scale": 1.0,                # calibration of XY move times
+        "theta_scale": 1.0,             # calibration of rotation times
+    }
+
+    def __init__(self, **params):
+        unknown = set(params) - set(MotionModel.DEFAULTS)
+        if unknown:
+            raise KeyError(f"Unknown motion model parameters: {sorted(unknown)}")
+
+        self.params = dict(MotionModel.DEFAULTS)
+        self.params.update({k: float(v) for k, v in params.items()})
+
+        self.n_observations = 0
+        self._reset_fit()
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["params"][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    @staticmethod
+    def profile_time(distance, velocity, acceleration):
+        """Duration of a point-to-point move with a trapezoidal velocity profile.
+
+        Parameters
+        ----------
+        distance : float
+            Length of the move. The sign is ignored.
+        velocity : float
+            Maximum velocity.
+        acceleration : float
+            Acceleration and deceleration.
+
+        Returns
+        -------
+        float
+            Duration of the move in seconds.
+        """
+        distance = abs(distance)
+        if distance == 0:
+            return 0.0
+        if acceleration <= 0:
+            return distance / velocity
+
+        # short moves never reach cruising velocity (triangular profile)
+        if distance < velocity ** 2 / acceleration:
+            return 2 * math.sqrt(distance / acceleration)
+        return distance / velocity + velocity / acceleration
+
+    @staticmethod
+    def profile_times(distances, velocity, acceleration):
+        """profile_time() of an array of distances."""
+        distances = np.abs(np.asarray(distances, dtype=float))
+        if acceleration <= 0:
+            return distances / velocity
+        return np.where(
+            distances < velocity ** 2 / acceleration,
+            2 * np.sqrt(distances / acceleration),
+            distances / velocity + velocity / acceleration,
+        )
+
+    def axis_time(self, axis, distance):
+        """Duration of a move of `distance` along one of "x", "y" or "theta"."""
+        return MotionModel.profile_time(
+            distance,
+            self.params[f"{axis}_velocity"],
+            self.params[f"{axis}_acceleration"],
+        )
+
+    def _xy_time(self, dx, dy):
+        if abs(dx) < self.tolerance and abs(dy) < self.tolerance:
+            return 0.0
+        return self.command_overhead + max(
+            self.axis_time("x", dx), self.axis_time("y", dy)
+        )
+
+    def _theta_time(self, dtheta):
+        if abs(dtheta) < self.tolerance:
+            return 0.0
+        return (
+            self.command_overhead
+            + self.axis_time("theta", dtheta)
+            + self.theta_settle
+        )
+
+    def xy_time(self, dx, dy):
+        """Duration of a combined XY move, including the command overhead."""
+        return self.xy_scale * self._xy_time(dx, dy)
+
+    def xy_times(self, dx, dy):
+        """xy_time() of arrays of displacements, e.g. between all pairs of positions."""
+        dx, dy = np.abs(dx), np.abs(dy)
+        times = self.command_overhead + np.maximum(
+            MotionModel.profile_times(dx, self.x_velocity, self.x_acceleration),
+            MotionModel.profile_times(dy, self.y_velocity, self.y_acceleration),
+        )
+        return self.xy_scale * np.where((dx < self.tolerance) & (dy < self.tolerance), 0.0, times)
+
+    def theta_time(self, dtheta):
+        """Duration of a capillary rotation, including overhead and settling."""
+        return self.theta_scale * self._theta_time(dtheta)
+
+    def move_time(self, dx=0.0, dy=0.0, dtheta=0.0):
+        """Duration of a move_to_specified_position with the given displacements."""
+        return self.xy_time(dx, dy) + self.theta_time(dtheta)
+
+    # calibration
+    def _reset_fit(self):
+        self._A = [[0.0, 0.0], [0.0, 0.0]]
+        self._b = [0.0, 0.0]
+        self._prior = (self.xy_scale, self.theta_scale)
+
+    def observe(self, dx=0.0, dy=0.0, dtheta=0.0, duration=0.0):
+        """Update the calibration with the measured duration of a move.
+
+        Parameters
+        ----------
+        dx, dy : float
+            XY displacement of the move [um].
+        dtheta : float
+            Rotation of the move [deg].
+        duration : float
+            Measured wall time of the move, including waiting for the motors [s].
+        """
+        phi = (self._xy_time(dx, dy), self._theta_time(dtheta))
+        if phi == (0.0, 0.0):
+            return
+
+        lam = MotionModel.FORGETTING
+        for i in range(2):
+            self._b[i] = lam * self._b[i] + phi[i] * duration
+            for j in range(2):
+                self._A[i][j] = lam * self._A[i][j] + phi[i] * phi[j]
+
+        # ridge solution (A + wI) s = b + w s0 of the 2x2 system
+        w = MotionModel.PRIOR_WEIGHT
+        a00, a01 = self._A[0][0] + w, self._A[0][1]
+        a10, a11 = self._A[1][0], self._A[1][1] + w
+        b0 = self._b[0] + w * self._prior[0]
+        b1 = self._b[1] + w * self._prior[1]
+        det = a00 * a11 - a01 * a10
+
+        self.params["xy_scale"] = min(max((b0 * a11 - a01 * b1) / det, 0.1), 10.0)
+        self.params["theta_scale"] = min(max((a00 * b1 - a10 * b0) / det, 0.1), 10.0)
+        self.n_observations += 1
+
+    def calibration(self):
+        """Return the calibration as a plain dict (e.g. to store in the experiment)."""
+        return {
+            "xy_scale": self.xy_scale,
+            "theta_scale": self.theta_scale,
+            "n_observations": self.n_observations,
+        }
+
+    def set_calibration(self, calibration):
+        """Restore a calibration returned by calibration()."""
+        if not calibration:
+            return
+        for key in ("xy_scale", "theta_scale"):
+            if key in calibration:
+                self.params[key] = float(calibration[key])
+        self.n_observations = int(calibration.get("n_observations", 0))
+        self._reset_fit()
+
+
+def estimate_positions_time(positions, model=None, um_to_us=1.0, deg_to_us=1.0, start=None):
+    """Predict the VAST stage time to visit a MultiPositions table in order.
+
+    Moves are quantized to whole microsteps the way VASTController sends them:
+    each relative "mrel"/"rot" command is the distance from the tracked
+    (unquantized) position to the absolute target, truncated to int, and the
+    tracked position then becomes the target. The estimate therefore follows
+    what the VAST will actually be asked to do.
+
+    Parameters
+    ----------
+    positions : array-like
+        Rows of (x, y, z, theta, f), as produced by VastInterfaceController.
+        Only x, y [um] and theta [deg] are moved by the VAST.
+    model : MotionModel
+        Calibrated motion model. Uses the defaults if None.
+    um_to_us : float
+        Microsteps per micron, VASTController.UM_TO_US.
+    deg_to_us : float
+        Microsteps per degree, VASTController.DEG_TO_US.
+    start : tuple
+        Stage (x, y, theta) before the first position. Defaults to the first
+        position, i.e. the stage is already there.
+
+    Returns
+    -------
+    estimate : dict
+        "move_times" duration of the move to each position [s], "stage_time"
+        their sum [s] and "fish_time" the stage time plus loading and ejecting
+        the fish [s].
+    """
+    model = model if model is not None else MotionModel()
+
+    positions = [list(p) for p in positions]
+    move_times = []
+    if positions:
+        if start is None:
+            start = (positions[0][0], positions[0][1], positions[0][3])
+        x, y, theta = start
+
+        for p in positions:
+            dx = int((p[0] - x) * um_to_us) / um_to_us
+            dy = int((p[1] - y) * um_to_us) / um_to_us
+            dtheta = int((p[3] - theta) * deg_to_us) / deg_to_us
+            x, y, theta = p[0], p[1], p[3]
+            move_times += [model.move_time(dx, dy, dtheta)]
+
+    stage_time = sum(move_times)
+    return {
+        "move_times": move_times,
+        "stage_time": stage_time,
+        "fish_time": stage_time + model.load_time + model.eject_time,
+    }
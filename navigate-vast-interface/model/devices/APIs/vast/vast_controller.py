@@ -1,8 +1,107 @@
+import os
+import sys
 import time
 import struct
+import queue
+import logging
+import weakref
+import itertools
+import threading
 import subprocess
+from pathlib import Path
+from collections import deque
+from concurrent.futures import CancelledError, Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from navigate.tools.common_functions import load_module_from_file
+
+# Plugin files are executed once per process, by
+# device_startup_functions.load_plugin_module. The loader itself is executed
+# by the first plugin file that needs it, the others find it in sys.modules.
+load_plugin_module = (
+    sys.modules.get("navigate_vast_interface.model.devices.plugin_device.device_startup_functions")
+    or load_module_from_file(
+        "device_startup_functions",
+        os.path.join(
+            Path(__file__).resolve().parents[2], "plugin_device", "device_startup_functions.py"
+        ),
+    )
+).load_plugin_module
+
+vast_events = load_plugin_module(
+    "vast_events",
+    os.path.join(Path(__file__).resolve().parent, "vast_events.py"),
+)
+vast_profiling = load_plugin_module(
+    "vast_profiling",
+    os.path.join(Path(__file__).resolve().parent, "vast_profiling.py"),
+)
+vast_recorder = load_plugin_module(
+    "vast_recorder",
+    os.path.join(Path(__file__).resolve().parent, "vast_recorder.py"),
+)
+profiled = vast_profiling.get_profiler().profiled
+
+class VASTTimeoutError(TimeoutError):
+    """The VAST did not answer a command, or finish a move, in time."""
+
+class VASTCancelledError(CancelledError):
+    """A move (or the wait for it) was interrupted by interrupt_move()."""
+
+# Priorities of the pipe requests, lowest first. Stops and status queries jump
+# ahead of queued moves; requests of the same priority keep their order.
+PRIORITY_URGENT = 0
+PRIORITY_QUERY = 1
+PRIORITY_BULK = 2
+
+COMMAND_PRIORITIES = {
+    "stop": PRIORITY_URGENT,
+    "busy": PRIORITY_QUERY,
+    "get_autost": PRIORITY_QUERY,
+}
+
+# extra time a caller waits for the I/O thread past the deadline of a request,
+# which the I/O thread enforces itself when the pipe can be polled
+REPLY_MARGIN = 0.05
+
+def _serve(controller_ref, requests):
+    """Body of a controller's I/O thread: the only code touching the pipe.
+
+    Holds the controller through a weak reference between requests, so a
+    controller nobody uses any more is still collected (and closed).
+    """
+    while True:
+        priority, _, request, deadline, future = requests.get()
+        if request is None:
+            break
+        controller = controller_ref()
+        if not future.set_running_or_notify_cancel():
+            # timed out while queued
+            if controller is not None:
+                controller._record(request, b"", time.perf_counter(), vast_recorder.UNSENT)
+            del controller
+            continue
+
+        if controller is None:
+            future.set_exception(ValueError("VAST connection closed"))
+            break
+        try:
+            reply = controller._exchange(request, deadline)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(reply)
+        del controller
 
 class VASTController:
+    """Connection to one VAST unit through the VastNavigateServer pipe.
+
+    Every request goes through a priority queue served by one I/O thread, which
+    owns the pipe. Any number of threads (Navigate's stage thread, the VAST
+    worker, `commands` from the model) can therefore send at the same time
+    without interleaving the length-prefixed frames, and "stop"/"busy" are
+    served before moves already queued (see COMMAND_PRIORITIES).
+    """
     
     # 1 um = 21333.33 microsteps
     # 1 step = 0.72 degrees
@@ -12,9 +111,14 @@ class VASTController:
     def __init__(
             self,
             holster = "c:\\Users\\vastopmv3\\Documents\\NET\\Projects\\VastNavigateServer\\bin\\Debug\\VastNavigateServer.exe",
+            pipe = None,
+            pipe_name = r'\\.\pipe\VastServerPipe',
         ):
         self.holster = holster
-        self.f = None
+        # Each VAST unit is served on its own pipe
+        self.pipe_name = pipe_name
+        # An already opened pipe (e.g. a VastServerEmulator) skips connect()
+        self.f = pipe
         # self.vast_process = subprocess.Popen(self.holster)
         
         # Stage starts at (x,y) = home when you boot up the VAST by default
@@ -27,29 +131,108 @@ class VASTController:
 
         self.wait_until_done = False
 
-        self.connect()
+        # Deadlines [s] of a command's reply and of waiting for the motors. None
+        # waits forever.
+        self.timeout = 5.0
+        self.move_timeout = 120.0
+
+        # {command: priority}, PRIORITY_BULK for the others
+        self.priorities = COMMAND_PRIORITIES
+
+        # (request, time written) of timed out commands, whose replies are still
+        # to be read before the next reply
+        self.owed_replies = deque()
+        # incremented by interrupt_move(), moves started before it are cancelled
+        self.stop_generation = 0
+
+        # statistics, updated by the I/O thread and the callers' threads under
+        # stats_lock
+        self.stats_lock = threading.Lock()
+        self.n_timeouts = 0
+        self.n_cancelled = 0
+        self.n_interrupts = 0
+
+        # Optional PipeRecorder logging every request with its reply, timeout or
+        # late reply (see vast_recorder.py)
+        self.recorder = None
+
+        # Structured log of the commands sent (see vast_events.py)
+        self.events = vast_events.get_event_log()
+
+        if self.f is None:
+            self.connect()
+        self.reply_ready = self._reply_poller()
+
+        # (priority, sequence, request, deadline, future), see _serve()
+        self.requests = queue.PriorityQueue()
+        self.sequence = itertools.count()
+        self.io_thread = threading.Thread(
+            target=_serve,
+            args=(weakref.ref(self), self.requests),
+            name=f"VAST-io {self.pipe_name}",
+            daemon=True,
+        )
+        self.io_thread.start()
 
     def __del__(self):
         self.close()
         # self.vast_process.kill() # Maybe don't just rudely kill the process... Is there a VAST.shutdown()?
 
     def close(self):
+        """Send the queued requests, stop the I/O thread and close the pipe."""
+        io_thread = getattr(self, "io_thread", None)
+        if io_thread is not None and io_thread.is_alive():
+            self.requests.put((PRIORITY_BULK + 1, next(self.sequence), None, None, None))
+            if threading.current_thread() is not io_thread:
+                io_thread.join(self.timeout)
+        if self.recorder is not None:
+            self.recorder.close()
         self.f.close()
         
     def connect(self):
         connect_init = False
 
-        print("Beginning VAST connection...")
+        self.events.record(self.pipe_name, "connect", level=logging.INFO)
 
         while not connect_init:
             try:
-                self.f = open(r'\\.\pipe\VastServerPipe', 'r+b', 0)
+                self.f = open(self.pipe_name, 'r+b', 0)
                 connect_init = True
             except:
                 time.sleep(1)
-                print("Waiting for connection...")
+                self.events.record(self.pipe_name, "connect", outcome="waiting",
+                                   level=logging.INFO)
             
-        print("Connection established!")
+        self.events.record(self.pipe_name, "connect", outcome="connected",
+                           level=logging.INFO)
+
+    def _reply_poller(self):
+        """Return a function telling whether a reply can be read without blocking.
+
+        None if the pipe cannot be polled, replies are then read without deadline.
+        """
+        reply_ready = getattr(self.f, "reply_ready", None)
+        if reply_ready is not None or os.name != "nt":
+            return reply_ready
+
+        # named pipe opened unbuffered, nothing is held back on the python side
+        try:
+            import ctypes
+            import msvcrt
+            from ctypes import wintypes
+
+            handle = msvcrt.get_osfhandle(self.f.fileno())
+            peek = ctypes.windll.kernel32.PeekNamedPipe
+            available = wintypes.DWORD()
+        except (ImportError, AttributeError, OSError):
+            return None
+
+        def reply_ready():
+            if not peek(handle, None, 0, None, ctypes.byref(available), None):
+                raise OSError(f"PeekNamedPipe failed on {self.pipe_name}")
+            return available.value >= 4
+
+        return reply_ready
 
     def get_current_position(self):
         return (
@@ -58,20 +241,118 @@ class VASTController:
             self.theta_pos
         )
 
-    def send(self, s):
+    @profiled
+    def send(self, s, timeout=-1, priority=None):
+        """Send a request and return its reply (None if empty).
+
+        Safe to call from any thread: the request is queued for the I/O thread.
+
+        Parameters
+        ----------
+        s : str
+            Request, e.g. "mrel,0,100,200".
+        timeout : float
+            Deadline of the reply [s], queueing included. self.timeout if -1,
+            none if None.
+        priority : int
+            Queue priority, by default from self.priorities.
+
+        Raises
+        ------
+        VASTTimeoutError
+            No reply in time. The reply is skipped when it arrives.
+        """
+        request = s
+        t_send = time.perf_counter()
+        if timeout == -1:
+            timeout = self.timeout
+        deadline = None if timeout is None else t_send + timeout
+        if priority is None:
+            priority = self.priorities.get(s.split(",", 1)[0], PRIORITY_BULK)
+
+        future = Future()
+        self.requests.put((priority, next(self.sequence), request, deadline, future))
+        try:
+            try:
+                s = future.result(None if timeout is None else timeout + REPLY_MARGIN)
+            except VASTTimeoutError:
+                raise
+            except FutureTimeoutError:
+                # still queued, or stuck in a read that cannot be polled
+                future.cancel()
+                with self.stats_lock:
+                    self.n_timeouts += 1
+                raise VASTTimeoutError(f"no reply from {self.pipe_name}")
+        except Exception as e:
+            self.events.record(
+                self.pipe_name, request, time.perf_counter() - t_send, e, logging.ERROR
+            )
+            raise
+
+        # output data, if any
+        out_str = s.decode()
+        self.events.record(self.pipe_name, request, time.perf_counter() - t_send, out_str)
+
+        if out_str:
+            return out_str
+
+    def _exchange(self, request, deadline):
+        """Write a request and read its reply. Runs on the I/O thread only."""
+        # late replies of timed out requests come first
+        try:
+            while self.owed_replies:
+                self._wait_reply(deadline)
+                s = self._read_frame()
+                owed_request, owed_t_send = self.owed_replies.popleft()
+                self._record(owed_request, s, owed_t_send, vast_recorder.LATE_REPLY)
+        except VASTTimeoutError:
+            with self.stats_lock:
+                self.n_timeouts += 1
+            self._record(request, b"", time.perf_counter(), vast_recorder.UNSENT)
+            raise
+
+        t_send = time.perf_counter()
+
         # Write to pipe
-        self.f.write(struct.pack('I', len(s)) + s.encode(encoding="ascii"))   # Write str length and str
+        self.f.write(struct.pack('I', len(request)) + request.encode(encoding="ascii"))   # Write str length and str
         self.f.seek(0)                               # EDIT: This is also necessary
-        
+
         # read from pipe
+        if deadline is not None and self.reply_ready is not None:
+            try:
+                self._wait_reply(deadline)
+            except VASTTimeoutError:
+                self.owed_replies.append((request, t_send))
+                with self.stats_lock:
+                    self.n_timeouts += 1
+                self._record(request, b"", t_send, vast_recorder.TIMEOUT)
+                raise
+        s = self._read_frame()
+
+        self._record(request, s, t_send)
+        return s
+
+    def _record(self, request, reply, t_send, outcome=vast_recorder.REPLY):
+        """Pass an exchange ending now to the recorder, if any."""
+        if self.recorder is not None:
+            self.recorder.record(request, reply.decode(), t_send, time.perf_counter(), outcome)
+
+    def _wait_reply(self, deadline):
+        """Wait until a reply can be read, at most until `deadline`."""
+        if self.reply_ready is None or deadline is None or self.reply_ready():
+            return
+        delay = 5e-5
+        while not self.reply_ready():
+            if time.perf_counter() > deadline:
+                raise VASTTimeoutError(f"no reply from {self.pipe_name}")
+            time.sleep(delay)
+            delay = min(2 * delay, 1e-3)
+
+    def _read_frame(self):
         n = struct.unpack('I', self.f.read(4))[0]    # Read str length
         s = self.f.read(n)                           # Read str
         self.f.seek(0)                               # Important!!!
-        
-        # output data, if any
-        out_str = s.decode()
-        if out_str:
-            return out_str
+        return s
 
     def get_last_autostore_location(self):
         return self.send("get_autost")
@@ -87,13 +368,14 @@ class VASTController:
             f"rot,{steps}"
         )
 
-    def rotate_deg(self, theta):
+    def rotate_deg(self, theta, generation=None):
+        self.check_interrupted(generation)
         self.theta_pos += theta # All rotation moves are relative...
         
         self.rotate(int(theta * VASTController.DEG_TO_US))
 
         if self.wait_until_done:
-            self.wait()
+            self.wait(generation=generation)
 
     def move_rel(self, x, y):
         self.send(
@@ -105,7 +387,8 @@ class VASTController:
             f"mabs,0,{x},{y}"
         )
 
-    def move_rel_um(self, x_um, y_um):
+    def move_rel_um(self, x_um, y_um, generation=None):
+        self.check_interrupted(generation)
         self.x_pos += x_um
         self.y_pos += y_um
 
@@ -115,9 +398,10 @@ class VASTController:
         )
 
         if self.wait_until_done:
-            self.wait()
+            self.wait(generation=generation)
     
-    def move_abs_um(self, x_um, y_um):
+    def move_abs_um(self, x_um, y_um, generation=None):
+        self.check_interrupted(generation)
         self.x_pos = x_um
         self.y_pos = y_um
         
@@ -127,32 +411,113 @@ class VASTController:
         )
 
         if self.wait_until_done:
-            self.wait()
+            self.wait(generation=generation)
 
     # TODO: implement...
     def continue_operation(self):
         self.send("cont")
 
-    def wait(self):
+    @profiled
+    def wait(self, timeout=-1, generation=None):
+        """Poll the motors until they are idle. Logged as one "wait" event, whose
+        outcome is the number of polls.
+
+        Parameters
+        ----------
+        timeout : float
+            Deadline [s], self.move_timeout if -1, none if None.
+        generation : int
+            stop_generation when the move was requested. The wait is cancelled
+            if interrupt_move() was called since. Defaults to now.
+
+        Raises
+        ------
+        VASTTimeoutError
+            The motors are still busy at the deadline.
+        VASTCancelledError
+            The move was interrupted.
+        """
+        t_start = time.perf_counter()
+        if timeout == -1:
+            timeout = self.move_timeout
+        if generation is None:
+            generation = self.stop_generation
+
         busy_status = 1 # anything but zero
         itr = 0
         while busy_status:
+            self.check_interrupted(generation)
+            if timeout is not None and time.perf_counter() - t_start > timeout:
+                with self.stats_lock:
+                    self.n_timeouts += 1
+                raise VASTTimeoutError(f"{self.pipe_name} still busy after {timeout} s")
             busy_status = self.check_motors_busy_status()
-            print(f"Waiting {itr}:\t{busy_status}")
             itr += 1
             time.sleep(0.01)
+        self.events.record(self.pipe_name, "wait", time.perf_counter() - t_start, itr)
+
+    def check_interrupted(self, generation):
+        """Raise VASTCancelledError if interrupt_move() was called since `generation`."""
+        if generation is not None and generation != self.stop_generation:
+            with self.stats_lock:
+                self.n_cancelled += 1
+            raise VASTCancelledError(f"{self.pipe_name} move interrupted")
+
+    def interrupt_move(self):
+        """Stop the motors and cancel the moves (and waits) in progress.
+
+        Safe to call from any thread, "stop" is sent ahead of queued moves.
+        Moves requested with an older generation
+        raise VASTCancelledError before their next command or poll, so the
+        latency is at most one command.
+        """
+        t_start = time.perf_counter()
+        with self.stats_lock:
+            self.stop_generation += 1
+            self.n_interrupts += 1
+
+        reply = self.send("stop")
+        # the server answers with the position the motors stopped at
+        try:
+            x_us, y_us, theta_us = (int(v) for v in reply.split(","))
+        except (AttributeError, ValueError):
+            pass
+        else:
+            self.x_pos = x_us / VASTController.UM_TO_US
+            self.y_pos = y_us / VASTController.UM_TO_US
+            self.theta_pos = theta_us / VASTController.DEG_TO_US
+        self.events.record(self.pipe_name, "interrupt", time.perf_counter() - t_start,
+                           reply, logging.WARNING)
+
+    def faults(self):
+        """Timeouts, cancelled moves and interrupts of this connection."""
+        return {
+            "timeouts": self.n_timeouts,
+            "cancelled": self.n_cancelled,
+            "interrupts": self.n_interrupts,
+            "owed_replies": len(self.owed_replies),
+        }
 
     def check_motors_busy_status(self):
         return int(self.send("busy"))
 
-    def move_to_specified_position(self, x_pos=0.0, y_pos=0.0, theta_pos=0.0):
+    @profiled
+    def move_to_specified_position(self, x_pos=0.0, y_pos=0.0, theta_pos=0.0,
+                                   generation=None):
+        """Move to an absolute (x, y, theta).
+
+        generation: stop_generation when the move was requested, see wait().
+        """
+        if generation is None:
+            generation = self.stop_generation
 
         self.move_rel_um(
             x_um=(x_pos - self.x_pos),
-            y_um=(y_pos - self.y_pos)
+            y_um=(y_pos - self.y_pos),
+            generation=generation,
         )
 
         # If there is a theta move, do an "absolute" capillary rotation
         if theta_pos != self.theta_pos:
-            self.rotate_deg(theta=(theta_pos - self.theta_pos))
+            self.rotate_deg(theta=(theta_pos - self.theta_pos), generation=generation)
         
\ No newline at end of file
@@ -0,0 +1,195 @@
+import os
+import sys
+import struct
+import time
+from pathlib import Path
+
+from navigate.tools.common_functions import load_module_from_file
+
+# Plugin files are executed once per process, by
+# device_startup_functions.load_plugin_module. The loader itself is executed
+# by the first plugin file that needs it, the others find it in sys.modules.
+load_plugin_module = (
+    sys.modules.get("navigate_vast_interface.model.devices.plugin_device.device_startup_functions")
+    or load_module_from_file(
+        "device_startup_functions",
+        os.path.join(
+            Path(__file__).resolve().parents[2], "plugin_device", "device_startup_functions.py"
+        ),
+    )
+).load_plugin_module
+
+vast_api = load_plugin_module(
+    "vast_controller",
+    os.path.join(Path(__file__).resolve().parent, "vast_controller.py"),
+)
+motion_model = load_plugin_module(
+    "motion_model",
+    os.path.join(Path(__file__).resolve().parent, "motion_model.py"),
+)
+
+class VastServerEmulator:
+    """In-process stand-in for the VastNavigateServer named pipe.
+
+    Behaves like the binary file object VASTController opens on
+    \\\\.\\pipe\\VastServerPipe: every write is one or more length-prefixed
+    ascii requests, and the replies are read back with the same framing. Motion
+    commands keep the motors busy for the time given by a MotionModel, scaled by
+    `time_scale` (0 makes every move finish immediately).
+
+    Usage::
+
+        vast = VASTController(pipe=VastServerEmulator())
+    """
+
+    def __init__(self, model=None, time_scale=0.0, autost_dir="", latency=0.0):
+        self.model = model if model is not None else motion_model.MotionModel()
+        self.time_scale = time_scale
+        self.autost_dir = autost_dir
+        # round trip of a request through the server [s]
+        self.latency = latency
+
+        # positions in microsteps
+        self.x_us = 0
+        self.y_us = 0
+        self.theta_us = 0
+
+        self.busy_until = 0.0
+        self.closed = False
+
+        # motion in progress, for "stop": positions and time it started from
+        self.motion_start = (0, 0, 0)
+        self.motion_t0 = 0.0
+
+        # replies are held back until then, like a hung server (see stall())
+        self.stall_until = 0.0
+
+        self._in = b""
+        self._out = b""
+
+        # statistics
+        self.n_requests = 0
+        self.n_bytes = 0
+
+        self.handlers = {
+            "busy": self.handle_busy,
+            "mrel": self.handle_mrel,
+            "mabs": self.handle_mabs,
+            "rot": self.handle_rot,
+            "get_autost": self.handle_get_autost,
+            "set_autost": self.handle_set_autost,
+            "boot": lambda *args: "",
+            "cont": lambda *args: "",
+            "stop": self.handle_stop,
+        }
+
+    # file-like interface used by VASTController
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed pipe")
+        self._in += data
+        self.n_bytes += len(data)
+
+        while len(self._in) >= 4:
+            n = struct.unpack("I", self._in[:4])[0]
+            if len(self._in) < 4 + n:
+                break
+            request = self._in[4:4 + n].decode(encoding="ascii")
+            self._in = self._in[4 + n:]
+
+            reply = self.handle(request).encode(encoding="ascii")
+            self._out += struct.pack("I", len(reply)) + reply
+            if self.latency:
+                self.stall_until = max(self.stall_until, time.perf_counter() + self.latency)
+
+        return len(data)
+
+    def read(self, n):
+        if self.closed:
+            raise ValueError("read from closed pipe")
+        # a blocking pipe read waits for the reply
+        delay = self.stall_until - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        data, self._out = self._out[:n], self._out[n:]
+        return data
+
+    def reply_ready(self):
+        """Can a reply be read without blocking? (PeekNamedPipe of the real pipe)"""
+        return len(self._out) >= 4 and time.perf_counter() >= self.stall_until
+
+    def stall(self, duration):
+        """Hold back the replies for `duration` seconds."""
+        self.stall_until = time.perf_counter() + duration
+
+    def seek(self, offset, whence=0):
+        return 0
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    # protocol
+    def handle(self, request):
+        """Answer one request string, e.g. "mrel,0,100,200"."""
+        self.n_requests += 1
+        command, *args = request.split(",")
+        try:
+            handler = self.handlers[command]
+        except KeyError:
+            return f"unknown command: {command}"
+        return handler(*args)
+
+    def _dispatch(self, duration, start):
+        now = time.perf_counter()
+        if now >= self.busy_until:
+            self.motion_start = start
+            self.motion_t0 = now
+        self.busy_until = max(now, self.busy_until) + duration * self.time_scale
+
+    def handle_busy(self, *args):
+        return str(int(time.perf_counter() < self.busy_until))
+
+    def handle_mrel(self, axis, x, y):
+        x, y = int(x), int(y)
+        start = (self.x_us, self.y_us, self.theta_us)
+        self.x_us += x
+        self.y_us += y
+        self._dispatch(self.model.xy_time(
+            x / vast_api.VASTController.UM_TO_US,
+            y / vast_api.VASTController.UM_TO_US,
+        ), start)
+        return ""
+
+    def handle_mabs(self, axis, x, y):
+        return self.handle_mrel(axis, int(x) - self.x_us, int(y) - self.y_us)
+
+    def handle_rot(self, steps):
+        steps = int(steps)
+        start = (self.x_us, self.y_us, self.theta_us)
+        self.theta_us += steps
+        self._dispatch(self.model.theta_time(steps / vast_api.VASTController.DEG_TO_US), start)
+        return ""
+
+    def handle_stop(self, *args):
+        """Stop the motors where they are (linearly between start and target)."""
+        now = time.perf_counter()
+        if now < self.busy_until:
+            fraction = (now - self.motion_t0) / (self.busy_until - self.motion_t0)
+            target = (self.x_us, self.y_us, self.theta_us)
+            self.x_us, self.y_us, self.theta_us = (
+                int(round(a + fraction * (b - a)))
+                for a, b in zip(self.motion_start, target)
+            )
+            self.busy_until = now
+        return f"{self.x_us},{self.y_us},{self.theta_us}"
+
+    def handle_get_autost(self, *args):
+        return self.autost_dir
+
+    def handle_set_autost(self, *args):
+        # the directory itself may contain commas
+        self.autost_dir = ",".join(args)
+        return ""
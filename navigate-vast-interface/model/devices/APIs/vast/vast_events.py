@@ -0,0 +1,125 @@
+import time
+import logging
+from collections import deque
+
+class EventLog:
+    """Ring buffer of structured VAST events, forwarded to a Navigate logger.
+
+    An event is a (timestamp, level, device, command, duration, outcome) tuple.
+    Appending to the buffer is a single deque.append, which is atomic, so
+    recording from the stage, worker and GUI threads takes no lock. The oldest
+    events are dropped once `capacity` is reached.
+
+    Nothing is formatted when an event is recorded: the buffer keeps the raw
+    values and the logger only formats them if it is enabled for the level.
+    Events below `level` are neither kept nor logged.
+
+    Use get_event_log() for the log of a process.
+    """
+
+    def __init__(self, logger, capacity=4096, level=logging.DEBUG):
+        """
+        Parameters
+        ----------
+        logger : logging.Logger
+            Logger the events are forwarded to, e.g. Navigate's "model" logger.
+        capacity : int
+            Events kept in memory.
+        level : int
+            Events below this level are ignored.
+        """
+        self.logger = logger
+        self.level = level
+        self.events = deque(maxlen=capacity)
+
+    def record(self, device, command, duration=0.0, outcome="ok", level=logging.DEBUG):
+        """Record an event.
+
+        Parameters
+        ----------
+        device : str
+            Pipe or device the command was sent to.
+        command : str
+            Command, e.g. the request sent to the pipe.
+        duration : float
+            Duration of the command [s].
+        outcome : object
+            Reply, result or exception of the command.
+        level : int
+            Logging level of the event.
+        """
+        if level < self.level:
+            return
+        self.events.append((time.time(), level, device, command, duration, outcome))
+        if self.logger.isEnabledFor(level):
+            self.logger.log(
+                level, "VAST %s %s %.6f s: %s", device, command, duration, outcome
+            )
+
+    def snapshot(self):
+        """Events currently in the buffer, oldest first."""
+        # copying may race with an append from another thread, retry then
+        while True:
+            try:
+                return list(self.events)
+            except RuntimeError:
+                pass
+
+    def clear(self):
+        self.events.clear()
+
+    def dump(self, path=None):
+        """Format the buffered events, one tab separated line each.
+
+        Parameters
+        ----------
+        path : str
+            Write the lines to this file (time.strftime formatted), e.g.
+            "vast_events_%Y%m%d_%H%M%S.tsv". Only returned if None.
+
+        Returns
+        -------
+        lines : list
+            timestamp, level, device, command, duration [s] and outcome of each
+            event.
+        """
+        lines = [
+            "\t".join((
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t))
+                + f".{int((t % 1) * 1e6):06d}",
+                logging.getLevelName(level),
+                str(device),
+                str(command),
+                f"{duration:.6f}",
+                str(outcome),
+            ))
+            for t, level, device, command, duration, outcome in self.snapshot()
+        ]
+        if path is not None:
+            with open(time.strftime(path), "w") as f:
+                f.write("timestamp\tlevel\tdevice\tcommand\tduration\toutcome\n")
+                f.writelines(line + "\n" for line in lines)
+        return lines
+
+# event logs of this process, {logger name: EventLog}
+_event_logs = {}
+
+def get_event_log(name="model.vast", capacity=4096):
+    """Return the event log of a logger, created on first use.
+
+    Parameters
+    ----------
+    name : str
+        Logger name. Navigate's handlers are on "model" (model process) and
+        "controller" (GUI process), which "model.vast" and "controller.vast"
+        propagate to.
+    capacity : int
+        Events kept, if the log is created.
+
+    Returns
+    -------
+    event_log : EventLog
+    """
+    if name not in _event_logs:
+        _event_logs[name] = EventLog(logging.getLogger(name), capacity)
+    return _event_logs[name]
@@ -0,0 +1,294 @@
+import os
+import sys
+import time
+import functools
+import threading
+from collections import Counter
+
+#: tuple: what a profiling window records besides the timing of each call
+MODES = ("calls", "cprofile", "sampling")
+
+class Profiler:
+    """Opt-in timing of the plugin's entry points.
+
+    Methods decorated with profiled() only check a flag while the profiler is
+    off. Between start() and stop(), every call is timed (wall time, and CPU time
+    of the calling thread) and, depending on the mode:
+
+    * "calls": nothing else,
+    * "cprofile": the outermost profiled call of each thread runs under that
+      thread's cProfile.Profile, the statistics of all threads are merged.
+      Python >= 3.12 runs one profiler at a time, calls made while another
+      thread's is enabled are only timed,
+    * "sampling": a thread samples the stacks of all threads every `interval`
+      seconds, which costs the profiled code almost nothing.
+
+    A window started with a duration stops by itself and writes its report.
+    """
+
+    def __init__(self, name="vast"):
+        self.name = name
+        self.enabled = False
+        self.mode = "calls"
+        self.path = None
+
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # {method: [calls, wall time, cpu time, longest wall time]}
+        self.calls = {}
+        # cProfile.Profile of each thread ("cprofile"), those enabled right now,
+        # and the calls only timed because their profile could not be enabled
+        self.profiles = []
+        self.active = set()
+        self.n_unprofiled = 0
+        # {collapsed stack: samples} ("sampling")
+        self.samples = Counter()
+
+        self.timer = None
+        self.sampler = None
+        self.stop_event = threading.Event()
+        self.t_start = 0.0
+        self.t_stop = 0.0
+
+    def profiled(self, func):
+        """Decorator timing a function while the profiler is on."""
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            return self.call(name, func, args, kwargs)
+
+        return wrapper
+
+    def call(self, name, func, args, kwargs):
+        local = self.local
+        depth = getattr(local, "depth", 0)
+        profile = None
+        if depth == 0 and self.mode == "cprofile":
+            profile = getattr(local, "profile", None)
+            if profile is None:
+                import cProfile
+
+                profile = local.profile = cProfile.Profile()
+                with self.lock:
+                    self.profiles += [profile]
+
+        local.depth = depth + 1
+        t0 = time.perf_counter()
+        c0 = time.thread_time()
+        try:
+            if profile is not None:
+                try:
+                    # under the lock, so write() never reads a profile being enabled
+                    with self.lock:
+                        profile.enable()
+                        self.active.add(profile)
+                except ValueError:
+                    # another profiler is active (python >= 3.12), time the call only
+                    profile = None
+                    with self.lock:
+                        self.n_unprofiled += 1
+            return func(*args, **kwargs)
+        finally:
+            if profile is not None:
+                profile.disable()
+                with self.lock:
+                    self.active.discard(profile)
+            cpu = time.thread_time() - c0
+            wall = time.perf_counter() - t0
+            local.depth = depth
+            with self.lock:
+                stats = self.calls.get(name)
+                if stats is None:
+                    stats = self.calls[name] = [0, 0.0, 0.0, 0.0]
+                stats[0] += 1
+                stats[1] += wall
+                stats[2] += cpu
+                stats[3] = max(stats[3], wall)
+
+    def start(self, mode="calls", duration=None, path=None, interval=0.005):
+        """Open a profiling window, closing the current one first.
+
+        Parameters
+        ----------
+        mode : str
+            One of MODES.
+        duration : float
+            Stop after this many seconds. Runs until stop() if None.
+        path : str
+            Report written by stop() (time.strftime formatted), see write().
+        interval : float
+            Time between two stack samples [s] ("sampling").
+        """
+        if mode not in MODES:
+            raise ValueError(f"profiling mode must be one of {MODES}, not {mode}")
+        self.stop()
+
+        with self.lock:
+            self.calls = {}
+            self.profiles = []
+            self.active = set()
+            self.n_unprofiled = 0
+            self.samples = Counter()
+        self.local = threading.local()
+        self.mode = mode
+        self.path = path
+        self.stop_event.clear()
+
+        if mode == "sampling":
+            self.sampler = threading.Thread(
+                target=self._sample, args=(interval,), name="VAST-profiler", daemon=True
+            )
+            self.sampler.start()
+        if duration:
+            self.timer = threading.Timer(duration, self.stop)
+            self.timer.name = "VAST-profiler-timer"
+            self.timer.daemon = True
+            self.timer.start()
+
+        self.t_start = time.perf_counter()
+        self.enabled = True
+
+    def stop(self):
+        """Close the profiling window and write its report.
+
+        Returns
+        -------
+        path : str
+            Report written, None if no window was open or it has no path.
+        """
+        if not self.enabled:
+            return None
+        self.enabled = False
+        self.t_stop = time.perf_counter()
+
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.stop_event.set()
+        if self.sampler is not None:
+            if self.sampler is not threading.current_thread():
+                self.sampler.join()
+            self.sampler = None
+
+        return self.write(self.path) if self.path else None
+
+    def _sample(self, interval):
+        me = threading.get_ident()
+        while not self.stop_event.wait(interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack += [f"{os.path.basename(code.co_filename)}:{code.co_name}"]
+                    frame = frame.f_back
+                stack += [names.get(ident, str(ident))]
+                self.samples[";".join(reversed(stack))] += 1
+
+    def report(self):
+        """Timing of the profiled methods in the last (or current) window.
+
+        Returns
+        -------
+        calls : dict
+            {method: {"calls", "wall", "cpu", "max_wall"}}, times in seconds.
+        """
+        with self.lock:
+            return {
+                name: {"calls": n, "wall": wall, "cpu": cpu, "max_wall": max_wall}
+                for name, (n, wall, cpu, max_wall) in self.calls.items()
+            }
+
+    def _write_cprofile(self, path):
+        """Merge the statistics of the threads' profiles into `{path}.prof`.
+
+        Profiles enabled in a call still running are left out rather than read
+        while their thread writes them. Returns the text of the report.
+        """
+        import io
+        import pstats
+
+        stats = pstats.Stats()
+        with self.lock:
+            n_running = len(self.active)
+            for profile in self.profiles:
+                if profile in self.active:
+                    continue
+                # pstats refuses a profile that never saw a call
+                profile.create_stats()
+                if profile.stats:
+                    stats.add(profile)
+            n_unprofiled = self.n_unprofiled
+
+        lines = []
+        if n_running:
+            lines += [f"{n_running} thread(s) still in a profiled call, left out"]
+        if n_unprofiled:
+            lines += [f"{n_unprofiled} call(s) timed only, another profiler was active"]
+        if stats.stats:
+            stats.dump_stats(f"{path}.prof")
+            text = io.StringIO()
+            stats.stream = text
+            stats.sort_stats("cumulative").print_stats(40)
+            lines += [text.getvalue()]
+        return "\n".join(lines)
+
+    def write(self, path):
+        """Write the report of the last window.
+
+        A text file with the timing of each profiled method, most expensive first,
+        followed by the 40 heaviest functions ("cprofile", also saved as
+        `{path}.prof` for pstats/snakeviz) or stacks ("sampling", all of them
+        saved as `{path}.folded` for flame graph tools).
+
+        Returns
+        -------
+        path : str
+        """
+        path = time.strftime(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        elapsed = (self.t_stop if not self.enabled else time.perf_counter()) - self.t_start
+        calls = sorted(self.report().items(), key=lambda item: -item[1]["wall"])
+        lines = [
+            f"VAST profile ({self.name}, {self.mode}), {elapsed:.3f} s window",
+            "",
+            f"{'method':<50}{'calls':>8}{'wall [s]':>12}{'mean [ms]':>12}"
+            f"{'max [ms]':>12}{'cpu [s]':>12}",
+        ]
+        for name, stats in calls:
+            lines += [
+                f"{name:<50}{stats['calls']:>8}{stats['wall']:>12.4f}"
+                f"{1e3 * stats['wall'] / stats['calls']:>12.3f}"
+                f"{1e3 * stats['max_wall']:>12.3f}{stats['cpu']:>12.4f}"
+            ]
+
+        if self.mode == "cprofile" and self.profiles:
+            lines += ["", self._write_cprofile(path)]
+
+        if self.mode == "sampling" and self.samples:
+            with open(f"{path}.folded", "w") as f:
+                f.writelines(f"{stack} {n}\n" for stack, n in self.samples.items())
+            total = sum(self.samples.values())
+            lines += ["", f"{total} samples, heaviest stacks:"]
+            for stack, n in self.samples.most_common(40):
+                lines += [f"{100 * n / total:6.2f}%  {stack}"]
+
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+# profilers of this process, {name: Profiler}
+_profilers = {}
+
+def get_profiler(name="model.vast"):
+    """Return the profiler of a process ("model.vast" or "controller.vast"),
+    created on first use."""
+    if name not in _profilers:
+        _profilers[name] = Profiler(name)
+    return _profilers[name]
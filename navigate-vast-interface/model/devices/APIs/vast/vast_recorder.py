@@ -0,0 +1,281 @@
+import struct
+import threading
+import time
+from collections import deque
+
+# File layout:
+#   header: MAGIC, start time (unix epoch, double)
+#   records: offset of the request from the start [ns] (uint64),
+#            time until the reply was read [us] (uint32),
+#            request length (uint16), reply length (uint16), outcome (uint8),
+#            request bytes, reply bytes (ascii)
+MAGIC = b"VASTREC2"
+HEADER = struct.Struct("<8sd")
+RECORD = struct.Struct("<QIHHB")
+
+# Outcomes of a request
+#: the reply was read in time
+REPLY = 0
+#: no reply by the deadline, the server still owes it
+TIMEOUT = 1
+#: reply of a TIMEOUT request, read before a later request. Same offset as the
+#: TIMEOUT record, the duration runs until it was read.
+LATE_REPLY = 2
+#: given up before it was written to the pipe, still queued or waiting for a
+#: late reply. Its duration is 0.
+UNSENT = 3
+
+class PipeRecorder:
+    """Write every request and reply sent through a VASTController to a file.
+
+    Attach it to a controller to start recording::
+
+        vast.recorder = PipeRecorder("vast_%Y%m%d_%H%M%S.vastrec")
+
+    The path is passed through time.strftime. Records are buffered and written in
+    blocks so recording adds little to each command.
+    """
+
+    def __init__(self, path, buffer_size=64 * 1024):
+        self.path = time.strftime(str(path))
+        self.f = open(self.path, "wb", buffering=buffer_size)
+        self.lock = threading.Lock()
+        self.n_records = 0
+
+        self.t0 = time.perf_counter()
+        self.f.write(HEADER.pack(MAGIC, time.time()))
+
+    def record(self, request, reply, t_send, t_reply, outcome=REPLY):
+        """Record one exchange.
+
+        Parameters
+        ----------
+        request : str
+            Request sent to the server.
+        reply : str
+            Reply read back, "" if none.
+        t_send, t_reply : float
+            time.perf_counter() when the request was written and the reply read
+            (or given up on).
+        outcome : int
+            REPLY, TIMEOUT, LATE_REPLY or UNSENT.
+        """
+        request = request.encode(encoding="ascii")
+        reply = (reply or "").encode(encoding="ascii")
+        offset_ns = max(int((t_send - self.t0) * 1e9), 0)
+        duration_us = min(max(int((t_reply - t_send) * 1e6), 0), 0xFFFFFFFF)
+
+        with self.lock:
+            if self.f.closed:
+                return
+            self.f.write(
+                RECORD.pack(offset_ns, duration_us, len(request), len(reply), outcome)
+                + request
+                + reply
+            )
+            self.n_records += 1
+
+    def flush(self):
+        with self.lock:
+            if not self.f.closed:
+                self.f.flush()
+
+    def close(self):
+        with self.lock:
+            if not self.f.closed:
+                self.f.close()
+
+
+def read_recording(path):
+    """Read a recording written by PipeRecorder.
+
+    Returns
+    -------
+    start_time : float
+        Unix time the recording started.
+    records : list
+        (offset [s], duration [s], request, reply, outcome) for every
+        request and late reply, in the order they were recorded.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    magic, start_time = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a VAST pipe recording")
+
+    records = []
+    pos = HEADER.size
+    # a recording cut short (e.g. the process was killed) ends with a partial record
+    while pos + RECORD.size <= len(data):
+        offset_ns, duration_us, n_request, n_reply, outcome = RECORD.unpack_from(data, pos)
+        pos += RECORD.size
+        if pos + n_request + n_reply > len(data):
+            break
+        request = data[pos:pos + n_request].decode(encoding="ascii")
+        pos += n_request
+        reply = data[pos:pos + n_reply].decode(encoding="ascii")
+        pos += n_reply
+        records += [(offset_ns * 1e-9, duration_us * 1e-6, request, reply, outcome)]
+
+    return start_time, records
+
+
+def served_exchanges(records):
+    """What the server answered to each request written to the pipe.
+
+    Returns
+    -------
+    exchanges : list
+        (request, reply, delay [s], late) in the order the requests were
+        written. The delay of a timed out (`late`) request is that of its late
+        reply, None if it never came.
+    """
+    exchanges = []
+    # TIMEOUT records waiting for their late reply, by (offset, request)
+    owed = {}
+    for offset, duration, request, reply, outcome in records:
+        if outcome in (REPLY, TIMEOUT):
+            late = outcome == TIMEOUT
+            exchanges += [[request, reply, None if late else duration, late]]
+            if late:
+                owed.setdefault((offset, request), deque()).append(exchanges[-1])
+        elif outcome == LATE_REPLY and owed.get((offset, request)):
+            exchange = owed[(offset, request)].popleft()
+            exchange[1:3] = reply, duration
+    return [tuple(exchange) for exchange in exchanges]
+
+
+class ReplayServer:
+    """Stand-in VAST server answering with the replies of a recording.
+
+    A pipe object for VASTController(pipe=...). Each request is answered with the
+    next recorded reply. With `realtime` every reply is delayed by the recorded
+    server time, otherwise only the replies that came late: they are held back
+    as long as in the recording, so the controller times out and reads them late
+    again. A reply that never came is never sent. Requests that differ from the
+    recording are counted in `mismatches`.
+    """
+
+    def __init__(self, records, realtime=False):
+        self.records = records
+        self.exchanges = served_exchanges(records)
+        self.realtime = realtime
+        self.index = 0
+        self.mismatches = 0
+        self.closed = False
+
+        self._in = b""
+        self._out = b""
+        # (due time or None if never, reply frame) not sent yet, in order
+        self._pending = deque()
+
+    def write(self, data):
+        self._in += data
+        while len(self._in) >= 4:
+            n = struct.unpack("I", self._in[:4])[0]
+            if len(self._in) < 4 + n:
+                break
+            request = self._in[4:4 + n].decode(encoding="ascii")
+            self._in = self._in[4 + n:]
+
+            reply, due = "", time.perf_counter()
+            if self.index < len(self.exchanges):
+                recorded_request, reply, delay, late = self.exchanges[self.index]
+                self.index += 1
+                if request != recorded_request:
+                    self.mismatches += 1
+                if delay is None:
+                    due = None
+                elif self.realtime or late:
+                    due += delay
+            else:
+                self.mismatches += 1
+
+            reply = reply.encode(encoding="ascii")
+            self._pending.append((due, struct.pack("I", len(reply)) + reply))
+        return len(data)
+
+    def _release(self):
+        """Move the replies that are due to the output."""
+        now = time.perf_counter()
+        while self._pending and self._pending[0][0] is not None and self._pending[0][0] <= now:
+            self._out += self._pending.popleft()[1]
+
+    def reply_ready(self):
+        self._release()
+        return len(self._out) >= 4
+
+    def read(self, n):
+        # blocks like the pipe until the reply is due, forever if it never came
+        self._release()
+        while len(self._out) < n and self._pending and not self.closed:
+            due = self._pending[0][0]
+            time.sleep(1e-3 if due is None else max(due - time.perf_counter(), 0.0))
+            self._release()
+        data, self._out = self._out[:n], self._out[n:]
+        return data
+
+    def seek(self, offset, whence=0):
+        return 0
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def replay(records, vast, realtime=False):
+    """Send the requests of a recording through a VASTController.
+
+    Requests that were never written to the pipe (UNSENT) are skipped.
+
+    Parameters
+    ----------
+    records : list
+        Records from read_recording().
+    vast : VASTController
+        Controller to replay through, e.g. on a ReplayServer or VastServerEmulator.
+    realtime : bool
+        Keep the recorded spacing between requests. Otherwise requests are sent
+        back to back, as fast as possible.
+
+    Returns
+    -------
+    stats : dict
+        Number of requests, replies (or timeouts) differing from the recording,
+        recorded and replayed timeouts, recorded and replayed wall time and the
+        mean time per request.
+    """
+    requests = [r for r in records if r[4] in (REPLY, TIMEOUT)]
+    mismatched_replies = 0
+    timeouts = 0
+    t0 = time.perf_counter()
+    for offset, _, request, reply, outcome in requests:
+        if realtime:
+            delay = offset - (time.perf_counter() - t0)
+            if delay > 0:
+                time.sleep(delay)
+        try:
+            replayed = vast.send(request) or ""
+        except TimeoutError:
+            timeouts += 1
+            mismatched_replies += outcome != TIMEOUT
+        else:
+            mismatched_replies += outcome != REPLY or replayed != reply
+    wall_time = time.perf_counter() - t0
+
+    recorded_time = 0.0
+    if records:
+        recorded_time = max(offset + duration for offset, duration, *_ in records)
+
+    return {
+        "requests": len(requests),
+        "mismatched_replies": mismatched_replies,
+        "recorded_timeouts": sum(r[4] == TIMEOUT for r in requests),
+        "timeouts": timeouts,
+        "recorded_time": recorded_time,
+        "replay_time": wall_time,
+        "time_per_request": wall_time / len(requests) if requests else 0.0,
+    }
@@ -0,0 +1,354 @@
+import os
+import time
+import queue
+import atexit
+import sqlite3
+import hashlib
+import logging
+import threading
+
+import numpy as np
+
+# Results of a plate, kept across runs in a SQLite file: the annotation of each
+# fish (well, nose, focus origin, flips, clicked and stage positions, time spent
+# annotating) and every VAST move with its duration.
+#
+# Recording only puts the rows on a queue, a writer thread of the process
+# inserts them in batches, one transaction each. The annotator (GUI process) and
+# the stage (model process) write to the same file, which WAL journaling allows
+# while readers query it.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fish (
+    fish TEXT PRIMARY KEY,
+    well TEXT NOT NULL,
+    experiment TEXT,
+    opened_at REAL,
+    annotated_at REAL NOT NULL,
+    annotation_s REAL,
+    nose_x REAL,
+    nose_y REAL,
+    nose_z REAL,
+    z_focus_pos REAL,
+    focus_confirmed INTEGER,
+    flip TEXT,
+    n_positions INTEGER
+);
+CREATE INDEX IF NOT EXISTS fish_well ON fish (well);
+CREATE INDEX IF NOT EXISTS fish_time ON fish (annotated_at);
+
+CREATE TABLE IF NOT EXISTS positions (
+    fish TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    i INTEGER NOT NULL,
+    x REAL,
+    y REAL,
+    z REAL,
+    theta REAL,
+    f REAL,
+    PRIMARY KEY (fish, kind, i)
+);
+
+CREATE TABLE IF NOT EXISTS moves (
+    t REAL NOT NULL,
+    device TEXT,
+    well TEXT,
+    x REAL,
+    y REAL,
+    theta REAL,
+    dx REAL,
+    dy REAL,
+    dtheta REAL,
+    duration REAL,
+    outcome TEXT
+);
+CREATE INDEX IF NOT EXISTS moves_well ON moves (well, t);
+CREATE INDEX IF NOT EXISTS moves_time ON moves (t);
+"""
+
+UPSERT_FISH = """
+INSERT INTO fish VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (fish) DO UPDATE SET
+    experiment = excluded.experiment,
+    annotated_at = excluded.annotated_at,
+    annotation_s = excluded.annotation_s,
+    nose_x = excluded.nose_x,
+    nose_y = excluded.nose_y,
+    nose_z = excluded.nose_z,
+    z_focus_pos = excluded.z_focus_pos,
+    focus_confirmed = excluded.focus_confirmed,
+    flip = excluded.flip,
+    n_positions = excluded.n_positions
+"""
+
+def fish_key(well_dir, image_ids):
+    """Identity of a fish: its Well folder and the images it was annotated on."""
+    digest = hashlib.sha1("\n".join(map(str, image_ids)).encode()).hexdigest()
+    return f"{well_dir}:{digest[:16]}"
+
+class ResultsStore:
+    """Plate results file, written in batches by a thread of its own.
+
+    The record_* methods return at once, the rows are written by the writer
+    thread within `linger` seconds. Use get_results_store() for the store of a
+    file in a process.
+    """
+
+    def __init__(self, path, linger=0.2, batch_size=1000, logger=None):
+        """
+        Parameters
+        ----------
+        path : str
+            SQLite file, created with its folder if missing.
+        linger : float
+            Time the writer waits for more rows before writing a batch [s].
+        batch_size : int
+            Most records written in one transaction.
+        logger : logging.Logger
+            Logger of the write errors, "model.vast" by default.
+        """
+        self.path = path
+        self.linger = linger
+        self.batch_size = batch_size
+        self.logger = logger or logging.getLogger("model.vast")
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self.connect() as db:
+            db.executescript(SCHEMA)
+        db.close()
+
+        # [(sql, rows), ...] of each record, None stops the writer
+        self.queue = queue.SimpleQueue()
+        # set to write without waiting for more rows (flush, close)
+        self.hurry = threading.Event()
+        # statistics
+        self.n_records = 0
+        self.n_batches = 0
+        self.n_errors = 0
+
+        self.writer = threading.Thread(target=self._write, name="VAST-results", daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def close(self):
+        """Write the rows recorded so far and stop the writer."""
+        if self.writer.is_alive():
+            self.queue.put(None)
+            self.hurry.set()
+            self.writer.join()
+
+    def flush(self, timeout=None):
+        """Wait until the rows recorded so far are written.
+
+        Returns
+        -------
+        bool
+            False if they were not written within `timeout` seconds.
+        """
+        done = threading.Event()
+        self.queue.put(done)
+        self.hurry.set()
+        return done.wait(timeout) if self.writer.is_alive() else False
+
+    def _write(self):
+        db = self.connect()
+        stop = False
+        backlog = False
+        while not stop:
+            batch = [self.queue.get()]
+            # let rows pile up rather than wake up for each of them
+            if not backlog:
+                self.hurry.wait(self.linger)
+            self.hurry.clear()
+            while len(batch) < self.batch_size:
+                try:
+                    batch += [self.queue.get_nowait()]
+                except queue.Empty:
+                    break
+            backlog = len(batch) == self.batch_size
+
+            records = [item for item in batch if isinstance(item, list)]
+            if records:
+                try:
+                    with db:
+                        for record in records:
+                            for sql, rows in record:
+                                db.executemany(sql, rows)
+                    self.n_records += len(records)
+                    self.n_batches += 1
+                except sqlite3.Error as e:
+                    self.n_errors += 1
+                    self.logger.error("VAST could not write %d results: %s", len(records), e)
+
+            for item in batch:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    item.set()
+        db.close()
+
+    # recording
+    def record_fish(self, fish, well, experiment=None, opened_at=None,
+                    annotation_s=None, nose=None, z_focus_pos=None,
+                    focus_confirmed=True, flip="", clicked=(), positions=()):
+        """Record the annotation of a fish, replacing its previous one.
+
+        Parameters
+        ----------
+        fish : str
+            See fish_key().
+        well : str
+            Well folder.
+        experiment : str
+            VAST experiment file.
+        opened_at : float
+            Unix time the well was opened in the annotator.
+        annotation_s : float
+            Time spent annotating the fish [s].
+        nose : sequence
+            Nose position, image coordinates (x, y, z).
+        z_focus_pos : float
+            Z focus origin.
+        focus_confirmed : bool
+            The focus origin was confirmed or set by hand.
+        flip : str
+            Flipped axes, e.g. "xz".
+        clicked : sequence
+            Positions clicked, (x, y, z, ...) in image coordinates.
+        positions : sequence
+            Stage positions (x, y, z, theta, f), the MultiPositions table.
+        """
+        nose = _row(nose or [])[:3]
+        now = time.time()
+        self.queue.put([
+            (UPSERT_FISH, [(
+                fish, well, experiment, opened_at, now, annotation_s, *nose,
+                None if z_focus_pos is None else float(z_focus_pos),
+                int(bool(focus_confirmed)), flip, len(clicked),
+            )]),
+            ("DELETE FROM positions WHERE fish = ?", [(fish,)]),
+            ("INSERT INTO positions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+             _rows(fish, "clicked", clicked) + _rows(fish, "stage", positions)),
+        ])
+
+    def record_move(self, device, well, target, start, duration, outcome="ok"):
+        """Record a VAST move.
+
+        Parameters
+        ----------
+        device : str
+            VAST unit.
+        well : str
+            Well the stage was at, None if unknown.
+        target : sequence
+            (x, y, theta) moved to.
+        start : sequence
+            (x, y, theta) before the move.
+        duration : float
+            Duration of the move, waiting for the motors included [s].
+        outcome : object
+            "ok", or the exception the move failed with.
+        """
+        self.queue.put([(
+            "INSERT INTO moves VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(
+                time.time(), device, well, *map(float, target),
+                *(float(t - s) for t, s in zip(target, start)), duration, str(outcome),
+            )],
+        )])
+
+    # queries
+    def query(self, sql, params=()):
+        """Rows of a query, as dictionaries. Rows still queued are not included."""
+        db = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            db.row_factory = sqlite3.Row
+            return [dict(row) for row in db.execute(sql, params)]
+        finally:
+            db.close()
+
+    def fish(self, well=None, since=None):
+        """Fish annotated, in a well and/or since a unix time, oldest first."""
+        where, params = _filters(well, "annotated_at", since)
+        return self.query(f"SELECT * FROM fish{where} ORDER BY annotated_at", params)
+
+    def positions(self, fish, kind="stage"):
+        """Positions of a fish, "stage" (MultiPositions) or "clicked"."""
+        return self.query(
+            "SELECT x, y, z, theta, f FROM positions WHERE fish = ? AND kind = ? ORDER BY i",
+            (fish, kind),
+        )
+
+    def moves(self, well=None, since=None):
+        """Moves, in a well and/or since a unix time, oldest first."""
+        where, params = _filters(well, "t", since)
+        return self.query(f"SELECT * FROM moves{where} ORDER BY t", params)
+
+    def move_stats(self, well=None, since=None):
+        """Number, total and mean duration [s] of the successful moves, and failures."""
+        where, params = _filters(well, "t", since)
+        return self.query(
+            "SELECT SUM(outcome = 'ok') AS moves,"
+            " SUM(CASE WHEN outcome = 'ok' THEN duration END) AS total_s,"
+            " AVG(CASE WHEN outcome = 'ok' THEN duration END) AS mean_s,"
+            " SUM(outcome != 'ok') AS failed"
+            f" FROM moves{where}",
+            params,
+        )[0]
+
+def _row(position):
+    row = [float(v) for v in list(position)[:5]]
+    return row + [None] * (5 - len(row))
+
+def _rows(fish, kind, positions):
+    """Rows of the positions table, (x, y, z, theta, f) padded with NULLs."""
+    if not len(positions):
+        return []
+    table = np.full((len(positions), 5), np.nan)
+    values = np.asarray(positions, dtype=float).reshape(len(positions), -1)[:, :5]
+    table[:, :values.shape[1]] = values
+    # SQLite stores NaN as NULL
+    return [(fish, kind, i, *row) for i, row in enumerate(table.tolist())]
+
+def _filters(well, time_column, since):
+    """WHERE clause selecting a well and/or the rows from a unix time on."""
+    clauses, params = [], []
+    if well is not None:
+        clauses += ["well = ?"]
+        params += [well]
+    if since is not None:
+        clauses += [f"{time_column} >= ?"]
+        params += [float(since)]
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+# stores of this process, {file: ResultsStore}
+_stores = {}
+
+def get_results_store(path=None, logger=None):
+    """Return the results store of a file in this process, created on first use.
+
+    Parameters
+    ----------
+    path : str
+        SQLite file. Defaults to vast_results.sqlite in the Navigate directory.
+    logger : logging.Logger
+        Logger of the write errors, if the store is created.
+
+    Returns
+    -------
+    store : ResultsStore
+    """
+    if path is None:
+        from navigate.config.config import get_navigate_path
+
+        path = os.path.join(get_navigate_path(), "vast_results.sqlite")
+    key = os.path.abspath(path)
+    if key not in _stores:
+        _stores[key] = ResultsStore(path, logger=logger)
+        atexit.register(_stores[key].close)
+    return _stores[key]
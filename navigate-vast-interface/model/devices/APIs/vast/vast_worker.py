@@ -0,0 +1,181 @@
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+
+class VASTWorker:
+    """Run the commands of one VAST unit on a dedicated thread.
+
+    Commands submitted to a worker run one after another, in order, so a unit is
+    never asked to move while it is still moving. Each unit has its own worker, so
+    moves on different units proceed in parallel while the caller (e.g. Navigate's
+    stage thread) only waits for the futures it needs.
+
+    Use get_worker() to obtain the worker of a connection, so that devices
+    sharing a connection also share its thread.
+    """
+
+    #: weakref.WeakSet: all live workers, for aggregate_throughput()
+    instances = weakref.WeakSet()
+
+    def __init__(self, controller, name="VAST"):
+        self.controller = controller
+        self.name = name
+
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+
+        # statistics
+        self.n_commands = 0
+        self.n_failed = 0
+        self.n_cancelled = 0
+        self.busy_time = 0.0
+        self.start_time = None
+        self.end_time = None
+
+        self.thread = threading.Thread(
+            target=self._run, name=f"{name}-worker", daemon=True
+        )
+        self.thread.start()
+        VASTWorker.instances.add(self)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            future, func, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            t0 = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+                failed = 1
+            else:
+                future.set_result(result)
+                failed = 0
+            t1 = time.perf_counter()
+
+            with self.lock:
+                self.n_commands += 1
+                self.n_failed += failed
+                self.busy_time += t1 - t0
+                self.end_time = t1
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(*args, **kwargs) on the worker thread.
+
+        Returns
+        -------
+        future : concurrent.futures.Future
+            Resolves to the return value of func.
+        """
+        if not self.thread.is_alive():
+            raise RuntimeError(f"{self.name} worker is closed")
+
+        future = Future()
+        with self.lock:
+            if self.start_time is None:
+                self.start_time = time.perf_counter()
+        self.queue.put((future, func, args, kwargs))
+        return future
+
+    def call(self, func, *args, **kwargs):
+        """Run func on the worker thread and wait for its result."""
+        return self.submit(func, *args, **kwargs).result()
+
+    def cancel_pending(self):
+        """Cancel the commands queued but not started yet.
+
+        Returns
+        -------
+        n_cancelled : int
+        """
+        n_cancelled = 0
+        closing = False
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                closing = True
+            elif item[0].cancel():
+                n_cancelled += 1
+        if closing:
+            self.queue.put(None)
+
+        with self.lock:
+            self.n_cancelled += n_cancelled
+        return n_cancelled
+
+    def close(self, timeout=None):
+        """Finish the queued commands and stop the thread."""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            if threading.current_thread() is not self.thread:
+                self.thread.join(timeout)
+
+    def throughput(self):
+        """Return the command count, busy time and rates of this worker."""
+        with self.lock:
+            elapsed = 0.0
+            if self.start_time is not None and self.end_time is not None:
+                elapsed = self.end_time - self.start_time
+            return {
+                "name": self.name,
+                "commands": self.n_commands,
+                "failed": self.n_failed,
+                "cancelled": self.n_cancelled,
+                "busy_time": self.busy_time,
+                "elapsed": elapsed,
+                "commands_per_s": self.n_commands / elapsed if elapsed > 0 else 0.0,
+                "utilization": self.busy_time / elapsed if elapsed > 0 else 0.0,
+            }
+
+
+def get_worker(controller, name="VAST"):
+    """Return the worker attached to a VAST connection, starting it if needed."""
+    worker = getattr(controller, "worker", None)
+    if worker is None or not worker.thread.is_alive():
+        worker = VASTWorker(controller, name=name)
+        controller.worker = worker
+    return worker
+
+
+def aggregate_throughput(workers=None):
+    """Combined throughput of several VAST units.
+
+    Parameters
+    ----------
+    workers : iterable of VASTWorker
+        Defaults to every live worker.
+
+    Returns
+    -------
+    throughput : dict
+        Total commands and busy time, the wall time spanned by all of them and
+        the aggregate command rate, plus the per-unit reports under "units".
+    """
+    workers = list(VASTWorker.instances if workers is None else workers)
+    units = [w.throughput() for w in workers]
+
+    starts = [w.start_time for w in workers if w.start_time is not None]
+    ends = [w.end_time for w in workers if w.end_time is not None]
+    elapsed = max(ends) - min(starts) if starts and ends else 0.0
+
+    commands = sum(u["commands"] for u in units)
+    busy_time = sum(u["busy_time"] for u in units)
+    return {
+        "units": units,
+        "commands": commands,
+        "busy_time": busy_time,
+        "elapsed": elapsed,
+        "commands_per_s": commands / elapsed if elapsed > 0 else 0.0,
+        # > 1 when units were busy at the same time
+        "parallelism": busy_time / elapsed if elapsed > 0 else 0.0,
+    }
@@ -1,17 +1,90 @@
 # Standard Imports
 import os
+import sys
 import platform
+import threading
+import importlib.util
 from pathlib import Path
 from multiprocessing.managers import ListProxy
 
 # Navigate specific imports
-from navigate.tools.common_functions import load_module_from_file
 from navigate.model.device_startup_functions import device_not_found, auto_redial, DummyDeviceConnection
 from navigate.model.devices.stages.synthetic import SyntheticStage
 
 DEVICE_TYPE_NAME = "stage"  # Same as in configuraion.yaml, for example "stage", "filter_wheel", "remote_focus_device"...
 DEVICE_REF_LIST = ["type", "axes", "serial_number", "axes_mapping"]  # the reference value from configuration.yaml
 
+DEVICE_DIR = Path(__file__).resolve().parent
+PLUGIN_DIR = DEVICE_DIR.parents[2]
+PLUGIN_DEVICE_PATH = os.path.join(DEVICE_DIR, "plugin_device.py")
+SYNTHETIC_DEVICE_PATH = os.path.join(DEVICE_DIR, "synthetic_device.py")
+VAST_API_PATH = os.path.join(DEVICE_DIR.parent, "APIs", "vast", "vast_controller.py")
+
+#: str: plugin modules are kept in sys.modules under this prefix
+PLUGIN_PACKAGE = "navigate_vast_interface"
+
+_module_lock = threading.RLock()
+
+def plugin_module_name(file_path):
+    """Name a plugin file is kept under in sys.modules, e.g.
+    "navigate_vast_interface.model.devices.APIs.vast.vast_events"."""
+    relative = Path(file_path).resolve().relative_to(PLUGIN_DIR).with_suffix("")
+    return ".".join((PLUGIN_PACKAGE,) + relative.parts)
+
+def load_plugin_module(module_name, file_path):
+    """Load a python file of the plugin as a module, executing it once per process.
+
+    Navigate loads plugin files by path, which executes them again on every load.
+    Every file of the plugin loads the others through this function instead, so
+    a process holds a single module (and set of class objects, event logs,
+    caches...) per file, whichever file asked for it first. The modules are kept
+    in sys.modules; a file that changed on disk since it was loaded is executed
+    again.
+
+    Parameters
+    ----------
+    module_name : str
+        the module name. The module is named after its path, see
+        plugin_module_name().
+    file_path : str
+        the python file path
+
+    Returns
+    -------
+    module : object
+        The module. None if the module cannot be imported.
+    """
+    name = plugin_module_name(file_path)
+    mtime = os.path.getmtime(file_path)
+
+    with _module_lock:
+        module = sys.modules.get(name)
+        if module is not None and getattr(module, "__plugin_mtime__", None) == mtime:
+            return module
+
+        spec = importlib.util.spec_from_file_location(name, file_path)
+        module = importlib.util.module_from_spec(spec)
+        module.__plugin_mtime__ = mtime
+        # registered first, like an import, so modules loading each other work
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except ModuleNotFoundError:
+            del sys.modules[name]
+            return None
+        except BaseException:
+            del sys.modules[name]
+            raise
+        return module
+
+# Navigate executes this file by path, once for each device it starts. The copy
+# kept in sys.modules is the one the plugin's other files use (they only execute
+# this file when it is not there yet), and every copy loads through it, so they
+# share its lock.
+load_plugin_module = load_plugin_module(
+    "device_startup_functions", __file__
+).load_plugin_module
+
 def load_device(hardware_configuration, is_synthetic=False, **kwargs):
     """Build device connection.
 
@@ -33,14 +106,17 @@ def load_device(hardware_configuration, is_synthetic=False, **kwargs):
         stage_type = hardware_configuration["type"]
 
     if stage_type.lower() == "vast" and platform.system() == "Windows":
-        plugin_device = load_module_from_file(
-            "plugin_device",
-            os.path.join(Path(__file__).resolve().parent, "plugin_device.py"),
-        )
+        plugin_device = load_plugin_module("plugin_device", PLUGIN_DEVICE_PATH)
+        vast_api = load_plugin_module("vast_controller", VAST_API_PATH)
+
+        # one pipe per VAST unit when several are connected
+        pipe_name = hardware_configuration.get("pipe_name", None)
+        # opt-in recording of the pipe traffic
+        record_path = hardware_configuration.get("record_path", None)
 
         return auto_redial(
             plugin_device.build_VAST_connection,
-            (),
+            (vast_api, pipe_name, record_path),
             exception=Exception,
         )
     else:
@@ -75,10 +151,7 @@ def start_device(microscope_name, device_connection, configuration, is_synthetic
         device_type = device_config["type"]
 
     if device_type.lower() == "vast":
-        plugin_device = load_module_from_file(
-            "plugin_device",
-            os.path.join(Path(__file__).resolve().parent, "plugin_device.py"),
-        )
+        plugin_device = load_plugin_module("plugin_device", PLUGIN_DEVICE_PATH)
         return plugin_device.PluginDevice(
             microscope_name, 
             device_connection, 
@@ -87,10 +160,7 @@ def start_device(microscope_name, device_connection, configuration, is_synthetic
             )
     
     elif device_type == "synthetic":
-        synthetic_device = load_module_from_file(
-            "synthetic_device",
-            os.path.join(Path(__file__).resolve().parent, "synthetic_device.py"),
-        )
+        synthetic_device = load_plugin_module("synthetic_device", SYNTHETIC_DEVICE_PATH)
         return synthetic_device.SyntheticDevice(
             microscope_name, 
             device_connection, 
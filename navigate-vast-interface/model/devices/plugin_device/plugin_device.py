@@ -31,9 +31,13 @@
 
 # Standard Imports
 import os
+import sys
 import pathlib
 import logging
+import threading
 import time
+from contextlib import contextmanager
+from multiprocessing.managers import ListProxy
 
 # Third Party Imports
 
@@ -42,50 +46,107 @@ from navigate.model.devices.stages.base import StageBase
 from navigate.tools.common_functions import load_module_from_file
 
 # Logger Setup
-# p = __name__.split(".")[1]
-# logger = logging.getLogger(p)
-"""
-    Not sure how to handle logger in a plugin...
-"""
+# Plugin files are loaded by path, so __name__ does not give Navigate's logger
+# name. Events go through the "model.vast" event log instead (see
+# APIs/vast/vast_events.py), which propagates to Navigate's "model" logger.
+
+# Plugin files are executed once per process, by
+# device_startup_functions.load_plugin_module. The loader itself is executed
+# by the first plugin file that needs it, the others find it in sys.modules.
+load_plugin_module = (
+    sys.modules.get("navigate_vast_interface.model.devices.plugin_device.device_startup_functions")
+    or load_module_from_file(
+        "device_startup_functions",
+        os.path.join(pathlib.Path(__file__).resolve().parent, "device_startup_functions.py"),
+    )
+).load_plugin_module
+
+VAST_API_DIR = os.path.join(pathlib.Path(__file__).resolve().parent.parent, "APIs", "vast")
+
+# the VAST API (model/devices/APIs/vast), shared by all devices
+(
+    vast_controller,
+    vast_events,
+    vast_profiling,
+    vast_recorder,
+    vast_results,
+    vast_worker,
+    motion_model,
+) = (
+    load_plugin_module(name, os.path.join(VAST_API_DIR, f"{name}.py"))
+    for name in (
+        "vast_controller",
+        "vast_events",
+        "vast_profiling",
+        "vast_recorder",
+        "vast_results",
+        "vast_worker",
+        "motion_model",
+    )
+)
+
+def navigate_log_path(file_name):
+    """Path of a file in the logs folder of the Navigate directory."""
+    from navigate.config.config import get_navigate_path
 
-def build_VAST_connection() -> object:
-    """Connect to the ASI Stage
+    return os.path.join(get_navigate_path(), "logs", file_name)
+
+# Opt-in timing of the device's entry points, see APIs/vast/vast_profiling.py
+profiled = vast_profiling.get_profiler().profiled
+
+def build_VAST_connection(vast_api=None, pipe_name=None, record_path=None) -> object:
+    """Connect to the VAST
 
     Parameters
     ----------
-    com_port : str
-        Communication port for ASI Tiger Controller - e.g., COM1
-    baud_rate : int
-        Baud rate for ASI Tiger Controller - e.g., 9600
+    vast_api : module
+        Already loaded vast_controller module, this module's if None.
+    pipe_name : str
+        Name of the VastNavigateServer pipe of this unit. Uses the default
+        server pipe if None.
+    record_path : str
+        Record the pipe traffic to this file (time.strftime formatted), e.g.
+        "vast_%Y%m%d_%H%M%S.vastrec". Not recorded if None.
 
     Returns
     -------
-    asi_stage : object
-        Successfully initialized stage object.
+    vast_controller : object
+        Successfully initialized VASTController object.
     """
 
-    # Need to load the VAST API using load_module_from_file...
-    vast_api = load_module_from_file(
-        'vast_controller',
-        os.path.join(
-            pathlib.Path(__file__).resolve().parent.parent,
-            'APIs',
-            'vast',
-            'vast_controller.py'
-        )
-    )
+    if vast_api is None:
+        vast_api = vast_controller
 
     # load the VAST connection through the pipe
-    vast_controller = vast_api.VASTController()
-    # vast_controller.start_vast()
+    if pipe_name:
+        controller = vast_api.VASTController(pipe_name=pipe_name)
+    else:
+        controller = vast_api.VASTController()
+    # controller.start_vast()
+
+    if record_path:
+        controller.recorder = vast_recorder.PipeRecorder(
+            record_path
+        )
 
-    return vast_controller
+    return controller
 
 class PluginDevice(StageBase):
     
     """VAST implemented as a plugin device
     """
 
+    #: dict: hardware axis of each stage axis, unless the configuration maps them
+    AXES_MAPPING = {"x": "x", "y": "y", "theta": "theta"}
+
+    #: float: minimum interval between writes of the motion calibration to the
+    #: experiment [s], the last one is written at close()
+    CALIBRATION_INTERVAL = 5.0
+
+    #: str or bool: plate results file when the configuration has no
+    #: `results_path`, None for vast_results.sqlite in the Navigate directory
+    DEFAULT_RESULTS_PATH = None
+
     def __init__(self, microscope_name, device_connection, configuration, device_id=0):
         """Initialize the ASI Stage connection.
 
@@ -101,10 +162,9 @@ class PluginDevice(StageBase):
         super().__init__(microscope_name, device_connection, configuration, device_id)
 
         # Default axes mapping
-        axes_mapping = {"x": "x", "y": "y", "theta": "theta"}
         if not self.axes_mapping:
             self.axes_mapping = {
-                axis: axes_mapping[axis] for axis in self.axes if axis in axes_mapping
+                axis: self.AXES_MAPPING[axis] for axis in self.axes if axis in self.AXES_MAPPING
             }
 
         self.vast_axes = dict(map(lambda v: (v[1], v[0]), self.axes_mapping.items()))
@@ -112,11 +172,74 @@ class PluginDevice(StageBase):
         # Set the VAST as the device_connection
         self.vast = device_connection
 
+        # Moves run on the unit's own thread, so several VAST units move in parallel
+        self.worker = vast_worker.get_worker(
+            self.vast, name=f"{microscope_name}-VAST{device_id}"
+        )
+
+        self.events = vast_events.get_event_log()
+
         # Define the stage positions (there is no Z!)
         self.stage_x_pos = None
         self.stage_y_pos = None
         self.stage_theta_pos = None
 
+        # Motion model calibrated from the measured durations of moves. The
+        # calibration is shared through the experiment so that the annotator's
+        # ETA and later sessions start from it.
+        self.configuration = configuration
+        self.motion_model = motion_model.MotionModel()
+        try:
+            self.motion_model.set_calibration(
+                configuration['experiment']['VAST']['MotionCalibration']
+            )
+        except (KeyError, TypeError):
+            pass
+        self.calibration_written = time.perf_counter()
+
+        # Single-axis moves (move_axis_absolute) requested within
+        # `coalesce_window` seconds of each other, or inside a transaction(), are
+        # merged into one VAST move. Off unless set in the hardware configuration.
+        hardware_config = configuration["configuration"]["microscopes"][microscope_name]["stage"]["hardware"]
+        if isinstance(hardware_config, (list, ListProxy)):
+            hardware_config = hardware_config[device_id]
+        self.coalesce_window = float(hardware_config.get("coalesce_window", 0) or 0)
+
+        # Deadlines of a pipe command's reply and of a move [s], see VASTController
+        for key, attribute in (("command_timeout", "timeout"), ("move_timeout", "move_timeout")):
+            if key in hardware_config:
+                setattr(self.vast, attribute, hardware_config[key])
+
+        # Every move and its duration goes to the plate results file (see
+        # APIs/vast/vast_results.py), `results_path: false` turns it off
+        self.results = None
+        results_path = hardware_config.get("results_path", self.DEFAULT_RESULTS_PATH)
+        if results_path is not False:
+            try:
+                self.results = vast_results.get_results_store(results_path, self.events.logger)
+            except (OSError, vast_results.sqlite3.Error) as e:
+                self.events.record(self.worker.name, "results_file", outcome=e,
+                                   level=logging.ERROR)
+
+        # Profile from the start, for `profile_window` seconds (see start_profiling)
+        if hardware_config.get("profile"):
+            self.start_profiling(
+                hardware_config["profile"], hardware_config.get("profile_window", 60)
+            )
+
+        self.move_lock = threading.RLock()
+        self.pending_moves = {}
+        self.n_pending = 0
+        self.flush_timer = None
+        self.transaction_depth = 0
+        self.move_stats = {
+            "axis_requests": 0,
+            "flushes": 0,
+            "merged": 0,
+            "moves": 0,
+            "skipped": 0,
+        }
+
         self.report_position()
 
     def __del__(self):
@@ -131,6 +254,7 @@ class PluginDevice(StageBase):
         """
         self.close()
 
+    @profiled
     def report_position(self):
         """Reports the position for all axes, and creates a position dictionary.
 
@@ -153,17 +277,21 @@ class PluginDevice(StageBase):
                 self.__setattr__(f"{axis}_pos", hardware_position)
 
             position = self.get_position_dict()
-            # logger.debug(f"VAST - Position: {position}")
         except Exception as e:
-            print(f"VAST: Failed to report position: {e}")
-            # logger.debug(f"VAST - Error: {e}")
+            self.events.record(self.worker.name, "report_position", outcome=e,
+                               level=logging.WARNING)
             time.sleep(0.01)
 
         return position
 
+    @profiled
     def move_axis_absolute(self, axis, abs_pos, wait_until_done=False):
         """Implement movement logic along a single axis.
 
+        Consecutive single-axis moves are merged into one VAST move when they
+        are requested within `coalesce_window` of each other or inside a
+        transaction(). Waiting for a move sends it, with any buffered targets.
+
         Parameters
         ----------
         axis : str
@@ -178,9 +306,85 @@ class PluginDevice(StageBase):
         bool
             Was the move successful?
         """
-        move_dictionary = {f"{axis}_abs": abs_pos}
-        return self.move_absolute(move_dictionary, wait_until_done)
+        with self.move_lock:
+            self.pending_moves[f"{axis}_abs"] = abs_pos
+            self.n_pending += 1
+            self.move_stats["axis_requests"] += 1
+
+            if self.transaction_depth:
+                return True
+
+            # wait for more axes, unless the caller waits for this one
+            if not wait_until_done and self.coalesce_window > 0:
+                if self.flush_timer is None:
+                    self.flush_timer = threading.Timer(self.coalesce_window, self.flush_moves)
+                    self.flush_timer.daemon = True
+                    self.flush_timer.start()
+                return True
+
+        return self.flush_moves(wait_until_done)
+
+    def take_pending_moves(self):
+        """Remove and return the buffered single-axis targets, as a move dictionary."""
+        with self.move_lock:
+            if self.flush_timer is not None:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+
+            moves, self.pending_moves = self.pending_moves, {}
+            if self.n_pending:
+                self.move_stats["flushes"] += 1
+                self.move_stats["merged"] += self.n_pending - 1
+            self.n_pending = 0
+            return moves
+
+    @profiled
+    def flush_moves(self, wait_until_done=False):
+        """Send the buffered single-axis targets as one move.
 
+        Returns
+        -------
+        bool
+            Was the move successful?
+        """
+        with self.move_lock:
+            moves = self.take_pending_moves()
+            if not moves:
+                return True
+            return self.move_absolute(moves, wait_until_done)
+
+    @contextmanager
+    def transaction(self, wait_until_done=True):
+        """Merge the single-axis moves requested in a block into one VAST move.
+
+        Example::
+
+            with stage.transaction():
+                stage.move_axis_absolute("x", 100.0)
+                stage.move_axis_absolute("y", 20.0)
+                stage.move_axis_absolute("theta", 90.0)
+
+        The move is sent when the outermost transaction ends. Moves requested in a
+        block that raises are dropped.
+        """
+        with self.move_lock:
+            self.transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            with self.move_lock:
+                self.transaction_depth -= 1
+                if not self.transaction_depth:
+                    self.take_pending_moves()
+            raise
+
+        with self.move_lock:
+            self.transaction_depth -= 1
+            if self.transaction_depth:
+                return
+            self.flush_moves(wait_until_done)
+
+    @profiled
     def move_absolute(self, move_dictionary, wait_until_done=True):
         """Move stage along a single axis.
 
@@ -200,6 +404,13 @@ class PluginDevice(StageBase):
         """
         # print("\nvast_stage/move_absolute: BEGIN")
 
+        with self.move_lock:
+            # buffered single-axis targets go along with this move
+            if self.pending_moves:
+                move_dictionary = {**self.take_pending_moves(), **move_dictionary}
+            return self._move_absolute(move_dictionary, wait_until_done)
+
+    def _move_absolute(self, move_dictionary, wait_until_done):
         pos_dict = self.verify_abs_position(move_dictionary)
         if not pos_dict:
             return False
@@ -209,9 +420,6 @@ class PluginDevice(StageBase):
         # rely on cached positions
         # if len(pos_dict.keys()) < 3:
         #     self.report_position()
-        self.vast.wait_until_done = wait_until_done
-
-        # self.vast.wait_until_done = False # Enforce no waiting...
 
         move_stage = {}
         for axis in pos_dict:
@@ -234,43 +442,241 @@ class PluginDevice(StageBase):
 
         move_stage = any(move_stage.values())
         if move_stage is True:
-            try:
-                self.vast.move_to_specified_position(
-                    x_pos=self.stage_x_pos,
-                    y_pos=self.stage_y_pos,
-                    theta_pos=self.stage_theta_pos,
-                )
-            except Exception as e:
-                # logger.debug(f"VAST: move_axis_absolute failed - {e}")
-                # make sure the cached positions are the "same" as device
-                self.report_position()
-                return False
+            self.move_stats["moves"] += 1
+            future = self.worker.submit(
+                self.run_move,
+                self.stage_x_pos,
+                self.stage_y_pos,
+                self.stage_theta_pos,
+                self.vast.stop_generation,
+            )
+            if wait_until_done:
+                try:
+                    future.result()
+                except Exception as e:
+                    self.events.record(self.worker.name, "move", outcome=e,
+                                       level=logging.ERROR)
+                    # make sure the cached positions are the "same" as device
+                    self.report_position()
+                    return False
+            else:
+                future.add_done_callback(self.move_done)
+        else:
+            self.move_stats["skipped"] += 1
 
         return True
 
+    @profiled
+    def run_move(self, x_pos, y_pos, theta_pos, generation=None):
+        """Move the VAST and wait for the motors. Runs on the worker thread.
+
+        Waiting here keeps queued moves of this unit from overlapping, without
+        blocking the caller unless it asked to wait. A stop() since the move was
+        requested (`generation`) cancels it.
+        """
+        start_pos = self.vast.get_current_position()
+        start_time = time.perf_counter()
+
+        self.vast.wait_until_done = True
+        try:
+            self.vast.move_to_specified_position(
+                x_pos=x_pos,
+                y_pos=y_pos,
+                theta_pos=theta_pos,
+                generation=generation,
+            )
+        except Exception as e:
+            self.record_move((x_pos, y_pos, theta_pos), start_pos,
+                             time.perf_counter() - start_time, e)
+            raise
+
+        duration = time.perf_counter() - start_time
+        self.update_motion_calibration(start_pos, duration)
+        self.record_move((x_pos, y_pos, theta_pos), start_pos, duration)
+
+    def record_move(self, target, start_pos, duration, outcome="ok"):
+        """Add a move to the plate results, with the well the annotator has open."""
+        if self.results is None:
+            return
+        try:
+            well = self.configuration['experiment']['VAST'].get('Well')
+        except (KeyError, AttributeError, TypeError):
+            well = None
+        self.results.record_move(self.worker.name, well, target, start_pos, duration, outcome)
+
+    def move_done(self, future):
+        """Resynchronize the cached positions if a move we did not wait for failed."""
+        # moves cancelled by stop(), which resynchronizes itself
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.events.record(self.worker.name, "move", outcome=future.exception(),
+                               level=logging.ERROR)
+            self.report_position()
+
+    def update_motion_calibration(self, start_pos, duration):
+        """Calibrate the motion model with a completed move.
+
+        Parameters
+        ----------
+        start_pos : tuple
+            (x, y, theta) of the VAST before the move.
+        duration : float
+            Measured duration of the move, including waiting for the motors [s].
+        """
+        end_pos = self.vast.get_current_position()
+        self.motion_model.observe(
+            dx=end_pos[0] - start_pos[0],
+            dy=end_pos[1] - start_pos[1],
+            dtheta=end_pos[2] - start_pos[2],
+            duration=duration,
+        )
+        if time.perf_counter() - self.calibration_written >= self.CALIBRATION_INTERVAL:
+            self.write_motion_calibration()
+
+    def write_motion_calibration(self):
+        """Share the motion model calibration through the experiment.
+
+        Each write goes through the configuration's manager process, so moves
+        only write it every CALIBRATION_INTERVAL seconds.
+        """
+        self.calibration_written = time.perf_counter()
+        try:
+            self.configuration['experiment']['VAST']['MotionCalibration'] = (
+                self.motion_model.calibration()
+            )
+        except KeyError:
+            pass
+
+    @profiled
     def stop(self):
-        """Stop all stage movement abruptly."""
-        # try:
-        #     self.vast.interrupt_move()
-        # except Exception as error:
-        #     # logger.exception(f"VAST - Stage stop failed: {error}")
-        pass
-        # May not be able to do this with VAST..?
+        """Stop all stage movement abruptly.
+
+        Buffered and queued moves are dropped, and the move in progress is
+        interrupted: callers waiting for any of them get a CancelledError (the
+        move returns False). The cached positions are those the VAST stopped at.
+        """
+        # before taking move_lock, which a caller waiting for its move holds
+        self.worker.cancel_pending()
+        try:
+            self.vast.interrupt_move()
+        except Exception as e:
+            self.events.record(self.worker.name, "stop", outcome=e, level=logging.ERROR)
+        self.take_pending_moves()
+        self.report_position()
 
     def close(self):
         """Close the stage."""
 
         try:
-            self.stop()
+            # queued moves finish, stop() would interrupt them
+            self.flush_moves()
+            self.worker.close()
             self.vast.close()
-            # logger.debug("VAST stage connection closed")
+            self.write_motion_calibration()
+            if self.results is not None:
+                self.results.flush(1.0)
         except (AttributeError, BaseException) as e:
-            print("Error while closing the VAST stage connection", e)
-            # logger.debug("Error while disconnecting the VAST stage", e)
+            self.events.record(self.worker.name, "close", outcome=e, level=logging.ERROR)
     
+    @profiled
     def set_autostore(self, autost_dir):
-        print(f"Setting VAST autostore: {autost_dir}")
+        t_start = time.perf_counter()
         self.vast.set_autostore_location(autost_dir)
+        self.events.record(self.worker.name, "set_autostore",
+                           time.perf_counter() - t_start, autost_dir, logging.INFO)
+
+    def dump_events(self, path=None):
+        """Write the VAST event log of the model process to a file.
+
+        Parameters
+        ----------
+        path : str
+            File to write, time.strftime formatted. Defaults to
+            logs/vast_events_%Y%m%d_%H%M%S.tsv in the Navigate directory.
+
+        Returns
+        -------
+        path : str
+            File written.
+        """
+        if path is None:
+            path = navigate_log_path("vast_events_%Y%m%d_%H%M%S.tsv")
+        path = time.strftime(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.events.dump(path)
+        return path
+
+    def start_profiling(self, mode="calls", duration=60, path=None):
+        """Time the device's entry points for a while.
+
+        Profiles the whole model process, all VAST units included, see
+        vast_profiling.Profiler.
+
+        Parameters
+        ----------
+        mode : str
+            "calls", "cprofile" or "sampling".
+        duration : float
+            Length of the window [s], the report is written when it ends.
+        path : str
+            Report to write, time.strftime formatted. Defaults to
+            logs/vast_profile_%Y%m%d_%H%M%S.txt in the Navigate directory.
+        """
+        if path is None:
+            path = navigate_log_path("vast_profile_%Y%m%d_%H%M%S.txt")
+        vast_profiling.get_profiler().start(
+            mode, float(duration) if duration else None, path
+        )
+        self.events.record(self.worker.name, "start_profiling", outcome=mode,
+                           level=logging.INFO)
+
+    def stop_profiling(self):
+        """End the profiling window early.
+
+        Returns
+        -------
+        path : str
+            Report written, None if the profiler was not running.
+        """
+        path = vast_profiling.get_profiler().stop()
+        self.events.record(self.worker.name, "stop_profiling", outcome=path,
+                           level=logging.INFO)
+        return path
+
+    def report_throughput(self):
+        """Return the throughput of this VAST unit and of all units together.
+
+        Returns
+        -------
+        throughput : dict
+            {"unit": ..., "aggregate": ...}, see vast_worker.aggregate_throughput,
+            with the coalescing statistics and the timeouts and cancellations of
+            the connection (VASTController.faults).
+        """
+        return {
+            "unit": self.worker.throughput(),
+            "aggregate": vast_worker.aggregate_throughput(),
+            "coalescing": self.report_coalescing(),
+            "faults": self.vast.faults(),
+        }
+
+    def report_coalescing(self):
+        """Statistics of the merged single-axis moves.
+
+        Returns
+        -------
+        stats : dict
+            "axis_requests": move_axis_absolute calls, "flushes": groups of them
+            sent, "merged": requests that did not need a move of their own,
+            "moves": moves sent to the VAST, "skipped": moves already in position.
+        """
+        with self.move_lock:
+            stats = dict(self.move_stats)
+        stats["merge_ratio"] = (
+            stats["merged"] / stats["axis_requests"] if stats["axis_requests"] else 0.0
+        )
+        return stats
 
     @property
     def commands(self):
@@ -282,7 +688,11 @@ class PluginDevice(StageBase):
             commands that the device supports
         """
         return {
-            "set_autostore": lambda *args: self.set_autostore(args[0])
+            "set_autostore": lambda *args: self.set_autostore(args[0]),
+            "report_throughput": lambda *args: self.report_throughput(),
+            "dump_events": lambda *args: self.dump_events(*args[:1]),
+            "start_profiling": lambda *args: self.start_profiling(*args[:3]),
+            "stop_profiling": lambda *args: self.stop_profiling(),
         }        
     
 
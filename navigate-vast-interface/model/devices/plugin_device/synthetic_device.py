@@ -1,9 +1,278 @@
-from navigate.model.devices.stages.synthetic import SyntheticStage
+# Standard Imports
+import os
+import sys
+import time
+import logging
+import threading
+from pathlib import Path
+from multiprocessing.managers import ListProxy
+
+# Navigate specific imports
+from navigate.tools.common_functions import load_module_from_file
+
+# Plugin files are executed once per process, by
+# device_startup_functions.load_plugin_module, so a SyntheticDevice is a
+# PluginDevice of the same class object Navigate starts. The loader itself is
+# executed by the first plugin file that needs it, the others find it in
+# sys.modules.
+load_plugin_module = (
+    sys.modules.get("navigate_vast_interface.model.devices.plugin_device.device_startup_functions")
+    or load_module_from_file(
+        "device_startup_functions",
+        os.path.join(Path(__file__).resolve().parent, "device_startup_functions.py"),
+    )
+).load_plugin_module
+
+plugin_device = load_plugin_module(
+    "plugin_device",
+    os.path.join(Path(__file__).resolve().parent, "plugin_device.py"),
+)
+motion_model = plugin_device.motion_model
+vast_api = plugin_device.vast_controller
+
+class SyntheticVASTController:
+    """Stand-in for VASTController that takes as long as the real VAST.
+
+    Moves are timed with a MotionModel. Like the real stage, a move returns as soon
+    as it is dispatched and the motors report busy until it has finished, unless
+    `wait_until_done` is set. `time_scale` scales the time actually slept, e.g. 0.1
+    runs ten times faster than real time, while `motion_time` always accumulates
+    the modelled (unscaled) stage time.
+    """
+
+    def __init__(self, model=None, time_scale=1.0):
+        self.model = model if model is not None else motion_model.MotionModel()
+        self.time_scale = time_scale
+
+        self.x_pos = 0
+        self.y_pos = 0
+        self.theta_pos = 0
+
+        self.wait_until_done = False
+        self.autost_dir = None
+
+        # see VASTController
+        self.timeout = 5.0
+        self.move_timeout = 120.0
+
+        # time (perf_counter) at which the current move finishes
+        self.busy_until = 0.0
+
+        # see VASTController.interrupt_move
+        self.stop_generation = 0
+        self.stop_event = threading.Event()
+
+        # statistics, fault counters under stats_lock (see VASTController)
+        self.stats_lock = threading.Lock()
+        self.n_commands = 0
+        self.n_moves = 0
+        self.n_rotations = 0
+        self.motion_time = 0.0
+        self.n_timeouts = 0
+        self.n_cancelled = 0
+        self.n_interrupts = 0
+
+    def close(self):
+        pass
+
+    def _dispatch(self, duration, generation=None):
+        """Queue a motion of `duration` modelled seconds behind the current one."""
+        now = time.perf_counter()
+        self.busy_until = max(now, self.busy_until) + duration * self.time_scale
+        self.motion_time += duration
+        self.n_commands += 1
+
+        if self.wait_until_done:
+            self.wait(generation=generation)
+
+    def get_current_position(self):
+        return (
+            self.x_pos,
+            self.y_pos,
+            self.theta_pos
+        )
+
+    def get_last_autostore_location(self):
+        return self.autost_dir
+
+    def set_autostore_location(self, autost_dir):
+        self.n_commands += 1
+        self.autost_dir = autost_dir
+
+    def rotate_deg(self, theta, generation=None):
+        self.check_interrupted(generation)
+        self.theta_pos += theta
+        self.n_rotations += 1
+        self._dispatch(self.model.theta_time(theta), generation)
+
+    def move_rel_um(self, x_um, y_um, generation=None):
+        self.check_interrupted(generation)
+        self.x_pos += x_um
+        self.y_pos += y_um
+        self.n_moves += 1
+        self._dispatch(self.model.xy_time(x_um, y_um), generation)
+
+    def move_abs_um(self, x_um, y_um, generation=None):
+        self.move_rel_um(x_um - self.x_pos, y_um - self.y_pos, generation)
+
+    def load_capillary(self):
+        self._dispatch(self.model.load_time)
+
+    def eject_capillary(self):
+        self._dispatch(self.model.eject_time)
+
+    def wait(self, timeout=-1, generation=None):
+        if timeout == -1:
+            timeout = self.move_timeout
+        if generation is None:
+            generation = self.stop_generation
+        stop_event = self.stop_event
+        self.check_interrupted(generation)
+
+        remaining = self.busy_until - time.perf_counter()
+        if remaining > 0:
+            stop_event.wait(remaining if timeout is None else min(remaining, timeout))
+        self.check_interrupted(generation)
+        if time.perf_counter() < self.busy_until:
+            with self.stats_lock:
+                self.n_timeouts += 1
+            raise vast_api.VASTTimeoutError(f"synthetic VAST still busy after {timeout} s")
+
+    def check_interrupted(self, generation):
+        if generation is not None and generation != self.stop_generation:
+            with self.stats_lock:
+                self.n_cancelled += 1
+            raise vast_api.VASTCancelledError("synthetic VAST move interrupted")
+
+    def interrupt_move(self):
+        """Cancel the moves in progress. The stage is left at their targets."""
+        with self.stats_lock:
+            self.stop_generation += 1
+            self.n_interrupts += 1
+        self.busy_until = time.perf_counter()
+        stop_event, self.stop_event = self.stop_event, threading.Event()
+        stop_event.set()
+
+    def faults(self):
+        return {
+            "timeouts": self.n_timeouts,
+            "cancelled": self.n_cancelled,
+            "interrupts": self.n_interrupts,
+            "owed_replies": 0,
+        }
+
+    def check_motors_busy_status(self):
+        self.n_commands += 1
+        return int(time.perf_counter() < self.busy_until)
+
+    def move_to_specified_position(self, x_pos=0.0, y_pos=0.0, theta_pos=0.0,
+                                   generation=None):
+        if generation is None:
+            generation = self.stop_generation
+
+        self.move_rel_um(
+            x_um=(x_pos - self.x_pos),
+            y_um=(y_pos - self.y_pos),
+            generation=generation,
+        )
+
+        if theta_pos != self.theta_pos:
+            self.rotate_deg(theta=(theta_pos - self.theta_pos), generation=generation)
+
+    def report_timing(self):
+        """Return the command counts and modelled stage time so far."""
+        return {
+            "commands": self.n_commands,
+            "moves": self.n_moves,
+            "rotations": self.n_rotations,
+            "motion_time": self.motion_time,
+        }
+
+class SyntheticDevice(plugin_device.PluginDevice):
+    """PluginDevice driving a SyntheticVASTController.
+
+    Everything above the pipe (cached positions, the 0.02 move-skip tolerance,
+    autostore handling and commands) is the real PluginDevice, so synthetic runs
+    take as long as a plate run on the VAST would.
+
+    Like Navigate's SyntheticStage, it also has the z and f axes, which the VAST
+    does not drive: they move at once. The axes mapping of the configuration is
+    ignored, as SyntheticStage did.
+
+    The motion model can be tuned from the stage hardware configuration::
+
+        hardware:
+          type: VAST
+          motion_model:
+            x_velocity: 5000.0
+            load_time: 8.0
+          time_scale: 1.0
+
+    Its moves are not added to the plate results file unless `results_path` is
+    set, so that synthetic runs stay out of the results of the VAST.
+    """
+
+    AXES_MAPPING = {"x": "x", "y": "y", "z": "z", "theta": "theta", "f": "f"}
+
+    #: tuple: axes moved without the VAST
+    STAGE_ONLY_AXES = ("z", "f")
+
+    DEFAULT_RESULTS_PATH = False
 
-class SyntheticDevice(SyntheticStage):
     def __init__(self, microscope_name, device_connection, configuration, device_id=0):
+        hardware_config = configuration["configuration"]["microscopes"][microscope_name]["stage"]["hardware"]
+        if isinstance(hardware_config, (list, ListProxy)):
+            hardware_config = hardware_config[device_id]
+
+        model_params = dict(hardware_config.get("motion_model", None) or {})
+        time_scale = float(hardware_config.get("time_scale", 1.0))
+
+        device_connection = SyntheticVASTController(
+            model=motion_model.MotionModel(**model_params),
+            time_scale=time_scale,
+        )
+
+        self.stage_z_pos = 0.0
+        self.stage_f_pos = 0.0
+
         super().__init__(microscope_name, device_connection, configuration, device_id)
 
+        axes_mapping = {
+            axis: self.AXES_MAPPING[axis] for axis in self.axes if axis in self.AXES_MAPPING
+        }
+        if axes_mapping != self.axes_mapping:
+            self.axes_mapping = axes_mapping
+            self.vast_axes = {axis: axis for axis in axes_mapping}
+            self.report_position()
+
+    def _move_absolute(self, move_dictionary, wait_until_done):
+        """Move z and f at once, the other axes through the VAST."""
+        vast_moves = dict(move_dictionary)
+        for axis in self.STAGE_ONLY_AXES:
+            if f"{axis}_abs" not in vast_moves or axis not in self.axes_mapping:
+                continue
+            abs_pos = self.get_abs_position(axis, vast_moves.pop(f"{axis}_abs"))
+            if abs_pos == -1e50:
+                return False
+            setattr(self, f"stage_{axis}_pos", abs_pos)
+            setattr(self, f"{axis}_pos", abs_pos)
+
+        if not any(key.endswith("_abs") for key in vast_moves):
+            return True
+        return super()._move_absolute(vast_moves, wait_until_done)
+
+    def load_sample(self):
+        """Load the next fish into the capillary."""
+        self.vast.load_capillary()
+
+    def unload_sample(self):
+        """Eject the current fish from the capillary."""
+        self.vast.eject_capillary()
+
+    def report_timing(self):
+        """Return the command counts and modelled stage time so far."""
+        return self.vast.report_timing()
+
     @property
     def commands(self):
         """Return commands dictionary
@@ -13,8 +282,8 @@ class SyntheticDevice(SyntheticStage):
         commands : dict
             commands that the device supports
         """
-        return {
-            "move_plugin_device": lambda *args: print(
-                f"move synthetic plugin device {args[0]}!"
-            )
-        }
\ No newline at end of file
+        commands = dict(super().commands)
+        commands["move_plugin_device"] = lambda *args: self.events.record(
+            self.worker.name, "move_plugin_device", outcome=args[0], level=logging.INFO
+        )
+        return commands
@@ -1,4 +1,27 @@
+import os
+import sys
 import time
+import logging
+
+from navigate.tools.common_functions import load_module_from_file
+
+# os.path only: every class in this module is registered as a feature
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Plugin files are executed once per process, by
+# device_startup_functions.load_plugin_module. The loader itself is executed
+# by the first plugin file that needs it, the others find it in sys.modules.
+load_plugin_module = (
+    sys.modules.get('navigate_vast_interface.model.devices.plugin_device.device_startup_functions')
+    or load_module_from_file(
+        'device_startup_functions',
+        os.path.join(MODEL_DIR, 'devices', 'plugin_device', 'device_startup_functions.py')
+    )
+).load_plugin_module
+
+vast_events = load_plugin_module(
+    'vast_events', os.path.join(MODEL_DIR, 'devices', 'APIs', 'vast', 'vast_events.py')
+)
 
 class TestFeature:
     def __init__(self, model, *args):
@@ -23,6 +46,8 @@ class VastAnnotator:
             },
         }
 
+        self.events = vast_events.get_event_log()
+
     def vast_status(self):
         return self.model.configuration["experiment"]["VAST"]["VASTAnnotatorStatus"]
 
@@ -39,7 +64,7 @@ class VastAnnotator:
 
     def signal_func(self):
         
-        print('Pausing data thread...')
+        t_start = time.perf_counter()
         self.model.pause_data_thread()
         
         # build the vast annotator popup window
@@ -50,23 +75,22 @@ class VastAnnotator:
         # need to wait for vast_interface_controller to be initialized
         while True:
             try:
-                vast_status = self.vast_status()
-                print(f"VAST Annotator status = {vast_status}")
-                if vast_status:
-                    print('Initiated!')
+                if self.vast_status():
                     break
             except:
                 pass
             
             time.sleep(1)
+        t_open = time.perf_counter()
+        self.events.record("VastAnnotator", "open_popup", t_open - t_start)
 
         # wait while user selects points (finish on close)
         while self.vast_status():
-            print('Waiting for user selected points...')
             time.sleep(1)
         
-        print('Resuming data thread...')
         self.model.resume_data_thread()
+        self.events.record("VastAnnotator", "annotate", time.perf_counter() - t_open,
+                           level=logging.INFO)
 
         # return True
         
\ No newline at end of file
@@ -0,0 +1,464 @@
+# Standard Imports
+import os
+import time
+import tempfile
+import threading
+from multiprocessing import shared_memory
+
+# Third Party Imports
+import numpy as np
+
+MAGIC = b"VASTIMG1"
+
+#: int: processes that can hold references at the same time (slot 0 is the owner)
+MAX_CLIENTS = 8
+
+#: int: images the index can describe
+MAX_ENTRIES = 512
+
+#: int: bytes of unreferenced images kept for reuse by default
+DEFAULT_CAPACITY = 256 * 2**20
+
+# entry states
+FREE, WRITING, READY = 0, 1, 2
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("clients", "<i8", (MAX_CLIENTS,)),   # pid holding each client slot, 0 if free
+    ("current_group", "S512"),            # group (well) the annotator shows
+])
+
+ENTRY_DTYPE = np.dtype([
+    ("state", "<i4"),
+    ("generation", "<u4"),
+    ("key", "S512"),
+    ("group", "S512"),
+    ("shm_name", "S64"),
+    ("dtype", "S16"),
+    ("ndim", "<i4"),
+    ("shape", "<i8", (4,)),
+    ("nbytes", "<i8"),
+    ("stamp", "<f8"),
+    ("refs", "<i4", (MAX_CLIENTS,)),      # references held by each client
+])
+
+
+def _pid_alive(pid):
+    """Whether a process with this pid is running."""
+    if os.name == "nt":
+        import ctypes
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        PROCESS_QUERY_LIMITED_INFORMATION, STILL_ACTIVE = 0x1000, 259
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            # access denied: running, but not ours to query
+            return ctypes.get_last_error() == 5
+        exit_code = ctypes.c_ulong()
+        try:
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+                return True
+            return exit_code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _open_block(name):
+    """Map an existing shared memory block without taking ownership of it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # python < 3.13 registers the block with the resource tracker again. The
+        # model process shares the tracker of the process that created the block,
+        # where registering twice is harmless, so it is left registered.
+        return shared_memory.SharedMemory(name=name)
+
+
+class IndexLock:
+    """Lock of a store's index, shared by every process and thread using it.
+
+    An exclusive lock on a file named after the store, reentrant within a
+    process.
+    """
+
+    def __init__(self, name):
+        self.path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        self.f = open(self.path, "a+b")
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        self.depth += 1
+        if self.depth == 1:
+            try:
+                self._lock_file()
+            except BaseException:
+                self.depth -= 1
+                self.thread_lock.release()
+                raise
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0:
+            self._unlock_file()
+        self.thread_lock.release()
+
+    if os.name == "nt":
+        def _lock_file(self):
+            import msvcrt
+            self.f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK itself gives up after 10 s
+                    msvcrt.locking(self.f.fileno(), msvcrt.LK_LOCK, 1)
+                    return
+                except OSError:
+                    pass
+
+        def _unlock_file(self):
+            import msvcrt
+            self.f.seek(0)
+            msvcrt.locking(self.f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        def _lock_file(self):
+            import fcntl
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_EX)
+
+        def _unlock_file(self):
+            import fcntl
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_UN)
+
+    def close(self, remove=False):
+        self.f.close()
+        if remove:
+            try:
+                os.remove(self.path)
+            except OSError:
+                # still open in another process
+                pass
+
+
+class SharedImageStore:
+    """Images in shared memory, mapped without copying by several processes.
+
+    Every image lives in its own multiprocessing.shared_memory block. A small
+    index block describes them (key, group, block name, dtype, shape) and holds
+    per-process reference counts. The process that creates the store (the
+    annotator) is its owner: only it allocates and frees blocks. Other processes
+    (e.g. model features) attach to the index by name, and each
+    writes only its own reference slots. Claiming a client slot, taking a
+    reference and freeing an image hold the IndexLock, so the owner never frees
+    an image between a lookup and the reference taken on it.
+
+    Images nobody references are kept for reuse (e.g. reopening the same well)
+    until the store grows beyond `capacity` bytes. Then the oldest ones are
+    freed first. The slots and references of processes that exited without
+    closing the store are reclaimed when a slot is claimed and on evict().
+
+    Keys are unique image identities, e.g. the TIFF path. Groups collect the
+    images of one well.
+    """
+
+    def __init__(self, name=None, create=False, capacity=DEFAULT_CAPACITY):
+        self.create = create
+        self.capacity = capacity
+
+        if create:
+            self.index_shm = shared_memory.SharedMemory(
+                name=name,
+                create=True,
+                size=HEADER_DTYPE.itemsize + MAX_ENTRIES * ENTRY_DTYPE.itemsize,
+            )
+        else:
+            self.index_shm = _open_block(name)
+        self.name = self.index_shm.name
+        self.lock = IndexLock(self.name)
+
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.index_shm.buf)
+        self.entries = np.ndarray(
+            (MAX_ENTRIES,),
+            dtype=ENTRY_DTYPE,
+            buffer=self.index_shm.buf,
+            offset=HEADER_DTYPE.itemsize,
+        )
+
+        if create:
+            self.header["magic"] = MAGIC
+            self.header["clients"][0] = os.getpid()
+            self.slot = 0
+        else:
+            if bytes(self.header["magic"]) != MAGIC:
+                raise ValueError(f"{name} is not a VAST image store")
+            self.slot = self._claim_slot()
+
+        # blocks mapped by this process, {entry index: (generation, shm)}
+        self.blocks = {}
+        # blocks that could not be closed yet because arrays still use them
+        self.zombies = []
+
+    def _claim_slot(self):
+        pid = os.getpid()
+        clients = self.header["clients"]
+        with self.lock:
+            self._reap_dead_clients()
+            for slot in range(1, MAX_CLIENTS):
+                if clients[slot] in (0, pid):
+                    clients[slot] = pid
+                    return slot
+        raise RuntimeError("Too many processes attached to the VAST image store")
+
+    def _reap_dead_clients(self):
+        """Free the slots and references of clients that are no longer running.
+
+        Call with the lock held. Returns the number of slots freed.
+        """
+        clients = self.header["clients"]
+        n_reaped = 0
+        for slot in range(1, MAX_CLIENTS):
+            pid = int(clients[slot])
+            if pid and pid != os.getpid() and not _pid_alive(pid):
+                self.entries["refs"][:, slot] = 0
+                clients[slot] = 0
+                n_reaped += 1
+        return n_reaped
+
+    # lookup
+    def _find(self, key):
+        key = key.encode() if isinstance(key, str) else key
+        hits = np.flatnonzero(
+            (self.entries["state"] == READY) & (self.entries["key"] == key)
+        )
+        return int(hits[0]) if hits.size else None
+
+    def _array(self, i, writeable):
+        entry = self.entries[i]
+        generation = int(entry["generation"])
+
+        mapped = self.blocks.get(i)
+        if mapped is None or mapped[0] != generation:
+            if mapped is not None:
+                self._close_block(mapped[1])
+            shm = _open_block(entry["shm_name"].decode())
+            self.blocks[i] = mapped = (generation, shm)
+
+        shape = tuple(int(n) for n in entry["shape"][:entry["ndim"]])
+        im = np.ndarray(shape, dtype=np.dtype(entry["dtype"].decode()), buffer=mapped[1].buf)
+        im.flags.writeable = writeable
+        return im
+
+    def _close_block(self, shm):
+        try:
+            shm.close()
+        except BufferError:
+            # arrays of this block are still alive, try again later
+            self.zombies += [shm]
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def keys(self, group=None):
+        """Keys of the ready images, optionally only those of one group."""
+        ready = self.entries["state"] == READY
+        if group is not None:
+            ready &= self.entries["group"] == group.encode()
+        return [k.decode() for k in self.entries["key"][ready]]
+
+    # references
+    def get(self, key):
+        """Map an image and take a reference to it.
+
+        Returns
+        -------
+        image : numpy.ndarray or None
+            Read-only (writeable in the owner) view of the shared image, None if
+            the store has no such image. Call release(key) when done with it.
+        """
+        with self.lock:
+            i = self._find(key)
+            if i is None:
+                return None
+            self.entries["refs"][i, self.slot] += 1
+        try:
+            return self._array(i, writeable=self.create)
+        except FileNotFoundError:
+            # the block is gone (e.g. the owner exited), a miss
+            with self.lock:
+                self.entries["refs"][i, self.slot] -= 1
+            return None
+
+    def release(self, key):
+        """Give back a reference taken by get() or allocate()."""
+        with self.lock:
+            i = self._find(key)
+            if i is not None and self.entries["refs"][i, self.slot] > 0:
+                self.entries["refs"][i, self.slot] -= 1
+
+    def release_all(self):
+        """Give back every reference this process holds."""
+        with self.lock:
+            self.entries["refs"][:, self.slot] = 0
+
+    # owner only
+    def allocate(self, key, shape, dtype, group=""):
+        """Create a shared block for an image and take a reference to it.
+
+        Fill the returned array (e.g. decode into it), then call publish(key) to
+        make the image visible to other processes.
+        """
+        if not self.create:
+            raise RuntimeError("Only the owner of the store allocates images")
+
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+
+        # replace an older version of the same image
+        with self.lock:
+            old = self._find(key)
+            if old is not None:
+                self.entries["refs"][old, self.slot] = 0
+                self._free(old, force=False)
+
+        self.evict(extra=nbytes)
+
+        free = np.flatnonzero(self.entries["state"] == FREE)
+        if free.size == 0:
+            raise MemoryError("VAST image store index is full")
+        i = int(free[0])
+
+        shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+
+        entry = self.entries[i]
+        # only the owner takes FREE entries, no lock needed until it is READY
+        entry["state"] = WRITING
+        entry["generation"] += 1
+        entry["key"] = key.encode()
+        entry["group"] = group.encode()
+        entry["shm_name"] = shm.name.encode()
+        entry["dtype"] = dtype.str.encode()
+        entry["ndim"] = len(shape)
+        entry["shape"][:] = 0
+        entry["shape"][:len(shape)] = shape
+        entry["nbytes"] = nbytes
+        entry["stamp"] = time.time()
+        entry["refs"][:] = 0
+        entry["refs"][self.slot] = 1
+
+        self.blocks[i] = (int(entry["generation"]), shm)
+        return self._array(i, writeable=True)
+
+    def publish(self, key):
+        """Make an allocated image visible to get() in every process."""
+        key = key.encode()
+        hits = np.flatnonzero(
+            (self.entries["state"] == WRITING) & (self.entries["key"] == key)
+        )
+        self.entries["state"][hits] = READY
+
+    def put(self, key, image, group=""):
+        """Copy an image into the store. Returns the shared array (referenced)."""
+        im = self.allocate(key, image.shape, image.dtype, group=group)
+        im[...] = image
+        self.publish(key)
+        return im
+
+    def set_current_group(self, group):
+        """Mark the group (well) currently shown by the annotator."""
+        self.header["current_group"] = group.encode()
+
+    def current_group(self):
+        return bytes(self.header["current_group"]).decode()
+
+    def _free(self, i, force=False):
+        entry = self.entries[i]
+        with self.lock:
+            if not force and entry["refs"].sum() > 0:
+                return False
+            entry["state"] = FREE
+        # the owner keeps every block it allocated mapped until it frees it
+        shm = self.blocks.pop(i)[1]
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+        self._close_block(shm)
+        return True
+
+    def evict(self, extra=0):
+        """Free unreferenced images, oldest first, until under capacity.
+
+        Parameters
+        ----------
+        extra : int
+            Bytes about to be allocated.
+
+        Returns
+        -------
+        n_freed : int
+            Number of images freed.
+        """
+        # retry blocks whose arrays have been dropped since
+        zombies, self.zombies = self.zombies, []
+        for shm in zombies:
+            self._close_block(shm)
+
+        if not self.create:
+            return 0
+
+        with self.lock:
+            self._reap_dead_clients()
+
+        used = self.entries["state"] != FREE
+        total = int(self.entries["nbytes"][used].sum()) + extra
+
+        unreferenced = np.flatnonzero(
+            (self.entries["state"] == READY) & (self.entries["refs"].sum(axis=1) == 0)
+        )
+        n_freed = 0
+        for i in unreferenced[np.argsort(self.entries["stamp"][unreferenced])]:
+            if total <= self.capacity:
+                break
+            # _free() checks again for references taken since
+            if self._free(int(i)):
+                total -= int(self.entries["nbytes"][i])
+                n_freed += 1
+        return n_freed
+
+    def stats(self):
+        """Number of images, bytes in use and bytes referenced."""
+        used = self.entries["state"] != FREE
+        referenced = used & (self.entries["refs"].sum(axis=1) > 0)
+        return {
+            "images": int(used.sum()),
+            "bytes": int(self.entries["nbytes"][used].sum()),
+            "referenced_bytes": int(self.entries["nbytes"][referenced].sum()),
+        }
+
+    def close(self):
+        """Unmap the store. The owner also frees every image and the index."""
+        if self.create:
+            for i in np.flatnonzero(self.entries["state"] != FREE):
+                self._free(int(i), force=True)
+        else:
+            with self.lock:
+                self.release_all()
+                self.header["clients"][self.slot] = 0
+            for _, shm in self.blocks.values():
+                self._close_block(shm)
+        self.blocks = {}
+
+        del self.header, self.entries
+        try:
+            self.index_shm.close()
+        except BufferError:
+            pass
+        if self.create:
+            self.index_shm.unlink()
+        self.lock.close(remove=self.create)
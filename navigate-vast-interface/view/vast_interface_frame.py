@@ -113,6 +113,32 @@ class VastInterfaceFrame(ttk.Frame):
         set_focus_button.grid(row=0, column=8, sticky=tk.NW)
         self.buttons["set_focus"] = set_focus_button
 
+        # composite of all channels
+        composite_var = tk.BooleanVar()
+        composite_check = ttk.Checkbutton(axis_tools_frame, variable=composite_var)
+        composite_check.grid(row=0, column=9, sticky=tk.NW)
+        ttk.Label(axis_tools_frame, text="Composite").grid(row=0, column=10)
+        self.inputs["composite"] = {
+            "button": composite_check,
+            "variable": composite_var
+        }
+
+        # middle slice or projection of all slices
+        projection_var = tk.StringVar(value="slice")
+        ttk.Label(axis_tools_frame, text="Show").grid(row=0, column=11)
+        projection_box = ttk.Combobox(
+            axis_tools_frame,
+            textvariable=projection_var,
+            values=["slice", "max", "mean"],
+            state="readonly",
+            width=6,
+        )
+        projection_box.grid(row=0, column=12, sticky=tk.NW)
+        self.inputs["projection"] = {
+            "button": projection_box,
+            "variable": projection_var
+        }
+
         axis_tools_frame.pack()
 
         # label = ttk.Label(self, text="VAST Interface")
@@ -0,0 +1,79 @@
+"""Shared fixtures for the VAST plugin tests.
+
+Plugin files are loaded the way the plugin loads its own, through
+device_startup_functions.load_plugin_module, so a test and the plugin share one
+module per file.
+"""
+
+# Standard Imports
+import importlib.util
+import sys
+from pathlib import Path
+
+# Third Party Imports
+import pytest
+
+PLUGIN_DIR = Path(__file__).resolve().parents[1] / "navigate-vast-interface"
+
+# device_startup_functions, once a plugin file has loaded it
+LOADER_MODULE = "navigate_vast_interface.model.devices.plugin_device.device_startup_functions"
+
+
+def load_plugin_module(rel_path):
+    """Load a plugin python file, path relative to the plugin folder."""
+    loader = sys.modules.get(LOADER_MODULE)
+    if loader is None:
+        loader_path = PLUGIN_DIR / "model/devices/plugin_device/device_startup_functions.py"
+        spec = importlib.util.spec_from_file_location("device_startup_functions", str(loader_path))
+        loader = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(loader)
+
+    path = PLUGIN_DIR / rel_path
+    return loader.load_plugin_module(path.stem, str(path))
+
+
+def make_stage_configuration(microscope_name="VAST", axes=("x", "y", "theta"), **hardware):
+    """Navigate configuration with a single VAST stage, without a results file."""
+    hardware_config = {
+        "type": "VAST",
+        "axes": list(axes),
+        "axes_mapping": list(axes),
+        "results_path": False,
+    }
+    hardware_config.update(hardware)
+    stage = {"hardware": hardware_config}
+    for axis in axes:
+        stage[f"{axis}_min"], stage[f"{axis}_max"] = -1e6, 1e6
+    return {
+        "configuration": {"microscopes": {microscope_name: {"stage": stage}}},
+        "experiment": {"VAST": {}},
+    }
+
+
+@pytest.fixture(scope="session")
+def plugin_module():
+    return load_plugin_module
+
+
+@pytest.fixture(scope="session")
+def stage_configuration():
+    return make_stage_configuration
+
+
+@pytest.fixture
+def make_device():
+    """Make SyntheticDevices of a configuration with `hardware` settings, closed
+    after the test. Moves take no time unless `time_scale` is set."""
+    synthetic_device = load_plugin_module("model/devices/plugin_device/synthetic_device.py")
+    devices = []
+
+    def make_device(**hardware):
+        device = synthetic_device.SyntheticDevice(
+            "VAST", None, make_stage_configuration(**{"time_scale": 0.0, **hardware})
+        )
+        devices.append(device)
+        return device
+
+    yield make_device
+    for device in devices:
+        device.close()
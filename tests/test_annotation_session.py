@@ -0,0 +1,53 @@
+# Standard Imports
+import os
+
+# Third Party Imports
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def annotation_session(plugin_module):
+    return plugin_module("controller/annotation_session.py")
+
+
+def test_session_path_per_well(annotation_session, tmp_path):
+    session_dir = str(tmp_path / "sessions")
+    path = annotation_session.session_path(session_dir, str(tmp_path / "a" / "Well_001"))
+    assert os.path.dirname(path) == session_dir
+    assert os.path.basename(path).startswith("Well_001_")
+    assert path == annotation_session.session_path(session_dir, str(tmp_path / "a" / "x" / ".." / "Well_001"))
+    # wells of the same name in different experiments do not share a session
+    assert path != annotation_session.session_path(session_dir, str(tmp_path / "b" / "Well_001"))
+
+
+def test_save_and_load(annotation_session, tmp_path):
+    path = annotation_session.session_path(str(tmp_path / "sessions"), str(tmp_path / "Well_001"))
+    positions = np.arange(10.0).reshape(2, 5)
+    annotation_session.save_session(path, positions=positions, image_ids=["a", "b"], flip=True)
+
+    state = annotation_session.load_session(path, image_ids=["a", "b"])
+    np.testing.assert_array_equal(state["positions"], positions)
+    assert bool(state["flip"])
+    assert os.listdir(tmp_path / "sessions") == [os.path.basename(path)]
+
+
+def test_save_replaces_the_session(annotation_session, tmp_path):
+    path = str(tmp_path / "session.npz")
+    annotation_session.save_session(path, positions=np.zeros((1, 5)))
+    annotation_session.save_session(path, positions=np.ones((3, 5)))
+    assert annotation_session.load_session(path)["positions"].shape == (3, 5)
+
+
+def test_load_only_for_the_same_images(annotation_session, tmp_path):
+    path = str(tmp_path / "session.npz")
+    annotation_session.save_session(path, positions=np.zeros((1, 5)), image_ids=["a", "b"])
+    assert annotation_session.load_session(path, image_ids=["a", "c"]) is None
+    assert annotation_session.load_session(path) is not None
+
+
+def test_load_missing_or_broken(annotation_session, tmp_path):
+    assert annotation_session.load_session(str(tmp_path / "missing.npz")) is None
+    broken = tmp_path / "broken.npz"
+    broken.write_bytes(b"not a session")
+    assert annotation_session.load_session(str(broken)) is None
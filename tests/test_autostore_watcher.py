@@ -0,0 +1,114 @@
+# Standard Imports
+import os
+
+# Third Party Imports
+import pytest
+
+
+@pytest.fixture(scope="module")
+def autostore_watcher(plugin_module):
+    return plugin_module("controller/autostore_watcher.py")
+
+
+def write_well(well_dir, channels=("BF", "GFP"), n_views=2, n_slices=3, skip=()):
+    """Write the image files of a well, the names in `skip` left out."""
+    for v in range(n_views):
+        view_dir = os.path.join(well_dir, f"view_{v}")
+        os.makedirs(view_dir, exist_ok=True)
+        for chan in channels:
+            for s in range(n_slices):
+                name = f"{chan}_{s}.tiff"
+                if name not in skip:
+                    with open(os.path.join(view_dir, name), "wb") as f:
+                        f.write(b"image")
+
+
+class Watcher:
+    """AutostoreWatcher of a folder, polled at given times."""
+
+    def __init__(self, autostore_watcher, root, settle=0.5):
+        self.wells = []
+        self.watcher = autostore_watcher.AutostoreWatcher(
+            str(root), lambda *well: self.wells.append(well), settle=settle
+        )
+
+    def poll(self, *times):
+        return [self.watcher.poll(now=t) for t in times]
+
+
+def test_find_wells(autostore_watcher, tmp_path):
+    write_well(str(tmp_path / "plate" / "Well_001"))
+    write_well(str(tmp_path / "plate" / "Well_002"))
+    os.makedirs(tmp_path / "other")
+    assert sorted(autostore_watcher.find_wells(str(tmp_path))) == [
+        str(tmp_path / "plate" / "Well_001"),
+        str(tmp_path / "plate" / "Well_002"),
+    ]
+
+
+def test_well_layout(autostore_watcher, tmp_path):
+    well_dir = str(tmp_path / "Well_001")
+    write_well(well_dir, channels=("GFP", "BF"), n_views=3, n_slices=4)
+    with open(os.path.join(well_dir, "view_0", "notes.txt"), "w") as f:
+        f.write("not an image")
+    views = autostore_watcher.scan_well(well_dir)
+    assert sorted(views) == [os.path.join(well_dir, f"view_{v}") for v in range(3)]
+    assert autostore_watcher.well_layout(views) == (3, ("BF", "GFP"), 4)
+
+
+@pytest.mark.parametrize("skip", [("GFP_2.tiff",), ("BF_0.tiff", "GFP_0.tiff")])
+def test_well_layout_of_a_well_being_written(autostore_watcher, tmp_path, skip):
+    well_dir = str(tmp_path / "Well_001")
+    write_well(well_dir)
+    for name in skip:
+        os.remove(os.path.join(well_dir, "view_1", name))
+    assert autostore_watcher.well_layout(autostore_watcher.scan_well(well_dir)) is None
+
+
+def test_well_layout_of_an_empty_file(autostore_watcher, tmp_path):
+    well_dir = str(tmp_path / "Well_001")
+    write_well(well_dir)
+    open(os.path.join(well_dir, "view_0", "BF_1.tiff"), "wb").close()
+    assert autostore_watcher.well_layout(autostore_watcher.scan_well(well_dir)) is None
+
+
+def test_reports_a_new_well_once_settled(autostore_watcher, tmp_path):
+    write_well(str(tmp_path / "Well_001"))
+    watcher = Watcher(autostore_watcher, tmp_path)
+    assert watcher.poll(0.0) == [[]]
+
+    well_dir = str(tmp_path / "Well_002")
+    write_well(well_dir)
+    assert watcher.poll(1.0, 1.2, 1.4) == [[], [], []]
+    assert watcher.poll(1.6, 1.7) == [[well_dir], []]
+    assert watcher.wells == [(
+        well_dir,
+        [os.path.join(well_dir, "view_0"), os.path.join(well_dir, "view_1")],
+        ["BF", "GFP"],
+        3,
+    )]
+
+
+def test_waits_for_the_last_images(autostore_watcher, tmp_path):
+    watcher = Watcher(autostore_watcher, tmp_path)
+    well_dir = str(tmp_path / "Well_001")
+    write_well(well_dir, skip=("GFP_2.tiff",))
+    assert watcher.poll(0.0, 1.0, 2.0) == [[], [], []]
+
+    write_well(well_dir)
+    # the change restarts the settle time
+    assert watcher.poll(3.0, 3.4, 3.5) == [[], [], [well_dir]]
+
+
+def test_a_new_layout_settles_longer(autostore_watcher, tmp_path):
+    write_well(str(tmp_path / "Well_001"))
+    watcher = Watcher(autostore_watcher, tmp_path)
+
+    well_dir = str(tmp_path / "Well_002")
+    write_well(well_dir, channels=("BF",))
+    settle = autostore_watcher.RELAYOUT_SETTLE * 0.5
+    assert watcher.poll(0.0, 0.0, settle - 0.1, settle) == [[], [], [], [well_dir]]
+
+    # the new layout is now the expected one
+    write_well(str(tmp_path / "Well_003"), channels=("BF",))
+    assert watcher.poll(10.0, 10.0, 10.5) == [[], [], [str(tmp_path / "Well_003")]]
@@ -0,0 +1,55 @@
+# Third Party Imports
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def capillary_geometry(plugin_module):
+    return plugin_module("controller/capillary_geometry.py")
+
+
+POINTS = np.array([[10.0, 5.0, 2.0], [20.0, -3.0, 4.0]])
+AXIS = (1.0, 2.0)
+
+
+def test_rotate_points_quarter_turn(capillary_geometry):
+    rotated = capillary_geometry.rotate_points(POINTS, 90, AXIS)
+    # (y, z) relative to the axis turns from (4, 0) to (0, 4) and from (-4, 2) to (-2, -4)
+    np.testing.assert_allclose(rotated, [[10.0, 1.0, 6.0], [20.0, -1.0, -2.0]], atol=1e-12)
+
+
+def test_rotate_points_keeps_the_distance_to_the_axis(capillary_geometry):
+    rotated = capillary_geometry.rotate_points(POINTS, [0, 37, 180, 360], AXIS)
+    assert rotated.shape == (4, 2, 3)
+    np.testing.assert_allclose(rotated[0], POINTS)
+    np.testing.assert_allclose(rotated[3], POINTS, atol=1e-12)
+    radius = np.hypot(rotated[..., 1] - AXIS[0], rotated[..., 2] - AXIS[1])
+    np.testing.assert_allclose(radius, np.broadcast_to(radius[0], radius.shape))
+
+
+def test_rotate_points_theta_sign(capillary_geometry):
+    forward = capillary_geometry.rotate_points(POINTS, 30, AXIS, theta_sign=-1.0)
+    backward = capillary_geometry.rotate_points(POINTS, -30, AXIS)
+    np.testing.assert_allclose(forward, backward)
+
+
+def test_stage_positions_rows(capillary_geometry):
+    positions = capillary_geometry.stage_positions(
+        POINTS, origin=(10.0, 5.0, 2.0), thetas=[0, 180], axis_yz=AXIS, um_per_pix=2.0
+    )
+    assert positions.shape == (4, 5)
+    # grouped by rotation, in the order given
+    assert positions[:, 3].tolist() == [0.0, 0.0, 180.0, 180.0]
+    # the origin itself is at zero, z goes to the focus axis
+    np.testing.assert_allclose(positions[0], [0, 0, 0, 0, 0])
+    np.testing.assert_allclose(positions[1], [20.0, -16.0, 0.0, 0.0, 4.0])
+    # half a turn mirrors (y, z) about the axis
+    np.testing.assert_allclose(positions[2, [1, 4]], [-16.0, 0.0], atol=1e-12)
+
+
+def test_stage_positions_flip(capillary_geometry):
+    kwargs = dict(origin=(0.0, 0.0, 0.0), thetas=[0], axis_yz=AXIS, um_per_pix=1.0)
+    plain = capillary_geometry.stage_positions(POINTS, **kwargs)
+    flipped = capillary_geometry.stage_positions(POINTS, flip=(-1, 1, -1), **kwargs)
+    np.testing.assert_allclose(flipped[:, [0, 4]], -plain[:, [0, 4]])
+    np.testing.assert_allclose(flipped[:, 1], plain[:, 1])
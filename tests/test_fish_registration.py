@@ -0,0 +1,64 @@
+# Third Party Imports
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def fish_registration(plugin_module):
+    return plugin_module("controller/fish_registration.py")
+
+
+def blobs(shape, seed=0, n=400):
+    """Image of random gaussian blobs, structured enough to register."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[:shape[0], :shape[1]].astype(np.float32)
+    im = np.zeros(shape, dtype=np.float32)
+    for cy, cx, s in zip(rng.uniform(0, shape[0], n), rng.uniform(0, shape[1], n), rng.uniform(2, 6, n)):
+        im += np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (2 * s ** 2))
+    return im
+
+
+def test_downsample_block_mean(fish_registration):
+    im = np.arange(16, dtype=float).reshape(4, 4)
+    np.testing.assert_allclose(fish_registration.downsample(im, 2), [[2.5, 4.5], [10.5, 12.5]])
+    assert fish_registration.downsample(im, 1).dtype == np.float32
+
+
+def test_phase_correlation_finds_the_shift(fish_registration):
+    field = blobs((240, 300))
+    ref = field[20:148, 20:180]
+    # the same field, 9 px further right and 5 px further up
+    mov = field[15:143, 29:189]
+    shift, peak = fish_registration.phase_correlation(ref, mov)
+    np.testing.assert_allclose(shift, [-9, 5], atol=0.5)
+    assert peak > 0.5
+
+
+@pytest.mark.parametrize("max_size", [512, 64])
+def test_register_translation(fish_registration, max_size):
+    field = blobs((240, 300), seed=1)
+    ref = field[20:212, 20:276]
+    mov = field[27:219, 8:264]
+    A, t, peak = fish_registration.register(ref, mov, max_size=max_size)
+    np.testing.assert_allclose(A, np.eye(2))
+    # a point (x, y) of the reference lies at (x + 12, y - 7) in the new fish
+    np.testing.assert_allclose(t, [12, -7], atol=1.0)
+
+
+def test_register_affine_stays_near_the_translation(fish_registration):
+    field = blobs((240, 300), seed=2)
+    ref = field[20:212, 20:276]
+    mov = field[16:208, 14:270]
+    A, t, _ = fish_registration.register(ref, mov, affine=True)
+    assert np.abs(A - np.eye(2)).max() <= fish_registration.MAX_AFFINE
+    points = np.array([[100.0, 80.0], [150.0, 120.0]])
+    np.testing.assert_allclose(fish_registration.transform_points(A, t, points), points + [6, 4], atol=1.5)
+
+
+def test_transform_points(fish_registration):
+    A = np.array([[0.0, -1.0], [1.0, 0.0]])
+    points = np.array([[1.0, 0.0], [2.0, 3.0]])
+    np.testing.assert_allclose(
+        fish_registration.transform_points(A, np.array([10.0, 20.0]), points),
+        [[10.0, 21.0], [7.0, 22.0]],
+    )
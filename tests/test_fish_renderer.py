@@ -0,0 +1,112 @@
+# Third Party Imports
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def fish_renderer(plugin_module):
+    return plugin_module("controller/fish_renderer.py")
+
+
+def make_images(seed=0):
+    rng = np.random.default_rng(seed)
+    return [{
+        "BF": rng.integers(100, 4000, (32, 48)).astype(np.uint16),
+        "GFP": rng.integers(0, 200, (32, 48)).astype(np.uint16),
+    }]
+
+
+def test_channel_colors(fish_renderer):
+    colors = fish_renderer.channel_colors(["bf", "GFP", "Cy5", "Cy7"])
+    np.testing.assert_array_equal(colors, [
+        (1.0, 1.0, 1.0), (0.0, 1.0, 0.0),
+        fish_renderer.DEFAULT_COLORS[0], fish_renderer.DEFAULT_COLORS[1],
+    ])
+
+
+@pytest.mark.parametrize("gamma", [1.0, 0.5])
+def test_default_display_is_adjust_gamma(fish_renderer, gamma):
+    exposure = pytest.importorskip("skimage.exposure")
+    images = make_images()
+    renderer = fish_renderer.FishRenderer(images, ["BF", "GFP"])
+
+    # adjust_gamma, scaled to [min, max] as imshow does
+    expected = exposure.adjust_gamma(images[0]["BF"], gamma).astype(float)
+    expected = 255 * (expected - expected.min()) / (expected.max() - expected.min())
+    np.testing.assert_allclose(renderer.gray(0, "BF", gamma), expected, atol=1.5)
+    assert renderer.window(0, "BF") is None
+
+
+def test_auto_contrast_windows_to_the_percentiles(fish_renderer):
+    images = make_images()
+    renderer = fish_renderer.FishRenderer(images, ["BF", "GFP"])
+    lo, hi = renderer.auto_contrast(0, "BF", low=10, high=90)
+    np.testing.assert_allclose(
+        (lo, hi), np.percentile(images[0]["BF"], [10, 90]), rtol=0.01
+    )
+
+    table = renderer.lut(0, "BF", 0.5)
+    assert table[int(lo)] == 0.0
+    assert table[int(hi)] == 1.0
+    assert table[int((lo + hi) / 2)] == pytest.approx(np.sqrt(0.5), abs=0.01)
+
+
+def test_flat_image_gets_a_window(fish_renderer):
+    images = [{"BF": np.full((8, 8), 7, dtype=np.uint16)}]
+    renderer = fish_renderer.FishRenderer(images, ["BF"])
+    # black by default, as imshow shows it
+    assert (renderer.gray(0, "BF", 1.0) == 0).all()
+    assert renderer.auto_contrast(0, "BF") == (0.0, 7.0)
+    assert (renderer.gray(0, "BF", 1.0) == 255).all()
+
+
+def test_float_images_are_quantized(fish_renderer):
+    im = np.linspace(-1.0, 1.0, 64, dtype=np.float32).reshape(8, 8)
+    renderer = fish_renderer.FishRenderer([{"BF": im}], ["BF"])
+    renderer.auto_contrast(0, "BF", low=0, high=100)
+    np.testing.assert_allclose(renderer.layer(0, "BF", 1.0), (im + 1) / 2, atol=1e-3)
+
+
+def test_lookup_tables_are_cached(fish_renderer):
+    renderer = fish_renderer.FishRenderer(make_images(), ["BF", "GFP"])
+    table = renderer.lut(0, "BF", 0.5)
+    assert renderer.lut(0, "BF", 0.5) is table
+    assert renderer.lut(0, "BF", 0.6) is not table
+
+    table = renderer.lut(0, "BF", 0.6)
+    renderer.auto_contrast(0, "BF")
+    assert renderer.lut(0, "BF", 0.6) is not table
+
+
+def test_composite_blends_the_channel_colours(fish_renderer):
+    images = make_images()
+    renderer = fish_renderer.FishRenderer(images, ["BF", "GFP"])
+    gammas = [1.0, 0.5]
+
+    bf = renderer.layer(0, "BF", gammas[0])
+    gfp = renderer.layer(0, "GFP", gammas[1])
+    # BF is white and GFP green, green saturates
+    expected = np.stack([bf, np.minimum(bf + gfp, 1.0), bf], axis=-1) * 255
+    rgb = renderer.composite(0, gammas)
+    assert rgb.dtype == np.uint8 and rgb.shape == (32, 48, 3)
+    np.testing.assert_allclose(rgb, expected, atol=1.0)
+
+    # the buffer is reused
+    assert renderer.composite(0, gammas) is rgb
+
+
+def test_stack_recomputes_only_changed_layers(fish_renderer, monkeypatch):
+    renderer = fish_renderer.FishRenderer(make_images(), ["BF", "GFP"])
+    renderer.stack(0, [1.0, 1.0])
+
+    layers = []
+    layer = renderer.layer
+    monkeypatch.setattr(renderer, "layer", lambda view, chan, *args, **kwargs: (
+        layers.append(chan), layer(view, chan, *args, **kwargs)
+    )[1])
+    renderer.stack(0, [1.0, 0.8])
+    assert layers == ["GFP"]
+
+    renderer.auto_contrast(0, "BF", low=10, high=90)
+    renderer.stack(0, [1.0, 0.8])
+    assert layers == ["GFP", "BF"]
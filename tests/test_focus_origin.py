@@ -0,0 +1,51 @@
+# Third Party Imports
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def focus_origin(plugin_module):
+    return plugin_module("controller/focus_origin.py")
+
+
+def capillary(l=200, w=320, top=60, bottom=140, seed=0, tilt=0.0):
+    """Side view of a bright capillary between rows top and bottom, with noise."""
+    rng = np.random.default_rng(seed)
+    rows = np.arange(l)[:, None]
+    shift = tilt * (np.arange(w)[None, :] - w / 2)
+    im = np.where((rows >= top + shift) & (rows < bottom + shift), 1000.0, 200.0)
+    return (im + rng.normal(0, 20, (l, w))).astype(np.uint16)
+
+
+def test_row_profiles(focus_origin):
+    im = np.tile(np.arange(10, dtype=np.float32)[:, None], (1, 32))
+    profiles = focus_origin.row_profiles(im, n_strips=4, smoothing=1)
+    assert profiles.shape == (10, 4)
+    np.testing.assert_allclose(profiles[:, 0], np.arange(10))
+
+    smoothed = focus_origin.row_profiles(im, n_strips=4, smoothing=3)
+    assert smoothed.shape == (10, 4)
+    np.testing.assert_allclose(smoothed[1:-1, 0], np.arange(1, 9))
+
+
+def test_estimates_the_centreline(focus_origin):
+    estimate = focus_origin.estimate_focus_origin(capillary(top=60, bottom=140))
+    assert estimate["z"] == pytest.approx(100.0, abs=1.0)
+    assert estimate["spread"] <= 1.0
+    assert estimate["agreement"] == 1.0
+
+
+def test_strips_without_edges_do_not_move_the_estimate(focus_origin):
+    im = capillary(top=50, bottom=110, seed=1)
+    # a quarter of the strips is saturated, e.g. a bubble
+    im[:, :80] = 4000
+    estimate = focus_origin.estimate_focus_origin(im)
+    assert estimate["z"] == pytest.approx(80.0, abs=1.0)
+    assert 0.5 <= estimate["agreement"] < 1.0
+
+
+def test_a_tilted_capillary_has_a_spread(focus_origin):
+    straight = focus_origin.estimate_focus_origin(capillary(seed=2))
+    tilted = focus_origin.estimate_focus_origin(capillary(seed=2, tilt=0.1))
+    assert tilted["z"] == pytest.approx(straight["z"], abs=2.0)
+    assert tilted["spread"] > straight["spread"] + 5
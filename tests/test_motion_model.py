@@ -0,0 +1,115 @@
+# Third Party Imports
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def motion_model(plugin_module):
+    return plugin_module("model/devices/APIs/vast/motion_model.py")
+
+
+def test_profile_time(motion_model):
+    profile_time = motion_model.MotionModel.profile_time
+    # triangular: never reaches 100 um/s over 1 um at 100 um/s^2
+    assert profile_time(1.0, 100.0, 100.0) == pytest.approx(2 * np.sqrt(1.0 / 100.0))
+    # trapezoidal: 1 s cruising and 2 x 0.5 s accelerating and decelerating
+    assert profile_time(-150.0, 100.0, 200.0) == pytest.approx(2.0)
+    assert profile_time(0.0, 100.0, 200.0) == 0.0
+
+    distances = [0.0, 1.0, -150.0, 1e4]
+    assert motion_model.MotionModel.profile_times(distances, 100.0, 200.0) == pytest.approx(
+        [profile_time(d, 100.0, 200.0) for d in distances]
+    )
+
+
+def test_xy_moves_take_as_long_as_the_slowest_axis(motion_model):
+    model = motion_model.MotionModel(y_velocity=500.0)
+    assert model.xy_time(1000.0, 1000.0) == pytest.approx(
+        model.command_overhead + model.axis_time("y", 1000.0)
+    )
+    assert model.xy_time(0.01, -0.01) == 0.0
+    assert model.theta_time(0.01) == 0.0
+    assert model.xy_times(np.array([0.01, 1000.0]), np.array([0.0, 1000.0])) == pytest.approx(
+        [0.0, model.xy_time(1000.0, 1000.0)]
+    )
+
+
+def test_unknown_parameters_are_refused(motion_model):
+    with pytest.raises(KeyError):
+        motion_model.MotionModel(z_velocity=1.0)
+
+
+def test_estimate_follows_the_quantized_commands(motion_model):
+    model = motion_model.MotionModel()
+    positions = [(x, 0.0, 0.0, 0.0, 0.0) for x in (0.6, 1.2, 1.8)]
+
+    # VASTController tracks the unquantized targets, so each command is
+    # int(0.6) = 0 microsteps, the truncation is not carried over
+    estimate = motion_model.estimate_positions_time(
+        positions, model, um_to_us=1.0, deg_to_us=1.0, start=(0.0, 0.0, 0.0)
+    )
+    assert estimate["move_times"] == [0.0, 0.0, 0.0]
+
+    estimate = motion_model.estimate_positions_time(
+        positions[::2], model, um_to_us=1.0, deg_to_us=1.0, start=(0.0, 0.0, 0.0)
+    )
+    assert estimate["move_times"] == [0.0, model.xy_time(1.0, 0.0)]
+    assert estimate["fish_time"] == pytest.approx(
+        estimate["stage_time"] + model.load_time + model.eject_time
+    )
+
+
+def test_estimate_starts_at_the_first_position(motion_model):
+    model = motion_model.MotionModel()
+    positions = [(100.0, 0.0, 0.0, 0.0, 0.0), (100.0, 50.0, 0.0, 90.0, 0.0)]
+    estimate = motion_model.estimate_positions_time(positions, model)
+    assert estimate["move_times"] == pytest.approx([0.0, model.move_time(0.0, 50.0, 90.0)])
+    assert motion_model.estimate_positions_time([], model)["stage_time"] == 0.0
+
+
+def test_calibration_converges_to_the_measured_times(motion_model):
+    truth = motion_model.MotionModel(xy_scale=1.5, theta_scale=0.8)
+    model = motion_model.MotionModel()
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        dx, dy = rng.uniform(-2000, 2000, 2)
+        dtheta = rng.choice([0.0, 90.0, -180.0])
+        duration = truth.move_time(dx, dy, dtheta) * rng.normal(1.0, 0.01)
+        model.observe(dx, dy, dtheta, duration)
+
+    assert model.xy_scale == pytest.approx(1.5, rel=0.02)
+    assert model.theta_scale == pytest.approx(0.8, rel=0.05)
+    assert model.n_observations == 200
+
+    # moves below the tolerance say nothing about the timing
+    model.observe(0.0, 0.0, 0.0, 10.0)
+    assert model.n_observations == 200
+
+
+def test_calibration_roundtrip(motion_model):
+    model = motion_model.MotionModel()
+    model.observe(1000.0, 0.0, 0.0, 2 * model.xy_time(1000.0, 0.0))
+
+    restored = motion_model.MotionModel()
+    restored.set_calibration(model.calibration())
+    assert restored.calibration() == model.calibration()
+    assert restored.xy_time(500.0, 0.0) == pytest.approx(model.xy_time(500.0, 0.0))
+
+
+def test_device_writes_the_calibration_at_most_every_interval(plugin_module, stage_configuration):
+    synthetic_device = plugin_module("model/devices/plugin_device/synthetic_device.py")
+    configuration = stage_configuration(time_scale=0.0)
+    device = synthetic_device.SyntheticDevice("VAST", None, configuration)
+    try:
+        for x in (100.0, 200.0, 300.0):
+            assert device.move_absolute({"x_abs": x}, wait_until_done=True)
+        assert "MotionCalibration" not in configuration["experiment"]["VAST"]
+
+        device.calibration_written -= device.CALIBRATION_INTERVAL
+        assert device.move_absolute({"x_abs": 400.0}, wait_until_done=True)
+        assert configuration["experiment"]["VAST"]["MotionCalibration"]["n_observations"] == 4
+
+        assert device.move_absolute({"x_abs": 500.0}, wait_until_done=True)
+    finally:
+        device.close()
+    assert configuration["experiment"]["VAST"]["MotionCalibration"]["n_observations"] == 5
@@ -0,0 +1,82 @@
+# Standard Imports
+import time
+
+# Third Party Imports
+import pytest
+
+
+def wait_for(condition, timeout=5.0):
+    t_end = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < t_end, "timed out"
+        time.sleep(0.005)
+
+
+def test_axis_moves_are_separate_without_a_window(make_device):
+    device = make_device()
+    device.move_axis_absolute("x", 100.0, wait_until_done=True)
+    device.move_axis_absolute("y", 20.0, wait_until_done=True)
+    assert device.vast.n_moves == 2
+    assert device.move_stats["merged"] == 0
+
+
+def test_axis_moves_within_the_window_are_merged(make_device):
+    device = make_device(coalesce_window=60.0)
+    device.move_axis_absolute("x", 100.0)
+    device.move_axis_absolute("y", 20.0)
+    assert device.vast.n_moves == 0
+
+    # waiting for a move sends the buffered targets along with it
+    assert device.move_axis_absolute("theta", 90.0, wait_until_done=True)
+    assert device.vast.n_moves == 1
+    assert device.vast.n_rotations == 1
+    assert device.vast.get_current_position() == (100.0, 20.0, 90.0)
+    assert device.move_stats["flushes"] == 1
+    assert device.move_stats["merged"] == 2
+
+
+def test_the_window_sends_the_buffered_moves(make_device):
+    device = make_device(coalesce_window=0.02)
+    device.move_axis_absolute("x", 100.0)
+    device.move_axis_absolute("y", 20.0)
+    wait_for(lambda: device.vast.get_current_position()[:2] == (100.0, 20.0))
+    assert device.vast.n_moves == 1
+    assert device.pending_moves == {}
+
+
+def test_move_absolute_takes_the_buffered_targets(make_device):
+    device = make_device(coalesce_window=60.0)
+    device.move_axis_absolute("x", 100.0)
+    assert device.move_absolute({"y_abs": 20.0}, wait_until_done=True)
+    assert device.vast.n_moves == 1
+    assert device.vast.get_current_position()[:2] == (100.0, 20.0)
+
+
+def test_transaction_sends_one_move(make_device):
+    device = make_device()
+    with device.transaction():
+        device.move_axis_absolute("x", 100.0)
+        with device.transaction():
+            device.move_axis_absolute("y", 20.0)
+        # sent by the outermost transaction only
+        assert device.vast.n_moves == 0
+        device.move_axis_absolute("theta", 90.0, wait_until_done=True)
+        assert device.vast.n_moves == 0
+
+    assert device.vast.n_moves == 1
+    assert device.vast.get_current_position() == (100.0, 20.0, 90.0)
+    assert device.move_stats["merged"] == 2
+
+
+def test_failed_transaction_drops_its_moves(make_device):
+    device = make_device()
+    with pytest.raises(RuntimeError):
+        with device.transaction():
+            device.move_axis_absolute("x", 100.0)
+            raise RuntimeError("abort")
+
+    assert device.pending_moves == {}
+    assert device.transaction_depth == 0
+    device.flush_moves(wait_until_done=True)
+    assert device.vast.n_moves == 0
+    assert device.vast.get_current_position()[0] == 0
@@ -0,0 +1,61 @@
+# Third Party Imports
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def position_schedule(plugin_module):
+    return plugin_module("controller/position_schedule.py")
+
+
+def chebyshev_times(dx, dy):
+    """XY move durations of independent axes at unit speed."""
+    return np.maximum(np.abs(dx), np.abs(dy))
+
+
+def test_rotation_order_sweeps_up_from_the_start(position_schedule):
+    assert position_schedule.rotation_order([270, 0, 180, 90], 0) == [0, 90, 180, 270]
+
+
+def test_rotation_order_goes_to_the_nearer_end_first(position_schedule):
+    # 70 deg up to 270, then 270 down to 0, is shorter than 200 down and 270 up
+    assert position_schedule.rotation_order([0, 90, 270], 200) == [270, 90, 0]
+    assert position_schedule.rotation_order([0, 90, 270], 60) == [0, 90, 270]
+
+
+def test_count_rotations(position_schedule):
+    rows = [[0, 0, 0, theta, 0] for theta in (0, 0, 90, 90, 0)]
+    assert position_schedule.count_rotations(rows) == 2
+    assert position_schedule.count_rotations(rows, start=180) == 3
+    assert position_schedule.count_rotations(np.zeros((0, 5))) == 0
+
+
+def test_xy_tour_visits_points_on_a_line_in_order(position_schedule):
+    x = np.array([30.0, 10.0, 50.0, 20.0, 40.0])
+    points = np.column_stack((x, np.zeros_like(x)))
+    order = position_schedule.xy_tour(points, (0.0, 0.0), chebyshev_times)
+    assert x[order].tolist() == [10.0, 20.0, 30.0, 40.0, 50.0]
+
+
+def test_schedule_visits_each_rotation_once(position_schedule):
+    rng = np.random.default_rng(0)
+    n = 12
+    thetas = np.tile([0.0, 90.0, 180.0], n)
+    positions = np.column_stack((
+        rng.uniform(0, 1000, 3 * n),
+        rng.uniform(-50, 50, 3 * n),
+        np.zeros(3 * n),
+        thetas,
+        np.zeros(3 * n),
+    ))
+
+    order = position_schedule.schedule_positions(positions, chebyshev_times, start=(0, 0, 0))
+    assert sorted(order.tolist()) == list(range(3 * n))
+    assert positions[order, 3].tolist() == [0.0] * n + [90.0] * n + [180.0] * n
+    assert position_schedule.count_rotations(positions[order], 0) == 2
+    assert position_schedule.count_rotations(positions, 0) > 2
+
+
+def test_schedule_of_no_positions(position_schedule):
+    order = position_schedule.schedule_positions(np.zeros((0, 5)), chebyshev_times)
+    assert order.shape == (0,)
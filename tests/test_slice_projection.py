@@ -0,0 +1,143 @@
+# Standard Imports
+import os
+from types import SimpleNamespace
+
+# Third Party Imports
+import numpy as np
+import pytest
+
+tifffile = pytest.importorskip("tifffile")
+
+
+@pytest.fixture(scope="module")
+def slice_projection(plugin_module):
+    return plugin_module("controller/slice_projection.py")
+
+
+def write_stack(view_dir, chan="GFP", n_slices=5, seed=0, dtype=np.uint16):
+    """Write the slices of a view's channel, return them as an array."""
+    os.makedirs(view_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    stack = rng.integers(0, 1000, (n_slices, 16, 24)).astype(dtype)
+    for i, im in enumerate(stack):
+        tifffile.imwrite(os.path.join(view_dir, f"{chan}_{i}.tif"), im)
+    return stack
+
+
+def touch(path, seconds):
+    """Move the modification time of a file `seconds` forward."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + int(seconds * 1e9)))
+
+
+def test_slice_paths_in_slice_order(slice_projection, tmp_path):
+    write_stack(tmp_path, "GFP", n_slices=12)
+    write_stack(tmp_path, "BF", n_slices=2)
+    (tmp_path / "GFP_notes.txt").write_text("")
+
+    paths = slice_projection.slice_paths(str(tmp_path), "GFP")
+    assert [os.path.basename(p) for p in paths] == [f"GFP_{i}.tif" for i in range(12)]
+
+
+@pytest.mark.parametrize("dtype", [np.uint16, np.float32])
+def test_max_and_mean(slice_projection, tmp_path, dtype):
+    stack = write_stack(tmp_path, dtype=dtype)
+    paths = slice_projection.slice_paths(str(tmp_path), "GFP")
+
+    np.testing.assert_array_equal(slice_projection.project(paths, "max"), stack.max(axis=0))
+
+    mean = slice_projection.project(paths, "mean")
+    assert mean.dtype == dtype
+    expected = stack.astype(np.float64).mean(axis=0)
+    if dtype == np.uint16:
+        expected = np.rint(expected)
+    np.testing.assert_allclose(mean, expected, rtol=1e-6)
+
+
+def test_project_into_a_given_array(slice_projection, tmp_path):
+    stack = write_stack(tmp_path)
+    paths = slice_projection.slice_paths(str(tmp_path), "GFP")
+    out = np.zeros(stack.shape[1:], stack.dtype)
+    assert slice_projection.project(paths, "max", out=out) is out
+    np.testing.assert_array_equal(out, stack.max(axis=0))
+
+
+def test_unknown_projection(slice_projection, tmp_path):
+    write_stack(tmp_path)
+    with pytest.raises(ValueError):
+        slice_projection.project(slice_projection.slice_paths(str(tmp_path), "GFP"), "min")
+
+
+def test_key_changes_with_the_slices(slice_projection, tmp_path):
+    write_stack(tmp_path)
+    paths = slice_projection.slice_paths(str(tmp_path), "GFP")
+    key = slice_projection.projection_key(paths, "max")
+    assert slice_projection.projection_key(paths, "max") == key
+    assert slice_projection.projection_key(paths, "mean") != key
+
+    # any slice rewritten
+    touch(paths[2], 1)
+    rewritten = slice_projection.projection_key(paths, "max")
+    assert rewritten != key
+
+    # a slice added, older than the newest
+    added = os.path.join(tmp_path, "GFP_5.tif")
+    tifffile.imwrite(added, np.zeros((16, 24), np.uint16))
+    os.utime(added, ns=(0, os.stat(paths[0]).st_mtime_ns))
+    paths = slice_projection.slice_paths(str(tmp_path), "GFP")
+    assert len(paths) == 6
+    assert slice_projection.projection_key(paths, "max") not in (key, rewritten)
+
+
+@pytest.fixture(scope="module")
+def project_slices(plugin_module):
+    controller = plugin_module("controller/vast_interface_controller.py")
+    return controller, controller.VastInterfaceController.project_slices
+
+
+def test_projections_are_cached_per_well(slice_projection, project_slices, tmp_path):
+    controller, project_slices = project_slices
+    annotator = SimpleNamespace(slice_projection=slice_projection, image_store=None)
+    view_dir = str(tmp_path / "Well_A1" / "view_0")
+    stack = write_stack(view_dir)
+
+    im, key, _ = project_slices(annotator, view_dir, "GFP", "max")
+    np.testing.assert_array_equal(im, stack.max(axis=0))
+    assert project_slices(annotator, view_dir, "GFP", "max")[0] is im
+
+    # a rewritten slice is projected again
+    stack = write_stack(view_dir, seed=1)
+    touch(os.path.join(view_dir, "GFP_0.tif"), 1)
+    im, new_key, _ = project_slices(annotator, view_dir, "GFP", "max")
+    assert new_key != key
+    np.testing.assert_array_equal(im, stack.max(axis=0))
+
+    # only the projections of the last well are kept
+    other_dir = str(tmp_path / "Well_A2" / "view_0")
+    write_stack(other_dir)
+    project_slices(annotator, other_dir, "GFP", "max")
+    assert list(controller._projections) == [str(tmp_path / "Well_A2")]
+
+
+def test_projections_go_to_the_image_store(plugin_module, slice_projection, project_slices,
+                                           tmp_path):
+    controller, project_slices = project_slices
+    vast_image_store = plugin_module("model/vast_image_store.py")
+    store = vast_image_store.SharedImageStore(create=True)
+    try:
+        annotator = SimpleNamespace(slice_projection=slice_projection, image_store=store)
+        view_dir = str(tmp_path / "Well_A1" / "view_0")
+        stack = write_stack(view_dir)
+
+        im, key, allocated = project_slices(annotator, view_dir, "GFP", "mean")
+        assert allocated
+        store.publish(key)
+        np.testing.assert_array_equal(im, np.rint(stack.mean(axis=0)))
+        assert store.keys(controller.image_group(str(tmp_path / "Well_A1"), "mean")) == [key]
+
+        cached, cached_key, allocated = project_slices(annotator, view_dir, "GFP", "mean")
+        assert (cached_key, allocated) == (key, False)
+        np.testing.assert_array_equal(cached, im)
+        del im, cached
+    finally:
+        store.close()
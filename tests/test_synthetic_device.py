@@ -0,0 +1,100 @@
+# Standard Imports
+import inspect
+
+# Third Party Imports
+import pytest
+
+
+@pytest.fixture(scope="module")
+def synthetic_device(plugin_module):
+    return plugin_module("model/devices/plugin_device/synthetic_device.py")
+
+
+@pytest.mark.parametrize("method", [
+    "move_abs_um", "move_rel_um", "rotate_deg", "move_to_specified_position", "wait",
+    "check_interrupted", "interrupt_move", "faults", "check_motors_busy_status",
+    "get_current_position", "get_last_autostore_location", "set_autostore_location",
+    "close",
+])
+def test_same_signatures_as_the_vast_controller(synthetic_device, method):
+    real = getattr(synthetic_device.vast_api.VASTController, method)
+    synthetic = getattr(synthetic_device.SyntheticVASTController, method)
+    assert inspect.signature(synthetic) == inspect.signature(inspect.unwrap(real))
+
+
+def test_moves_take_the_modelled_time(synthetic_device):
+    vast = synthetic_device.SyntheticVASTController(time_scale=0.0)
+    vast.move_abs_um(1000.0, 200.0)
+    vast.rotate_deg(90.0)
+    assert vast.get_current_position() == (1000.0, 200.0, 90.0)
+    assert vast.motion_time == pytest.approx(
+        vast.model.xy_time(1000.0, 200.0) + vast.model.theta_time(90.0)
+    )
+
+
+def test_wait_times_out(synthetic_device):
+    vast = synthetic_device.SyntheticVASTController(time_scale=1.0)
+    vast.move_abs_um(1e6, 0.0)
+    with pytest.raises(synthetic_device.vast_api.VASTTimeoutError):
+        vast.wait(timeout=0.01)
+    assert vast.faults()["timeouts"] == 1
+
+    vast.interrupt_move()
+    vast.wait(timeout=0.01)
+
+
+def test_interrupt_cancels_the_wait(synthetic_device):
+    vast = synthetic_device.SyntheticVASTController(time_scale=1.0)
+    generation = vast.stop_generation
+    vast.move_abs_um(1e6, 0.0, generation)
+    vast.interrupt_move()
+    with pytest.raises(synthetic_device.vast_api.VASTCancelledError):
+        vast.wait(generation=generation)
+
+
+def test_device_moves_the_vast(make_device):
+    device = make_device()
+    assert device.move_absolute({"x_abs": 100.0, "theta_abs": 90.0})
+    assert device.vast.get_current_position() == (100.0, 0, 90.0)
+    assert device.report_position() == {"x_pos": 100.0, "y_pos": 0, "theta_pos": 90.0}
+
+
+def test_z_and_f_move_without_the_vast(make_device):
+    # axes mapped to SyntheticStage's hardware names
+    device = make_device(
+        axes=["x", "y", "z", "theta", "f"], axes_mapping=["X", "Y", "Z", "Theta", "F"]
+    )
+    assert device.move_absolute({"z_abs": 5.0, "f_abs": 2.0})
+    assert device.vast.n_moves == 0
+
+    assert device.move_absolute({"x_abs": 10.0, "z_abs": 6.0})
+    assert device.vast.n_moves == 1
+    assert device.report_position() == {
+        "x_pos": 10.0, "y_pos": 0, "z_pos": 6.0, "theta_pos": 0, "f_pos": 2.0,
+    }
+
+    device.z_max = 100.0
+    assert not device.move_absolute({"z_abs": 200.0})
+    assert device.report_position()["z_pos"] == 6.0
+
+
+def test_moves_are_only_recorded_to_a_given_file(synthetic_device, stage_configuration,
+                                                 tmp_path):
+    configuration = stage_configuration(time_scale=0.0)
+    del configuration["configuration"]["microscopes"]["VAST"]["stage"]["hardware"]["results_path"]
+    device = synthetic_device.SyntheticDevice("VAST", None, configuration)
+    try:
+        assert device.results is None
+    finally:
+        device.close()
+
+    path = str(tmp_path / "vast_results.sqlite")
+    device = synthetic_device.SyntheticDevice(
+        "VAST", None, stage_configuration(time_scale=0.0, results_path=path)
+    )
+    try:
+        assert device.move_absolute({"x_abs": 100.0}, wait_until_done=True)
+        assert device.results.flush(5.0)
+        assert len(device.results.moves()) == 1
+    finally:
+        device.close()
@@ -0,0 +1,187 @@
+# Standard Imports
+import threading
+import time
+
+# Third Party Imports
+import pytest
+
+
+@pytest.fixture(scope="module")
+def vast_controller(plugin_module):
+    return plugin_module("model/devices/APIs/vast/vast_controller.py")
+
+
+@pytest.fixture(scope="module")
+def vast_emulator(plugin_module):
+    return plugin_module("model/devices/APIs/vast/vast_emulator.py")
+
+
+@pytest.fixture(scope="module")
+def plugin_device(plugin_module):
+    return plugin_module("model/devices/plugin_device/plugin_device.py")
+
+
+@pytest.fixture
+def make_vast(vast_controller, vast_emulator):
+    connections = []
+
+    def make_vast(**emulator):
+        server = vast_emulator.VastServerEmulator(**emulator)
+        vast = vast_controller.VASTController(pipe=server)
+        connections.append(vast)
+        return vast, server
+
+    yield make_vast
+    for vast in connections:
+        vast.close()
+
+
+def run_in_thread(func, *args):
+    """Start func(*args) on a thread, return the thread and a dict of its result
+    or exception."""
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = func(*args)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def test_reply_timeout_and_late_reply(vast_controller, make_vast):
+    vast, server = make_vast()
+    server.stall(0.3)
+    with pytest.raises(vast_controller.VASTTimeoutError):
+        vast.send("busy", timeout=0.02)
+    assert vast.faults()["timeouts"] == 1
+    assert vast.faults()["owed_replies"] == 1
+
+    # the late reply is skipped, the next request gets its own
+    assert vast.send("get_autost", timeout=5.0) is None
+    assert vast.check_motors_busy_status() == 0
+    assert vast.faults()["owed_replies"] == 0
+
+
+def test_wait_times_out(vast_controller, make_vast):
+    vast, _ = make_vast(time_scale=1.0)
+    vast.move_rel_um(1e5, 0.0)
+    with pytest.raises(vast_controller.VASTTimeoutError):
+        vast.wait(timeout=0.05)
+    assert vast.faults()["timeouts"] == 1
+
+
+def test_timeouts_are_counted_from_every_thread(vast_controller, make_vast):
+    vast, server = make_vast()
+    server.stall(1.0)
+    threads = [
+        run_in_thread(vast.send, "busy", 0.02) for _ in range(8)
+    ]
+    for thread, outcome in threads:
+        thread.join(5.0)
+        assert isinstance(outcome["error"], vast_controller.VASTTimeoutError)
+    assert vast.faults()["timeouts"] == 8
+
+
+def test_interrupt_cancels_the_wait(vast_controller, make_vast):
+    vast, server = make_vast(time_scale=1.0)
+    generation = vast.stop_generation
+    vast.move_rel_um(1e5, 0.0, generation)
+    thread, outcome = run_in_thread(vast.wait, -1, generation)
+    time.sleep(0.1)
+
+    t0 = time.perf_counter()
+    vast.interrupt_move()
+    thread.join(5.0)
+    assert time.perf_counter() - t0 < 1.0
+    assert isinstance(outcome["error"], vast_controller.VASTCancelledError)
+    assert vast.faults()["interrupts"] == 1
+    assert vast.faults()["cancelled"] == 1
+
+    # the stage stopped on the way, where the server says
+    assert 0 < vast.x_pos < 1e5
+    assert vast.x_pos == pytest.approx(server.x_us / vast.UM_TO_US)
+    assert vast.check_motors_busy_status() == 0
+
+    # moves requested before the interrupt are cancelled too
+    with pytest.raises(vast_controller.VASTCancelledError):
+        vast.move_rel_um(10.0, 0.0, generation)
+
+
+def test_stop_cancels_the_pending_moves(plugin_device, make_vast, stage_configuration):
+    vast, server = make_vast(time_scale=1.0)
+    device = plugin_device.PluginDevice("VAST", vast, stage_configuration())
+    try:
+        # the first move runs on the worker, the others are queued behind it
+        for x in (1e5, 2e5):
+            assert device.move_absolute({"x_abs": x}, wait_until_done=False)
+        thread, outcome = run_in_thread(device.move_absolute, {"x_abs": 3e5}, True)
+        time.sleep(0.1)
+
+        device.stop()
+        thread.join(5.0)
+        assert outcome["result"] is False
+        assert device.worker.throughput()["cancelled"] == 2
+        assert server.n_requests < 20
+
+        # the cached position is where the VAST stopped
+        assert 0 < device.x_pos < 1e5
+        assert device.x_pos == pytest.approx(server.x_us / vast.UM_TO_US)
+    finally:
+        device.close()
+
+
+def test_stop_and_queries_go_ahead_of_queued_moves(make_vast):
+    vast, server = make_vast()
+    served = []
+    handle = server.handle
+    server.handle = lambda request: (served.append(request), handle(request))[1]
+
+    # the I/O thread waits for the reply of the first move meanwhile
+    server.stall(0.3)
+    threads = []
+    for request in ("mrel,0,1,0", "mrel,0,2,0", "mrel,0,3,0", "busy", "stop"):
+        threads += [run_in_thread(vast.send, request, 5.0)]
+        time.sleep(0.02)
+    for thread, outcome in threads:
+        thread.join(5.0)
+        assert "error" not in outcome
+
+    assert served == ["mrel,0,1,0", "stop", "busy", "mrel,0,2,0", "mrel,0,3,0"]
+
+
+def test_owed_replies_are_read_before_the_next_reply(plugin_module, make_vast, tmp_path):
+    vast_recorder = plugin_module("model/devices/APIs/vast/vast_recorder.py")
+    vast, server = make_vast()
+    path = tmp_path / "pipe.vastrec"
+    vast.recorder = vast_recorder.PipeRecorder(str(path))
+
+    server.stall(0.3)
+    with pytest.raises(TimeoutError):
+        vast.send("busy", timeout=0.02)
+    assert [request for request, _ in vast.owed_replies] == ["busy"]
+
+    # still stalled: given up while reading the owed reply, nothing is written
+    with pytest.raises(TimeoutError):
+        vast.send("get_autost", timeout=0.05)
+    assert vast.faults()["owed_replies"] == 1
+
+    server.autost_dir = "D:\\autostore"
+    time.sleep(0.3)
+    assert vast.get_last_autostore_location() == "D:\\autostore"
+    assert vast.faults() == {
+        "timeouts": 2, "cancelled": 0, "interrupts": 0, "owed_replies": 0,
+    }
+    assert server.n_requests == 2
+
+    vast.recorder.close()
+    records = vast_recorder.read_recording(str(path))[1]
+    assert [(request, reply, outcome) for _, _, request, reply, outcome in records] == [
+        ("busy", "", vast_recorder.TIMEOUT),
+        ("get_autost", "", vast_recorder.UNSENT),
+        ("busy", "0", vast_recorder.LATE_REPLY),
+        ("get_autost", "D:\\autostore", vast_recorder.REPLY),
+    ]
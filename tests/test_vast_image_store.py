@@ -0,0 +1,182 @@
+# Standard Imports
+import multiprocessing
+import os
+
+# Third Party Imports
+import numpy as np
+import pytest
+
+IMAGE = np.arange(64 * 32, dtype=np.uint16).reshape(64, 32)
+
+
+@pytest.fixture(scope="module")
+def vast_image_store(plugin_module):
+    return plugin_module("model/vast_image_store.py")
+
+
+@pytest.fixture
+def owner(vast_image_store):
+    store = vast_image_store.SharedImageStore(create=True, capacity=4 * IMAGE.nbytes)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def client(vast_image_store, owner):
+    store = vast_image_store.SharedImageStore(owner.name)
+    yield store
+    store.close()
+
+
+def test_client_maps_the_owner_image(owner, client):
+    shared = owner.put("well/a.tiff", IMAGE, group="well")
+    im = client.get("well/a.tiff")
+    np.testing.assert_array_equal(im, IMAGE)
+    assert not im.flags.writeable
+    # a view of the same memory, not a copy
+    shared[0, 0] = 7
+    assert im[0, 0] == 7
+    client.release("well/a.tiff")
+
+
+def test_lookup(owner, client):
+    owner.put("well/a.tiff", IMAGE, group="well")
+    owner.put("other/a.tiff", IMAGE, group="other")
+    assert "well/a.tiff" in client
+    assert "well/b.tiff" not in client
+    assert client.get("well/b.tiff") is None
+    assert client.keys("well") == ["well/a.tiff"]
+    assert sorted(client.keys()) == ["other/a.tiff", "well/a.tiff"]
+
+
+def test_unpublished_images_are_not_visible(owner, client):
+    owner.allocate("well/a.tiff", IMAGE.shape, IMAGE.dtype)
+    assert client.get("well/a.tiff") is None
+    owner.publish("well/a.tiff")
+    assert client.get("well/a.tiff") is not None
+
+
+def test_eviction_keeps_referenced_images(owner, client):
+    for name in "abcd":
+        owner.put(name, IMAGE)
+    owner.release_all()
+    client.get("a")
+
+    assert owner.evict(extra=2 * IMAGE.nbytes) == 2
+    # the oldest unreferenced images go first
+    assert sorted(owner.keys()) == ["a", "d"]
+    assert owner.stats() == {
+        "images": 2, "bytes": 2 * IMAGE.nbytes, "referenced_bytes": IMAGE.nbytes,
+    }
+
+
+def test_eviction_stops_at_referenced_images(owner):
+    for name in "abcd":
+        owner.put(name, IMAGE)
+    # every image referenced, the store grows past its capacity
+    owner.put("e", IMAGE)
+    assert len(owner.keys()) == 5
+    assert owner.stats()["bytes"] == 5 * IMAGE.nbytes
+
+
+def test_allocate_replaces_the_image(owner, client):
+    owner.put("a", IMAGE)
+    assert client.get("a")[0, 1] == 1
+    client.release("a")
+    owner.put("a", IMAGE + 1)
+    assert owner.keys() == ["a"]
+    assert client.get("a")[0, 1] == 2
+
+
+def test_only_the_owner_allocates(client):
+    with pytest.raises(RuntimeError):
+        client.allocate("a", IMAGE.shape, IMAGE.dtype)
+
+
+def test_missing_block_is_a_miss(owner, client):
+    owner.put("a", IMAGE)
+    owner.blocks[owner._find("a")][1].unlink()
+    assert client.get("a") is None
+    assert client.entries["refs"][owner._find("a"), client.slot] == 0
+
+
+def test_clients_take_their_own_slot(vast_image_store, owner, client):
+    other = vast_image_store.SharedImageStore(owner.name)
+    try:
+        # the same process maps the store twice, e.g. two features
+        assert other.slot == client.slot
+    finally:
+        other.close()
+
+    # slots of other running processes
+    owner.header["clients"][client.slot + 1] = 1
+    owner.header["clients"][client.slot] = os.getppid()
+    store = vast_image_store.SharedImageStore(owner.name)
+    try:
+        assert store.slot == client.slot + 2
+    finally:
+        store.close()
+    assert owner.header["clients"][client.slot + 2] == 0
+
+
+def test_close_gives_back_the_references(vast_image_store, owner):
+    owner.put("a", IMAGE)
+    owner.release("a")
+    client = vast_image_store.SharedImageStore(owner.name)
+    client.get("a")
+    assert owner.stats()["referenced_bytes"] == IMAGE.nbytes
+    client.close()
+    assert owner.stats()["referenced_bytes"] == 0
+
+
+def test_other_process_maps_the_image(vast_image_store, owner):
+    owner.put("a", IMAGE)
+
+    def sum_image(result):
+        store = vast_image_store.SharedImageStore(owner.name)
+        im = store.get("a")
+        result.put(None if im is None else int(im.sum()))
+        del im
+        store.close()
+
+    # forked, the child has the plugin module loaded already
+    context = multiprocessing.get_context("fork")
+    result = context.Queue()
+    process = context.Process(target=sum_image, args=(result,))
+    process.start()
+    try:
+        assert result.get(timeout=30) == int(IMAGE.sum())
+    finally:
+        process.join(timeout=30)
+    assert process.exitcode == 0
+    assert owner.stats()["referenced_bytes"] == IMAGE.nbytes
+
+
+def exited_pid():
+    process = multiprocessing.get_context("fork").Process(target=int)
+    process.start()
+    process.join(timeout=30)
+    return process.pid
+
+
+def test_dead_clients_are_reclaimed(vast_image_store, owner):
+    owner.put("a", IMAGE)
+    owner.put("b", IMAGE)
+    owner.release_all()
+
+    # a client that exited without closing the store, holding a reference
+    owner.header["clients"][1:] = exited_pid()
+    owner.entries["refs"][owner._find("a"), 1] = 1
+    owner.capacity = 0
+    assert owner.evict() == 2
+    assert owner.keys() == []
+    assert (owner.header["clients"][1:] == 0).all()
+
+    # and every slot taken by dead clients
+    owner.header["clients"][1:] = exited_pid()
+    client = vast_image_store.SharedImageStore(owner.name)
+    try:
+        assert client.slot == 1
+        assert (owner.header["clients"][2:] == 0).all()
+    finally:
+        client.close()
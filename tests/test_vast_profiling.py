@@ -0,0 +1,173 @@
+# Standard Imports
+import pstats
+import threading
+import time
+
+# Third Party Imports
+import pytest
+
+
+@pytest.fixture(scope="module")
+def vast_profiling(plugin_module):
+    return plugin_module("model/devices/APIs/vast/vast_profiling.py")
+
+
+@pytest.fixture
+def profiler(vast_profiling):
+    profiler = vast_profiling.Profiler("test")
+    yield profiler
+    profiler.stop()
+
+
+def spin(seconds):
+    t_end = time.perf_counter() + seconds
+    while time.perf_counter() < t_end:
+        pass
+
+
+def make_methods(profiler):
+    @profiler.profiled
+    def inner(seconds):
+        spin(seconds)
+
+    @profiler.profiled
+    def outer(seconds):
+        inner(seconds)
+        return "done"
+
+    return inner, outer
+
+
+def test_calls_are_only_timed_while_on(profiler):
+    inner, outer = make_methods(profiler)
+    assert outer(0.0) == "done"
+    assert profiler.report() == {}
+
+    profiler.start("calls")
+    outer(0.01)
+    outer(0.01)
+    profiler.stop()
+    outer(0.0)
+
+    report = profiler.report()
+    assert set(report) == {inner.__qualname__, outer.__qualname__}
+    assert report[outer.__qualname__]["calls"] == 2
+    assert report[inner.__qualname__]["calls"] == 2
+    assert report[outer.__qualname__]["wall"] >= 0.02
+    assert report[outer.__qualname__]["max_wall"] >= 0.01
+
+
+def test_unknown_mode(profiler):
+    with pytest.raises(ValueError):
+        profiler.start("tracing")
+
+
+def test_window_stops_by_itself(profiler, tmp_path):
+    _, outer = make_methods(profiler)
+    path = tmp_path / "profile.txt"
+    profiler.start("calls", duration=0.05, path=str(path))
+    outer(0.0)
+    t_end = time.perf_counter() + 5.0
+    while profiler.enabled and time.perf_counter() < t_end:
+        time.sleep(0.01)
+    assert not profiler.enabled
+    assert "outer" in path.read_text()
+
+
+def test_cprofile_merges_the_threads(profiler, tmp_path):
+    _, outer = make_methods(profiler)
+    profiler.start("cprofile")
+    threads = [threading.Thread(target=outer, args=(0.01,)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    outer(0.01)
+    for thread in threads:
+        thread.join()
+
+    path = profiler.write(str(tmp_path / "profile.txt"))
+    profiler.stop()
+    assert len(profiler.profiles) == 4
+    assert profiler.report()[outer.__qualname__]["calls"] == 4
+
+    stats = pstats.Stats(f"{path}.prof")
+    spin_calls = [
+        calls for (_, _, name), (_, calls, *_) in stats.stats.items() if name == "spin"
+    ]
+    # python >= 3.12 enables one profile at a time, the others are only timed
+    assert sum(spin_calls) + profiler.n_unprofiled == 4
+    assert "spin" in open(path).read()
+
+
+class FailingProfile:
+    """A cProfile.Profile that cannot be enabled, as on python >= 3.12 while
+    another thread's is."""
+
+    stats = {}
+
+    def enable(self):
+        raise ValueError("Another profiling tool is already active")
+
+    def disable(self):
+        raise AssertionError("never enabled")
+
+    def create_stats(self):
+        pass
+
+
+def test_cprofile_falls_back_to_timing(profiler, tmp_path):
+    _, outer = make_methods(profiler)
+    profiler.start("cprofile")
+    profiler.local.profile = FailingProfile()
+    profiler.profiles = [profiler.local.profile]
+
+    assert outer(0.0) == "done"
+    assert profiler.local.depth == 0
+    assert profiler.n_unprofiled == 1
+    assert profiler.report()[outer.__qualname__]["calls"] == 1
+
+    path = profiler.write(str(tmp_path / "profile.txt"))
+    assert "1 call(s) timed only" in open(path).read()
+
+
+def test_write_leaves_out_calls_in_progress(profiler, tmp_path):
+    release = threading.Event()
+    entered = threading.Event()
+
+    @profiler.profiled
+    def blocked():
+        entered.set()
+        release.wait(5.0)
+
+    _, outer = make_methods(profiler)
+    profiler.start("cprofile")
+    outer(0.0)
+    thread = threading.Thread(target=blocked)
+    thread.start()
+    try:
+        assert entered.wait(5.0)
+        path = profiler.write(str(tmp_path / "profile.txt"))
+    finally:
+        release.set()
+        thread.join()
+
+    text = open(path).read()
+    if profiler.n_unprofiled == 0:
+        assert "1 thread(s) still in a profiled call, left out" in text
+    assert "outer" in text
+
+
+def test_sampling_collects_the_stacks(profiler, tmp_path):
+    _, outer = make_methods(profiler)
+    profiler.start("sampling", interval=0.001)
+    thread = threading.Thread(target=outer, args=(0.2,), name="busy-thread")
+    thread.start()
+    thread.join()
+    profiler.stop()
+
+    stacks = [stack for stack in profiler.samples if stack.startswith("busy-thread;")]
+    assert any("spin" in stack for stack in stacks)
+
+    path = profiler.write(str(tmp_path / "profile.txt"))
+    folded = open(f"{path}.folded").read()
+    assert "busy-thread;" in folded
+    assert "samples, heaviest stacks" in open(path).read()
@@ -0,0 +1,129 @@
+# Standard Imports
+import time
+
+# Third Party Imports
+import pytest
+
+
+@pytest.fixture(scope="module")
+def vast_recorder(plugin_module):
+    return plugin_module("model/devices/APIs/vast/vast_recorder.py")
+
+
+@pytest.fixture(scope="module")
+def vast_controller(plugin_module):
+    return plugin_module("model/devices/APIs/vast/vast_controller.py")
+
+
+@pytest.fixture(scope="module")
+def vast_emulator(plugin_module):
+    return plugin_module("model/devices/APIs/vast/vast_emulator.py")
+
+
+def test_read_back_the_recording(vast_recorder, tmp_path):
+    path = str(tmp_path / "pipe.vastrec")
+    recorder = vast_recorder.PipeRecorder(path)
+    t0 = recorder.t0
+    recorder.record("busy", "0", t0 + 0.5, t0 + 0.75)
+    recorder.record("busy", "", t0 + 1.0, t0 + 1.1, vast_recorder.TIMEOUT)
+    recorder.record("getpos", None, t0 + 1.2, t0 + 1.2, vast_recorder.UNSENT)
+    recorder.record("busy", "1", t0 + 1.0, t0 + 1.5, vast_recorder.LATE_REPLY)
+    recorder.close()
+    # records after close are dropped
+    recorder.record("busy", "0", t0 + 2.0, t0 + 2.0)
+
+    start_time, records = vast_recorder.read_recording(path)
+    assert abs(start_time - time.time()) < 60
+    assert [r[2:] for r in records] == [
+        ("busy", "0", vast_recorder.REPLY),
+        ("busy", "", vast_recorder.TIMEOUT),
+        ("getpos", "", vast_recorder.UNSENT),
+        ("busy", "1", vast_recorder.LATE_REPLY),
+    ]
+    times = [t for r in records for t in r[:2]]
+    assert times == pytest.approx([0.5, 0.25, 1.0, 0.1, 1.2, 0.0, 1.0, 0.5], abs=1e-5)
+
+
+def test_read_a_cut_recording(vast_recorder, tmp_path):
+    path = tmp_path / "pipe.vastrec"
+    recorder = vast_recorder.PipeRecorder(str(path))
+    recorder.record("busy", "0", recorder.t0, recorder.t0)
+    recorder.record("getpos", "1,2,3", recorder.t0, recorder.t0)
+    recorder.close()
+    path.write_bytes(path.read_bytes()[:-3])
+    assert [r[2] for r in vast_recorder.read_recording(str(path))[1]] == ["busy"]
+
+
+def test_not_a_recording(vast_recorder, tmp_path):
+    path = tmp_path / "pipe.vastrec"
+    path.write_bytes(vast_recorder.HEADER.pack(b"VASTREC1", 0.0))
+    with pytest.raises(ValueError):
+        vast_recorder.read_recording(str(path))
+
+
+def test_served_exchanges(vast_recorder):
+    records = [
+        (0.0, 0.1, "busy", "0", vast_recorder.REPLY),
+        (0.2, 0.1, "busy", "", vast_recorder.TIMEOUT),
+        (0.3, 0.0, "getpos", "", vast_recorder.UNSENT),
+        (0.4, 0.1, "busy", "", vast_recorder.TIMEOUT),
+        (0.2, 0.5, "busy", "1", vast_recorder.LATE_REPLY),
+    ]
+    assert vast_recorder.served_exchanges(records) == [
+        ("busy", "0", 0.1, False),
+        ("busy", "1", 0.5, True),
+        # its reply never came
+        ("busy", "", None, True),
+    ]
+
+
+def test_replay_server_answers_in_order(vast_recorder, vast_controller):
+    records = [
+        (0.0, 0.0, "busy", "0", vast_recorder.REPLY),
+        (0.1, 0.0, "getpos", "1,2,3", vast_recorder.REPLY),
+    ]
+    server = vast_recorder.ReplayServer(records)
+    vast = vast_controller.VASTController(pipe=server)
+    try:
+        assert vast.send("busy") == "0"
+        assert vast.send("busy") == "1,2,3"
+        assert server.mismatches == 1
+    finally:
+        vast.close()
+
+
+def test_replay_a_stall(vast_recorder, vast_controller, vast_emulator, tmp_path):
+    # record a VAST that stalls for longer than the reply timeout
+    path = str(tmp_path / "stall.vastrec")
+    server = vast_emulator.VastServerEmulator()
+    vast = vast_controller.VASTController(pipe=server)
+    vast.recorder = vast_recorder.PipeRecorder(path)
+    vast.timeout = 0.1
+    try:
+        vast.send("busy")
+        server.stall(0.3)
+        with pytest.raises(TimeoutError):
+            vast.send("busy")
+        time.sleep(0.3)
+        vast.send("busy")
+    finally:
+        vast.close()
+        vast.recorder.close()
+
+    _, records = vast_recorder.read_recording(path)
+    outcomes = [r[4] for r in records]
+    assert outcomes.count(vast_recorder.TIMEOUT) == 1
+    assert outcomes.count(vast_recorder.LATE_REPLY) == 1
+
+    # replayed in real time, the controller times out on the same request again
+    replayed = vast_controller.VASTController(pipe=vast_recorder.ReplayServer(records, realtime=True))
+    replayed.timeout = 0.1
+    try:
+        stats = vast_recorder.replay(records, replayed, realtime=True)
+    finally:
+        replayed.close()
+    assert stats["requests"] == 3
+    assert stats["recorded_timeouts"] == stats["timeouts"] == 1
+    assert stats["mismatched_replies"] == 0
+    assert replayed.faults()["owed_replies"] == 0
+    assert replayed.f.mismatches == 0
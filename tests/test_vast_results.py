@@ -0,0 +1,118 @@
+# Standard Imports
+import logging
+import time
+
+# Third Party Imports
+import pytest
+
+
+@pytest.fixture(scope="module")
+def vast_results(plugin_module):
+    return plugin_module("model/devices/APIs/vast/vast_results.py")
+
+
+@pytest.fixture
+def store(vast_results, tmp_path):
+    store = vast_results.ResultsStore(str(tmp_path / "results" / "plate.sqlite"), linger=0.01)
+    yield store
+    store.close()
+
+
+def test_fish_key(vast_results):
+    key = vast_results.fish_key("/plate/Well_001", ["a", "b"])
+    assert key.startswith("/plate/Well_001:")
+    assert key == vast_results.fish_key("/plate/Well_001", ["a", "b"])
+    assert key != vast_results.fish_key("/plate/Well_001", ["a", "c"])
+
+
+def test_record_fish(vast_results, store):
+    fish = vast_results.fish_key("Well_001", ["a"])
+    store.record_fish(
+        fish, "Well_001", nose=(10, 20), z_focus_pos=5, flip="x",
+        clicked=[(1, 2, 3)], positions=[(1, 2, 3, 90, 4), (5, 6, 7, 180, 8)],
+    )
+    assert store.flush(timeout=5)
+
+    [row] = store.fish()
+    assert (row["well"], row["nose_x"], row["nose_y"], row["nose_z"]) == ("Well_001", 10, 20, None)
+    assert (row["z_focus_pos"], row["focus_confirmed"], row["flip"], row["n_positions"]) == (5, 1, "x", 1)
+    assert store.positions(fish) == [
+        {"x": 1, "y": 2, "z": 3, "theta": 90, "f": 4},
+        {"x": 5, "y": 6, "z": 7, "theta": 180, "f": 8},
+    ]
+    assert store.positions(fish, "clicked") == [{"x": 1, "y": 2, "z": 3, "theta": None, "f": None}]
+
+
+def test_record_fish_replaces_the_annotation(vast_results, store):
+    store.record_fish("fish", "Well_001", positions=[(0, 0, 0, 0, 0)] * 3)
+    store.record_fish("fish", "Well_001", focus_confirmed=False, positions=[(1, 1, 1, 1, 1)])
+    assert store.flush(timeout=5)
+
+    [row] = store.fish()
+    assert row["focus_confirmed"] == 0
+    assert store.positions("fish") == [{"x": 1, "y": 1, "z": 1, "theta": 1, "f": 1}]
+
+
+def test_fish_by_well_and_time(store):
+    store.record_fish("a", "Well_001")
+    assert store.flush(timeout=5)
+    since = time.time()
+    store.record_fish("b", "Well_002")
+    store.record_fish("c", "Well_001")
+    assert store.flush(timeout=5)
+
+    assert [row["fish"] for row in store.fish()] == ["a", "b", "c"]
+    assert [row["fish"] for row in store.fish(well="Well_001")] == ["a", "c"]
+    assert [row["fish"] for row in store.fish(well="Well_001", since=since)] == ["c"]
+
+
+def test_moves(store):
+    store.record_move("vast", "Well_001", (10, 20, 90), (0, 20, 0), 1.5)
+    store.record_move("vast", "Well_001", (10, 0, 90), (10, 20, 90), 0.5)
+    store.record_move("vast", "Well_002", (0, 0, 0), (10, 0, 90), 0.1, outcome=TimeoutError("stall"))
+    assert store.flush(timeout=5)
+
+    first = store.moves(well="Well_001")[0]
+    assert (first["x"], first["dx"], first["dy"], first["dtheta"]) == (10, 10, 0, 90)
+    assert store.move_stats() == {"moves": 2, "total_s": 2.0, "mean_s": 1.0, "failed": 1}
+    assert store.move_stats(well="Well_001")["failed"] == 0
+    assert store.moves(well="Well_002")[0]["outcome"] == "stall"
+
+
+def test_many_records_are_batched(store):
+    for i in range(2500):
+        store.record_move("vast", None, (i, 0, 0), (0, 0, 0), 0.01)
+    assert store.flush(timeout=10)
+    assert store.move_stats()["moves"] == 2500
+    assert store.n_records == 2500
+    assert store.n_batches < 2500
+
+
+def test_write_errors_go_to_the_logger(vast_results, tmp_path, caplog):
+    store = vast_results.ResultsStore(
+        str(tmp_path / "plate.sqlite"), linger=0.01, logger=logging.getLogger("test.vast")
+    )
+    try:
+        store.queue.put([("INSERT INTO missing VALUES (?)", [(1,)])])
+        with caplog.at_level(logging.ERROR, logger="test.vast"):
+            assert store.flush(timeout=5)
+    finally:
+        store.close()
+    assert store.n_errors == 1
+    assert "could not write" in caplog.text
+
+
+def test_close_writes_the_queued_rows(vast_results, tmp_path):
+    path = str(tmp_path / "plate.sqlite")
+    store = vast_results.ResultsStore(path, linger=10)
+    store.record_fish("fish", "Well_001")
+    store.close()
+    assert not store.writer.is_alive()
+    assert len(store.fish()) == 1
+
+
+def test_one_store_per_file(vast_results, tmp_path):
+    path = str(tmp_path / "plate.sqlite")
+    store = vast_results.get_results_store(path)
+    assert vast_results.get_results_store(str(tmp_path / "." / "plate.sqlite")) is store
+    assert vast_results.get_results_store(str(tmp_path / "other.sqlite")) is not store